@@ -0,0 +1,33 @@
+"""add keyset pagination indexes
+
+Revision ID: 20f7da23fe62
+Revises: 90d74eab95a8
+Create Date: 2025-09-18 09:41:27.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20f7da23fe62'
+down_revision = '90d74eab95a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices que cubren (clave de orden, id) para la paginación por cursor
+    op.create_index(
+        'ix_opportunities_org_created_at', 'opportunities',
+        ['organization_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+    op.create_index(
+        'ix_interactions_customer_date_time', 'interactions',
+        ['customer_id', sa.text('date_time DESC'), sa.text('id DESC')], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_interactions_customer_date_time', table_name='interactions')
+    op.drop_index('ix_opportunities_org_created_at', table_name='opportunities')
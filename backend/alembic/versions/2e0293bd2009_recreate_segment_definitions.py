@@ -0,0 +1,43 @@
+"""recreate segment_definitions table
+
+Revision ID: 2e0293bd2009
+Revises: 40a9589fd20c
+Create Date: 2025-09-20 10:27:44.816305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e0293bd2009'
+down_revision = '40a9589fd20c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La tabla se eliminó en a3e7595c543c; se recrea para el motor de segmentación
+    op.create_table('segment_definitions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('display_name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('color', sa.String(), nullable=True),
+    sa.Column('icon', sa.String(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=True),
+    sa.Column('rules', sa.JSON(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_system', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_segment_definitions_id'), 'segment_definitions', ['id'], unique=False)
+    op.create_index(op.f('ix_segment_definitions_organization_id'), 'segment_definitions', ['organization_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_segment_definitions_organization_id'), table_name='segment_definitions')
+    op.drop_index(op.f('ix_segment_definitions_id'), table_name='segment_definitions')
+    op.drop_table('segment_definitions')
@@ -0,0 +1,37 @@
+"""add sales analytics indexes
+
+Revision ID: 30eaa93a6878
+Revises: e119073e8dee
+Create Date: 2025-09-26 08:54:19.470211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '30eaa93a6878'
+down_revision = 'e119073e8dee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices de cobertura para las agregaciones por organización y período
+    op.create_index(
+        'ix_purchases_org_purchased_at', 'purchases',
+        ['organization_id', 'purchased_at'], unique=False,
+        postgresql_include=['amount']
+    )
+    op.create_index(
+        'ix_purchase_items_org_purchased_at', 'purchase_items',
+        ['organization_id', 'purchased_at'], unique=False,
+        postgresql_include=[
+            'product_sku', 'product_name', 'category', 'quantity', 'unit_cost', 'line_total', 'purchase_id'
+        ]
+    )
+
+
+def downgrade():
+    op.drop_index('ix_purchase_items_org_purchased_at', table_name='purchase_items')
+    op.drop_index('ix_purchases_org_purchased_at', table_name='purchases')
@@ -0,0 +1,42 @@
+"""add customer search trigram index
+
+Revision ID: 40a9589fd20c
+Revises: 20f7da23fe62
+Create Date: 2025-09-18 16:12:03.518842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40a9589fd20c'
+down_revision = '20f7da23fe62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    
+    # unaccent() es STABLE; este envoltorio IMMUTABLE permite usarlo en un índice
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text)
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+    
+    # Debe coincidir con app.services.customer_search.search_document()
+    op.execute("""
+        CREATE INDEX ix_customers_search_trgm ON customers
+        USING gin (f_unaccent(lower(
+            coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || coalesce(email, '')
+        )) gin_trgm_ops)
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_customers_search_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
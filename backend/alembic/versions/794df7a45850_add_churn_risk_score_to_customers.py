@@ -0,0 +1,33 @@
+"""add churn risk score to customers
+
+Revision ID: 794df7a45850
+Revises: df7265b28f66
+Create Date: 2025-09-23 09:15:48.227361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '794df7a45850'
+down_revision = 'df7265b28f66'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('customers', sa.Column('churn_risk_score', sa.Float(), nullable=True))
+    op.add_column('customers', sa.Column('churn_scored_at', sa.DateTime(), nullable=True))
+    
+    # Lista de clientes en riesgo: recorrido del índice ordenado por puntuación
+    op.create_index(
+        'ix_customers_org_churn_risk', 'customers',
+        ['organization_id', sa.text('churn_risk_score DESC'), sa.text('id DESC')], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_customers_org_churn_risk', table_name='customers')
+    op.drop_column('customers', 'churn_scored_at')
+    op.drop_column('customers', 'churn_risk_score')
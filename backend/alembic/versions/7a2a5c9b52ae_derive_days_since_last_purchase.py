@@ -0,0 +1,37 @@
+"""derive days_since_last_purchase and index last_purchase_date
+
+Revision ID: 7a2a5c9b52ae
+Revises: 2e0293bd2009
+Create Date: 2025-09-21 18:03:11.640927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2a5c9b52ae'
+down_revision = '2e0293bd2009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # days_since_last_purchase se calcula ahora al consultar (current_date - last_purchase_date)
+    op.drop_column('customers', 'days_since_last_purchase')
+    
+    # Índice para el barrido diario de umbrales de segmentación
+    op.create_index(
+        'ix_customers_org_last_purchase_date', 'customers',
+        ['organization_id', 'last_purchase_date'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_customers_org_last_purchase_date', table_name='customers')
+    op.add_column('customers', sa.Column('days_since_last_purchase', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE customers
+        SET days_since_last_purchase = current_date - last_purchase_date
+        WHERE last_purchase_date IS NOT NULL
+    """)
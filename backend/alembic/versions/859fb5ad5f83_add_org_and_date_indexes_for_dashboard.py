@@ -0,0 +1,29 @@
+"""add organization and date indexes for dashboard interaction metrics
+
+Revision ID: 859fb5ad5f83
+Revises: ab3633aa34dc
+Create Date: 2025-09-16 09:41:07.218443
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '859fb5ad5f83'
+down_revision = 'ab3633aa34dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_customers_organization_id'), 'customers', ['organization_id'], unique=False)
+    # Provisional: 90d74eab95a8 lo sustituye por ix_interactions_org_date_time
+    # (organization_id, date_time DESC) al copiar organization_id en interactions.
+    # Se mantiene para no alterar la cadena de migraciones ya aplicadas
+    op.create_index(op.f('ix_interactions_date_time'), 'interactions', ['date_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_interactions_date_time'), table_name='interactions')
+    op.drop_index(op.f('ix_customers_organization_id'), table_name='customers')
@@ -0,0 +1,87 @@
+"""add daily analytics rollups
+
+Revision ID: 90847a79b328
+Revises: 794df7a45850
+Create Date: 2025-09-24 10:02:31.584120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '90847a79b328'
+down_revision = '794df7a45850'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales_rollups',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('won_count', sa.Integer(), nullable=False),
+    sa.Column('won_value', sa.Float(), nullable=False),
+    sa.Column('new_opportunities', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('organization_id', 'day', name='pk_daily_sales_rollups')
+    )
+    op.create_table('daily_interaction_rollups',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('outcome', sa.String(), nullable=False),
+    sa.Column('interactions_count', sa.Integer(), nullable=False),
+    sa.Column('total_duration_minutes', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('organization_id', 'day', 'type', 'outcome', name='pk_daily_interaction_rollups')
+    )
+    op.create_table('daily_stage_transition_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('pipeline_id', sa.Integer(), nullable=False),
+    sa.Column('from_stage_id', sa.Integer(), nullable=True),
+    sa.Column('to_stage_id', sa.Integer(), nullable=False),
+    sa.Column('transitions_count', sa.Integer(), nullable=False),
+    sa.Column('total_time_in_stage', sa.Integer(), nullable=False),
+    sa.Column('timed_transitions', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.ForeignKeyConstraint(['pipeline_id'], ['pipelines.id'], ),
+    sa.ForeignKeyConstraint(['from_stage_id'], ['pipeline_stages.id'], ),
+    sa.ForeignKeyConstraint(['to_stage_id'], ['pipeline_stages.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_daily_stage_transition_rollups_org_day', 'daily_stage_transition_rollups', ['organization_id', 'day'], unique=False)
+    op.create_table('rollup_dirty_days',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('marked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('organization_id', 'day', name='pk_rollup_dirty_days')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('value', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    
+    # Búsqueda de filas modificadas después del marcador de agua
+    op.create_index(op.f('ix_opportunities_updated_at'), 'opportunities', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_interactions_updated_at'), 'interactions', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_stage_history_changed_at'), 'stage_history', ['changed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stage_history_changed_at'), table_name='stage_history')
+    op.drop_index(op.f('ix_interactions_updated_at'), table_name='interactions')
+    op.drop_index(op.f('ix_opportunities_updated_at'), table_name='opportunities')
+    op.drop_table('rollup_watermarks')
+    op.drop_table('rollup_dirty_days')
+    op.drop_index('ix_daily_stage_transition_rollups_org_day', table_name='daily_stage_transition_rollups')
+    op.drop_table('daily_stage_transition_rollups')
+    op.drop_table('daily_interaction_rollups')
+    op.drop_table('daily_sales_rollups')
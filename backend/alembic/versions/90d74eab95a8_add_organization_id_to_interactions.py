@@ -0,0 +1,57 @@
+"""add organization_id to interactions with composite indexes
+
+Revision ID: 90d74eab95a8
+Revises: 859fb5ad5f83
+Create Date: 2025-09-17 11:05:52.774190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '90d74eab95a8'
+down_revision = '859fb5ad5f83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Añadir la columna como nullable para poder rellenarla
+    op.add_column('interactions', sa.Column('organization_id', sa.Integer(), nullable=True))
+    
+    # Copiar la organización desde el cliente de cada interacción
+    op.execute("""
+        UPDATE interactions
+        SET organization_id = customers.organization_id
+        FROM customers
+        WHERE customers.id = interactions.customer_id
+          AND interactions.organization_id IS NULL
+    """)
+    
+    op.alter_column('interactions', 'organization_id', nullable=False)
+    op.create_foreign_key(
+        'interactions_organization_id_fkey', 'interactions', 'organizations',
+        ['organization_id'], ['id']
+    )
+    
+    # Índices compuestos para listados y cola de seguimientos
+    op.create_index(
+        'ix_interactions_org_date_time', 'interactions',
+        ['organization_id', sa.text('date_time DESC')], unique=False
+    )
+    op.create_index(
+        'ix_interactions_org_followup', 'interactions',
+        ['organization_id', 'requires_followup', 'followup_completed', 'followup_date'], unique=False
+    )
+    
+    # El índice compuesto sustituye al índice simple sobre date_time
+    op.drop_index(op.f('ix_interactions_date_time'), table_name='interactions')
+
+
+def downgrade():
+    op.create_index(op.f('ix_interactions_date_time'), 'interactions', ['date_time'], unique=False)
+    op.drop_index('ix_interactions_org_followup', table_name='interactions')
+    op.drop_index('ix_interactions_org_date_time', table_name='interactions')
+    op.drop_constraint('interactions_organization_id_fkey', 'interactions', type_='foreignkey')
+    op.drop_column('interactions', 'organization_id')
@@ -0,0 +1,36 @@
+"""add dashboard kpi snapshots
+
+Revision ID: ab3633aa34dc
+Revises: f3d16ed148d5
+Create Date: 2025-09-15 10:12:41.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ab3633aa34dc'
+down_revision = 'f3d16ed148d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dashboard_kpi_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('is_stale', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('organization_id', 'period', name='uq_dashboard_kpi_snapshots_org_period')
+    )
+    op.create_index(op.f('ix_dashboard_kpi_snapshots_id'), 'dashboard_kpi_snapshots', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_dashboard_kpi_snapshots_id'), table_name='dashboard_kpi_snapshots')
+    op.drop_table('dashboard_kpi_snapshots')
@@ -0,0 +1,32 @@
+"""add kula context window
+
+Revision ID: b4dff4f1ce91
+Revises: 30eaa93a6878
+Create Date: 2025-09-27 10:12:41.208533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4dff4f1ce91'
+down_revision = '30eaa93a6878'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Resumen acumulado del historial de cada conversación
+    op.add_column('conversations', sa.Column('meta_info', sa.JSON(), nullable=True))
+
+    # Últimos mensajes de una conversación sin ordenar todo el historial
+    op.create_index(
+        'ix_messages_conversation_created_at', 'messages',
+        ['conversation_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_created_at', table_name='messages')
+    op.drop_column('conversations', 'meta_info')
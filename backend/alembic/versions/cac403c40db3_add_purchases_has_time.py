@@ -0,0 +1,126 @@
+"""add purchases has_time
+
+Revision ID: cac403c40db3
+Revises: b4dff4f1ce91
+Create Date: 2025-09-29 09:41:07.552190
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cac403c40db3'
+down_revision = 'b4dff4f1ce91'
+branch_labels = None
+depends_on = None
+
+
+# Zona horaria predeterminada de las organizaciones (settings.DEFAULT_TIMEZONE)
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "America/Costa_Rica")
+
+
+def _move_date_only_purchases(condition, target, has_time):
+    """
+    Mueve purchased_at de las compras que cumplen la condición (y el de sus
+    líneas, que forman parte de la clave foránea) y fija has_time.
+    """
+    op.execute(f"""
+        CREATE TEMPORARY TABLE purchase_moves ON COMMIT DROP AS
+        SELECT p.id, p.purchased_at AS old_at, {target} AS new_at
+        FROM purchases p
+        JOIN (
+            -- Zona de cada organización; los nombres desconocidos usan la predeterminada
+            SELECT o.id, coalesce(z.name, '{DEFAULT_TIMEZONE}') AS zone
+            FROM organizations o
+            LEFT JOIN pg_timezone_names z ON z.name = o.settings->>'timezone'
+        ) org ON org.id = p.organization_id
+        WHERE {condition}
+    """)
+
+    # Particiones de los meses de destino que aún no existan
+    op.execute("""
+        DO $$
+        DECLARE
+            month DATE;
+            partitioned TEXT;
+        BEGIN
+            FOR month IN SELECT DISTINCT date_trunc('month', new_at)::date FROM purchase_moves LOOP
+                FOREACH partitioned IN ARRAY ARRAY['purchases', 'purchase_items'] LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                        partitioned || '_p' || to_char(month, 'YYYY_MM'),
+                        partitioned,
+                        month,
+                        (month + interval '1 month')::date
+                    );
+                END LOOP;
+            END LOOP;
+        END $$
+    """)
+
+    # La clave foránea de las líneas incluye purchased_at y no se actualiza en cascada
+    op.drop_constraint('fk_purchase_items_purchase', 'purchase_items', type_='foreignkey')
+    op.execute(f"""
+        UPDATE purchases
+        SET purchased_at = m.new_at, has_time = {has_time}
+        FROM purchase_moves m
+        WHERE purchases.id = m.id AND purchases.purchased_at = m.old_at
+    """)
+    op.execute("""
+        UPDATE purchase_items
+        SET purchased_at = m.new_at
+        FROM purchase_moves m
+        WHERE purchase_items.purchase_id = m.id AND purchase_items.purchased_at = m.old_at
+    """)
+    op.create_foreign_key(
+        'fk_purchase_items_purchase', 'purchase_items', 'purchases',
+        ['purchase_id', 'purchased_at'], ['id', 'purchased_at']
+    )
+    op.execute("DROP TABLE purchase_moves")
+
+
+def upgrade():
+    # Compras registradas solo con fecha: sin hora para la matriz de calor
+    op.add_column(
+        'purchases',
+        sa.Column('has_time', sa.Boolean(), nullable=False, server_default=sa.true())
+    )
+
+    # Hasta ahora las compras sin hora se guardaban a medianoche UTC; pasan a
+    # la medianoche local de la organización, como las nuevas (ver
+    # purchase_timestamp). Una compra real a las 00:00:00 UTC no se puede
+    # distinguir de una sin hora y recibe el mismo tratamiento
+    _move_date_only_purchases(
+        condition="p.purchased_at = p.purchase_date::timestamp",
+        target="(p.purchase_date::timestamp AT TIME ZONE org.zone) AT TIME ZONE 'UTC'",
+        has_time="false"
+    )
+
+    # El índice de cobertura incluye la nueva columna para seguir resolviendo
+    # la matriz de calor con recorridos solo de índice
+    op.drop_index('ix_purchases_org_purchased_at', table_name='purchases')
+    op.create_index(
+        'ix_purchases_org_purchased_at', 'purchases',
+        ['organization_id', 'purchased_at'], unique=False,
+        postgresql_include=['amount', 'has_time']
+    )
+
+
+def downgrade():
+    # Las compras sin hora vuelven a la medianoche UTC de su fecha
+    _move_date_only_purchases(
+        condition="NOT p.has_time",
+        target="p.purchase_date::timestamp",
+        has_time="true"
+    )
+
+    op.drop_index('ix_purchases_org_purchased_at', table_name='purchases')
+    op.create_index(
+        'ix_purchases_org_purchased_at', 'purchases',
+        ['organization_id', 'purchased_at'], unique=False,
+        postgresql_include=['amount']
+    )
+    op.drop_column('purchases', 'has_time')
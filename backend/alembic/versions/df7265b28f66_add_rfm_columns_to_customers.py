@@ -0,0 +1,34 @@
+"""add rfm columns to customers
+
+Revision ID: df7265b28f66
+Revises: 7a2a5c9b52ae
+Create Date: 2025-09-22 12:48:36.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'df7265b28f66'
+down_revision = '7a2a5c9b52ae'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('customers', sa.Column('rfm_recency_score', sa.Integer(), nullable=True))
+    op.add_column('customers', sa.Column('rfm_frequency_score', sa.Integer(), nullable=True))
+    op.add_column('customers', sa.Column('rfm_monetary_score', sa.Integer(), nullable=True))
+    op.add_column('customers', sa.Column('rfm_score', sa.String(length=3), nullable=True))
+    op.add_column('customers', sa.Column('rfm_cluster', sa.Integer(), nullable=True))
+    op.add_column('customers', sa.Column('rfm_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('customers', 'rfm_updated_at')
+    op.drop_column('customers', 'rfm_cluster')
+    op.drop_column('customers', 'rfm_score')
+    op.drop_column('customers', 'rfm_monetary_score')
+    op.drop_column('customers', 'rfm_frequency_score')
+    op.drop_column('customers', 'rfm_recency_score')
@@ -0,0 +1,95 @@
+"""add partitioned purchases log
+
+Revision ID: e119073e8dee
+Revises: 90847a79b328
+Create Date: 2025-09-25 11:37:02.916345
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e119073e8dee'
+down_revision = '90847a79b328'
+branch_labels = None
+depends_on = None
+
+# Meses con partición creada por adelantado a partir del mes actual
+MONTHS_AHEAD = 12
+
+
+def upgrade():
+    # Tablas padre particionadas por mes; las filas viven en las particiones
+    op.execute("""
+        CREATE TABLE purchases (
+            id BIGSERIAL NOT NULL,
+            organization_id INTEGER NOT NULL REFERENCES organizations (id),
+            customer_id INTEGER NOT NULL REFERENCES customers (id),
+            purchased_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            purchase_date DATE NOT NULL,
+            amount DOUBLE PRECISION NOT NULL,
+            items_count INTEGER NOT NULL,
+            currency VARCHAR,
+            source VARCHAR,
+            notes TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT pk_purchases PRIMARY KEY (id, purchased_at)
+        ) PARTITION BY RANGE (purchased_at)
+    """)
+    op.execute("""
+        CREATE TABLE purchase_items (
+            id BIGSERIAL NOT NULL,
+            purchase_id BIGINT NOT NULL,
+            purchased_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            organization_id INTEGER NOT NULL REFERENCES organizations (id),
+            product_sku VARCHAR,
+            product_name VARCHAR NOT NULL,
+            category VARCHAR,
+            quantity DOUBLE PRECISION NOT NULL,
+            unit_price DOUBLE PRECISION NOT NULL,
+            unit_cost DOUBLE PRECISION,
+            line_total DOUBLE PRECISION NOT NULL,
+            CONSTRAINT pk_purchase_items PRIMARY KEY (id, purchased_at),
+            CONSTRAINT fk_purchase_items_purchase FOREIGN KEY (purchase_id, purchased_at)
+                REFERENCES purchases (id, purchased_at)
+        ) PARTITION BY RANGE (purchased_at)
+    """)
+    
+    # Los índices de la tabla padre se crean en cada partición
+    op.create_index('ix_purchases_purchased_at_brin', 'purchases', ['purchased_at'], unique=False, postgresql_using='brin')
+    op.create_index('ix_purchases_org_customer_date', 'purchases', ['organization_id', 'customer_id', 'purchase_date'], unique=False)
+    op.create_index('ix_purchase_items_purchased_at_brin', 'purchase_items', ['purchased_at'], unique=False, postgresql_using='brin')
+    op.create_index('ix_purchase_items_purchase_id', 'purchase_items', ['purchase_id'], unique=False)
+    
+    # Particiones desde la primera compra conocida hasta MONTHS_AHEAD meses después
+    # de hoy; las demás se crean al insertar (app/db/partitions.py)
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month DATE;
+            last_month DATE := date_trunc('month', now() + interval '{MONTHS_AHEAD} months')::date;
+            partitioned TEXT;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(first_purchase_date), now()::date))::date
+              INTO month FROM customers;
+            WHILE month <= last_month LOOP
+                FOREACH partitioned IN ARRAY ARRAY['purchases', 'purchase_items'] LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                        partitioned || '_p' || to_char(month, 'YYYY_MM'),
+                        partitioned,
+                        month,
+                        (month + interval '1 month')::date
+                    );
+                END LOOP;
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+
+
+def downgrade():
+    # Eliminar las tablas padre elimina también sus particiones
+    op.execute("DROP TABLE purchase_items")
+    op.execute("DROP TABLE purchases")
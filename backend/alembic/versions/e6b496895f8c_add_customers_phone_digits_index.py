@@ -0,0 +1,31 @@
+"""add customers phone digits index
+
+Revision ID: e6b496895f8c
+Revises: cac403c40db3
+Create Date: 2025-09-29 11:06:32.910457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b496895f8c'
+down_revision = 'cac403c40db3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Duplicados por teléfono en las importaciones: solo dígitos y sin el prefijo 506
+    op.create_index(
+        'ix_customers_org_phone_digits', 'customers',
+        [
+            'organization_id',
+            sa.text(r"regexp_replace(regexp_replace(phone, '\D', '', 'g'), '^506(\d{8})$', '\1')")
+        ], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_customers_org_phone_digits', table_name='customers')
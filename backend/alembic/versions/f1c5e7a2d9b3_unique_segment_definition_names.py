@@ -0,0 +1,85 @@
+"""unique segment definition names and default segments
+
+Revision ID: f1c5e7a2d9b3
+Revises: e6b496895f8c
+Create Date: 2025-09-30 09:41:18.220614
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c5e7a2d9b3'
+down_revision = 'e6b496895f8c'
+branch_labels = None
+depends_on = None
+
+# Copia de DEFAULT_SEGMENTS (app/services/segmentation.py) en el momento de la migración
+DEFAULT_SEGMENTS = [
+    ("vip", "VIP", "Clientes con alto gasto y compras recientes", "#a855f7", "crown", 10,
+     {"all": [
+         {"field": "total_spent", "op": "gte", "value": 1000},
+         {"field": "days_since_last_purchase", "op": "lte", "value": 90},
+     ]}),
+    ("frequent", "Recurrentes", "Clientes que compran con frecuencia", "#22c55e", "repeat", 20,
+     {"all": [
+         {"field": "purchase_count", "op": "gte", "value": 5},
+         {"field": "days_since_last_purchase", "op": "lte", "value": 60},
+     ]}),
+    ("inactive", "Inactivos", "Clientes sin compras en los últimos 180 días", "#6b7280", "moon", 30,
+     {"field": "days_since_last_purchase", "op": "gt", "value": 180}),
+    ("occasional", "Ocasionales", "Clientes con al menos una compra", "#3b82f6", "shopping-bag", 40,
+     {"field": "purchase_count", "op": "gte", "value": 1}),
+]
+
+
+def upgrade():
+    # Duplicados creados por peticiones simultáneas: se conserva el más antiguo
+    op.execute("""
+        DELETE FROM segment_definitions duplicate
+        USING segment_definitions original
+        WHERE duplicate.organization_id = original.organization_id
+          AND duplicate.name = original.name
+          AND duplicate.id > original.id
+    """)
+    op.create_unique_constraint(
+        'uq_segment_definitions_org_name', 'segment_definitions', ['organization_id', 'name']
+    )
+
+    # Los segmentos predefinidos se crean al registrar la organización;
+    # las organizaciones existentes sin segmentos los reciben aquí
+    connection = op.get_bind()
+    organization_ids = [
+        row[0] for row in connection.execute(sa.text("""
+            SELECT o.id FROM organizations o
+            WHERE NOT EXISTS (
+                SELECT 1 FROM segment_definitions s WHERE s.organization_id = o.id
+            )
+        """))
+    ]
+    insert = sa.text("""
+        INSERT INTO segment_definitions
+            (organization_id, name, display_name, description, color, icon,
+             priority, rules, is_active, is_system)
+        VALUES (:organization_id, :name, :display_name, :description, :color, :icon,
+                :priority, CAST(:rules AS json), true, true)
+    """)
+    for organization_id in organization_ids:
+        for name, display_name, description, color, icon, priority, rules in DEFAULT_SEGMENTS:
+            connection.execute(insert, {
+                "organization_id": organization_id,
+                "name": name,
+                "display_name": display_name,
+                "description": description,
+                "color": color,
+                "icon": icon,
+                "priority": priority,
+                "rules": json.dumps(rules),
+            })
+
+
+def downgrade():
+    op.drop_constraint('uq_segment_definitions_org_name', 'segment_definitions', type_='unique')
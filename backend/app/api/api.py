@@ -6,7 +6,7 @@ Configuración central de todos los routers de la API.
 from fastapi import APIRouter
 
 # Importar los diferentes routers de endpoints
-from app.api.endpoints import auth, users, customers, password_reset, sessions, invitations, interactions, pipelines, opportunities, dashboard, kula
+from app.api.endpoints import auth, users, customers, password_reset, sessions, invitations, interactions, pipelines, opportunities, dashboard, kula, internal, segments, sales_analytics
 
 # Crear el router principal
 api_router = APIRouter()
@@ -23,3 +23,6 @@ api_router.include_router(pipelines.router, prefix="/pipelines", tags=["pipeline
 api_router.include_router(opportunities.router, prefix="/opportunities", tags=["opportunities"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 api_router.include_router(kula.router, prefix="/kula", tags=["kula"])
+api_router.include_router(segments.router, prefix="/segments", tags=["segments"])
+api_router.include_router(sales_analytics.router, prefix="/sales-analytics", tags=["sales_analytics"])
+api_router.include_router(internal.router, prefix="/internal", tags=["internal"])
@@ -4,15 +4,19 @@ Dependencias para los endpoints de la API.
 Incluye funciones para obtener el usuario autenticado y verificar permisos.
 """
 
-from datetime import datetime, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.db.base import get_db
+from app.db.base import get_async_db, utcnow
 from app.models.user import User
+from app.core.config import settings
 from app.core.security import SECRET_KEY, ALGORITHM
+from app.core.session_cache import principal_cache, CachedPrincipal
+from app.core.activity_flusher import activity_flusher
 from app.models.active_session import ActiveSession
 
 # Esquema OAuth2 para obtener el token del header Authorization
@@ -20,7 +24,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """
     Dependencia que valida el token JWT y obtiene el usuario actual.
@@ -38,11 +42,22 @@ async def get_current_user(
         
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        
+        # asyncpg no convierte cadenas a enteros automáticamente
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
     
+    # Intentar resolver el usuario desde la caché de principales
+    if settings.AUTH_CACHE_ENABLED:
+        cached = principal_cache.get(token)
+        if cached is not None and cached.user_id == user_id:
+            activity_flusher.touch(cached.session_id, cached.last_activity)
+            return _user_from_cache(cached)
+    
     # Buscar el usuario en la base de datos
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
     
     if user is None:
         raise credentials_exception
@@ -50,20 +65,36 @@ async def get_current_user(
         raise HTTPException(status_code=400, detail="Usuario inactivo")
     
     # Verificar si el token está en la lista de sesiones activas
-    session = db.query(ActiveSession).filter(
+    result = await db.execute(select(ActiveSession).where(
         ActiveSession.token == token,
         ActiveSession.user_id == user.id,
         ActiveSession.is_active == True,
-        ActiveSession.expires_at > datetime.now(timezone.utc)
-    ).first()
+        ActiveSession.expires_at > utcnow()
+    ))
+    session = result.scalars().first()
     
     if not session:
         raise credentials_exception
     
-    # Actualizar la hora de última actividad
-    session.last_activity = datetime.now(timezone.utc)
-    db.commit()
+    # Registrar la actividad; se escribe en lote en segundo plano
+    activity_flusher.touch(session.id, session.last_activity)
+    
+    # Guardar el principal para las siguientes peticiones con el mismo token
+    if settings.AUTH_CACHE_ENABLED:
+        principal_cache.set(token, user, session)
+    
+    return user
+
+def _user_from_cache(cached: CachedPrincipal) -> User:
+    """
+    Reconstruye el usuario a partir de la caché sin consultar la base de datos.
     
+    El objeto queda desvinculado de cualquier sesión (igual que el usuario que
+    se obtiene con la AsyncSession de la petición): solo las columnas cacheadas
+    están disponibles y las relaciones deben consultarse explícitamente.
+    """
+    user = User(**cached.user_fields)
+    make_transient_to_detached(user)
     return user
 
 async def get_current_admin(
@@ -20,6 +20,8 @@ from app.models.organization import Organization
 from app.models.active_session import ActiveSession
 from app.models.password_reset import PasswordReset
 from app.services.email_service import EmailService
+from app.services.segmentation import SegmentationEngine
+from app.core.session_cache import principal_cache
 from app.core.config import settings
 
 # Crear router
@@ -151,6 +153,9 @@ def register(
     db.add(organization)
     db.flush()  # Obtener el ID generado
     
+    # Segmentos predefinidos de la organización
+    SegmentationEngine(db).create_default_definitions(organization.id)
+    
     # Crear nuevo usuario
     user = User(
         email=user_data.email,
@@ -282,4 +287,7 @@ def reset_password(
     # Guardar cambios
     db.commit()
     
+    # Las sesiones cacheadas del usuario deben volver a validarse
+    principal_cache.invalidate_user(user.id)
+    
     return {"detail": "Contraseña restablecida correctamente"}
\ No newline at end of file
@@ -1,5 +1,6 @@
 # backend/app/api/endpoints/customers.py
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date, timedelta
@@ -7,10 +8,19 @@ from datetime import datetime, date, timedelta
 from app.db.base import get_db
 from app.models.user import User
 from app.models.customer import Customer
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_current_admin
+from app.api.pagination import CursorPage, cursor_pagination
+from app.services.kpi_service import KpiService
+from app.services.customer_search import CustomerSearchService
+from app.services.customer_import import CustomerImportService, iter_file_rows, DEFAULT_CHUNK_SIZE
+from app.services.purchase_service import PurchaseService
+from app.services.churn_scoring import ChurnScoringService, AT_RISK_THRESHOLD
+from app.core.segmentation_worker import segmentation_worker
 
 # Definir modelos Pydantic
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+logger = logging.getLogger(__name__)
 
 class CustomerBase(BaseModel):
     first_name: str
@@ -63,12 +73,36 @@ class CustomerResponse(BaseModel):
     days_since_last_purchase: Optional[int] = None
     segment_updated_at: Optional[datetime] = None
     
+    # Análisis RFM
+    rfm_recency_score: Optional[int] = None
+    rfm_frequency_score: Optional[int] = None
+    rfm_monetary_score: Optional[int] = None
+    rfm_score: Optional[str] = None
+    rfm_cluster: Optional[int] = None
+    churn_risk_score: Optional[float] = None
+    
     class Config:
         from_attributes = True  # Cambiado de orm_mode=True
 
+# Clave de orden de los cursores de búsqueda
+SEARCH_SORT_KEY = "search"
+
 # Crear router
 router = APIRouter()
 
+def _search_position(page: CursorPage) -> Optional[tuple]:
+    """
+    Posición (rango de prefijo, similitud, id) guardada en el cursor de una búsqueda.
+    """
+    position = page.position(SEARCH_SORT_KEY)
+    if position is None:
+        return None
+    try:
+        (prefix_rank, similarity), customer_id = position
+        return (int(prefix_rank), float(similarity), customer_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
 @router.post("/", response_model=CustomerResponse)
 def create_customer(
     customer_data: CustomerCreate,
@@ -87,48 +121,125 @@ def create_customer(
     
     # Guardar en la base de datos
     db.add(customer)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
+    
+    # El índice de búsqueda en memoria se reconstruye tras el cambio
+    CustomerSearchService.invalidate(current_user.organization_id)
+    
     db.refresh(customer)
     
+    # Segmentar al cliente nuevo en segundo plano
+    segmentation_worker.mark_dirty(current_user.organization_id, [customer.id])
+    
     return customer
 
+@router.post("/import")
+def import_customers(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Importa clientes en bloque desde un archivo CSV o XLSX.
+    Cada fila se valida como CustomerCreate y se omiten los duplicados por
+    email o teléfono. Devuelve el resumen con los errores por fila.
+    """
+    organization_id = current_user.organization_id
+    
+    def log_progress(result):
+        logger.info(
+            f"Importación de clientes (org {organization_id}): "
+            f"{result.total_rows} filas, {result.created} creados, "
+            f"{result.duplicates} duplicados, {result.error_count} errores"
+        )
+    
+    try:
+        rows = iter_file_rows(file.file, file.filename or "")
+        result = CustomerImportService(db, CustomerCreate).import_rows(
+            organization_id, rows, chunk_size=chunk_size, on_progress=log_progress
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+    
+    return result.to_dict()
+
 @router.get("/", response_model=List[CustomerResponse])
 def list_customers(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100,
+    page: CursorPage = Depends(cursor_pagination),
     search: Optional[str] = None,
     status: Optional[str] = None,
     segment: Optional[str] = None
 ):
     """
     Lista los clientes de la organización del usuario autenticado.
-    Soporta paginación, búsqueda y filtrado por estado y segmento.
+    Soporta paginación por cursor, búsqueda y filtrado por estado y segmento.
     """
     # Construir query base
     query = db.query(Customer).filter(Customer.organization_id == current_user.organization_id)
     
     # Aplicar filtros si se proporcionan
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Customer.first_name.ilike(search_term)) | 
-            (Customer.last_name.ilike(search_term)) |
-            (Customer.email.ilike(search_term))
-        )
-    
     if status:
         query = query.filter(Customer.status == status)
     
     if segment:
         query = query.filter(Customer.segment == segment)
     
-    # Aplicar paginación
-    customers = query.offset(skip).limit(limit).all()
+    # Las búsquedas se ordenan por relevancia; el cursor guarda (rango de prefijo, similitud) e id
+    if search:
+        customers, last = CustomerSearchService(db).search_page(
+            query,
+            current_user.organization_id,
+            search,
+            limit=page.limit,
+            after=_search_position(page),
+            skip=page.skip
+        )
+        if last is not None:
+            page.set_next(SEARCH_SORT_KEY, [last[0], last[1]], last[2])
+        return customers
+    
+    # Aplicar paginación por cursor (orden por id)
+    customers = page.paginate(query, Customer.id, Customer.id)
     
     return customers
 
+@router.get("/at-risk", response_model=List[CustomerResponse])
+def list_customers_at_risk(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    page: CursorPage = Depends(cursor_pagination),
+    min_score: float = Query(AT_RISK_THRESHOLD, ge=0, le=1)
+):
+    """
+    Lista los clientes con riesgo de abandono, de mayor a menor riesgo.
+    Usa la puntuación precalculada por el trabajo diario (índice por organización y puntuación).
+    """
+    query = db.query(Customer).filter(
+        Customer.organization_id == current_user.organization_id,
+        Customer.status == "active",
+        Customer.churn_risk_score >= min_score
+    )
+    
+    return page.paginate(query, Customer.churn_risk_score, Customer.id, descending=True)
+
+@router.post("/churn/score")
+def score_customers_churn(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Recalcula ahora el riesgo de abandono de los clientes de la organización.
+    Requiere permisos de administrador.
+    """
+    return ChurnScoringService(db).score(current_user.organization_id)
+
 @router.get("/{customer_id}", response_model=CustomerResponse)
 def get_customer(
     customer_id: int,
@@ -172,8 +283,18 @@ def update_customer(
     for key, value in update_data.items():
         setattr(customer, key, value)
     
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     # Guardar cambios
     db.commit()
+    
+    # El índice de búsqueda en memoria se reconstruye tras el cambio
+    CustomerSearchService.invalidate(current_user.organization_id)
+    
+    # Resegmentar al cliente en segundo plano
+    segmentation_worker.mark_dirty(current_user.organization_id, [customer.id])
+    
     db.refresh(customer)
     
     return customer
@@ -199,17 +320,35 @@ def delete_customer(
     # Marcar como inactivo
     customer.status = "inactive"
     
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     # Guardar cambios
     db.commit()
+    
+    # El índice de búsqueda en memoria se reconstruye tras el cambio
+    CustomerSearchService.invalidate(current_user.organization_id)
+    
     db.refresh(customer)
     
     return customer
 
+class PurchaseLine(BaseModel):
+    product_name: str
+    product_sku: Optional[str] = None
+    category: Optional[str] = None
+    quantity: float = 1.0
+    unit_price: float
+    unit_cost: Optional[float] = None  # Para calcular márgenes
+    line_total: Optional[float] = None  # Por defecto: quantity * unit_price
+
 class PurchaseRecord(BaseModel):
     purchase_date: date
     amount: float
     items_count: Optional[int] = 1
     notes: Optional[str] = None
+    purchased_at: Optional[datetime] = None  # Momento exacto (con zona, o UTC); por defecto la medianoche local
+    lines: Optional[List[PurchaseLine]] = None  # Líneas de producto (opcional)
 
 @router.post("/{customer_id}/purchase", response_model=CustomerResponse)
 def record_customer_purchase(
@@ -220,39 +359,65 @@ def record_customer_purchase(
 ):
     """
     Registra una compra para un cliente y actualiza sus métricas para segmentación.
+    La actualización es atómica: dos compras simultáneas del mismo cliente
+    no pierden incrementos. La compra queda además en el registro de compras.
     """
-    # Buscar el cliente
-    customer = db.query(Customer).filter(
-        Customer.id == customer_id,
-        Customer.organization_id == current_user.organization_id
-    ).first()
+    customer = PurchaseService(db).record_purchase(
+        current_user.organization_id,
+        customer_id,
+        purchase_data.purchase_date,
+        purchase_data.amount,
+        purchased_at=purchase_data.purchased_at,
+        items_count=purchase_data.items_count,
+        lines=[line.dict() for line in purchase_data.lines] if purchase_data.lines else None,
+        notes=purchase_data.notes
+    )
     
     if not customer:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
-    # Actualizar datos de compra
-    if not customer.first_purchase_date:
-        customer.first_purchase_date = purchase_data.purchase_date
-    
-    # Si ya tenía compras, calcular la frecuencia
-    if customer.purchase_count > 0 and customer.last_purchase_date:
-        days_between = (purchase_data.purchase_date - customer.last_purchase_date).days
-        
-        # Actualizar la frecuencia promedio
-        if customer.purchase_frequency_days:
-            # Promedio ponderado, dando más peso a las compras recientes
-            customer.purchase_frequency_days = (customer.purchase_frequency_days * 0.7) + (days_between * 0.3)
-        else:
-            customer.purchase_frequency_days = days_between
-    
-    # Actualizar estadísticas de compra
-    customer.last_purchase_date = purchase_data.purchase_date
-    customer.purchase_count += 1
-    customer.total_spent += purchase_data.amount
-    customer.average_purchase_value = customer.total_spent / customer.purchase_count
-    
-    # Guardar cambios
-    db.commit()
-    db.refresh(customer)
-    
-    return customer
\ No newline at end of file
+    return customer
+
+# Máximo de compras aceptadas en un solo lote
+MAX_PURCHASE_BATCH_SIZE = 10000
+
+class BatchPurchaseRecord(PurchaseRecord):
+    customer_id: int
+
+class BatchPurchaseRequest(BaseModel):
+    purchases: List[BatchPurchaseRecord] = Field(..., min_length=1, max_length=MAX_PURCHASE_BATCH_SIZE)
+
+class BatchPurchaseResponse(BaseModel):
+    processed_purchases: int
+    updated_customers: int
+    unknown_customer_ids: List[int]
+
+@router.post("/purchases/batch", response_model=BatchPurchaseResponse)
+def record_purchases_batch(
+    batch: BatchPurchaseRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Registra muchas compras de distintos clientes en una sola operación.
+    Las métricas de segmentación se actualizan con un único UPDATE, sin
+    perder incrementos aunque otros lotes modifiquen los mismos clientes.
+    Las compras de clientes que no pertenecen a la organización se omiten.
+    """
+    return PurchaseService(db).record_purchases(
+        current_user.organization_id,
+        [purchase.dict() for purchase in batch.purchases]
+    )
+
+@router.post("/purchases/rebuild-summaries")
+def rebuild_purchase_summaries(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Recalcula las métricas de compra de los clientes desde el registro de compras.
+    Solo afecta a los clientes cuyo historial está completo en el registro.
+    Requiere permisos de administrador.
+    """
+    updated = PurchaseService(db).rebuild_customer_summaries(current_user.organization_id)
+    return {"updated_customers": updated}
@@ -10,6 +10,10 @@ from app.models.user import User
 from app.models.customer import Customer
 from app.models.interaction import Interaction
 from app.api.deps import get_current_user
+from app.api.pagination import CursorPage, cursor_pagination
+from app.services.kpi_service import KpiService
+from app.services.analytics_rollups import AnalyticsRollupService
+from app.core.segmentation_worker import segmentation_worker
 
 router = APIRouter()
 
@@ -80,6 +84,7 @@ def create_interaction(
     interaction_dict = interaction_data.dict()
     interaction = Interaction(
         **interaction_dict,
+        organization_id=customer.organization_id,
         user_id=current_user.id
     )
     
@@ -88,7 +93,15 @@ def create_interaction(
     
     # Guardar en la base de datos
     db.add(interaction)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
+    
+    # Resegmentar al cliente en segundo plano (cambió last_interaction)
+    segmentation_worker.mark_dirty(current_user.organization_id, [customer.id])
+    
     db.refresh(interaction)
     
     return interaction
@@ -98,8 +111,7 @@ def list_interactions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     customer_id: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 100,
+    page: CursorPage = Depends(cursor_pagination),
     type: Optional[str] = None,
     requires_followup: Optional[bool] = None,
     from_date: Optional[datetime] = None,
@@ -109,10 +121,8 @@ def list_interactions(
     Lista las interacciones con filtros opcionales.
     """
     # Construir la consulta base
-    query = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
-        Customer.organization_id == current_user.organization_id
+    query = db.query(Interaction).filter(
+        Interaction.organization_id == current_user.organization_id
     )
     
     # Aplicar filtros adicionales si se proporcionan
@@ -131,10 +141,8 @@ def list_interactions(
     if to_date:
         query = query.filter(Interaction.date_time <= to_date)
     
-    # Aplicar paginación y ordenar por fecha
-    query = query.order_by(Interaction.date_time.desc()).offset(skip).limit(limit)
-    
-    return query.all()
+    # Aplicar paginación por cursor y ordenar por fecha
+    return page.paginate(query, Interaction.date_time, Interaction.id, descending=True)
 
 @router.get("/{interaction_id}", response_model=InteractionResponse)
 def get_interaction(
@@ -146,11 +154,9 @@ def get_interaction(
     Obtiene una interacción específica por su ID.
     """
     # Buscar la interacción asegurándose que pertenece a la organización del usuario
-    interaction = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
+    interaction = db.query(Interaction).filter(
         Interaction.id == interaction_id,
-        Customer.organization_id == current_user.organization_id
+        Interaction.organization_id == current_user.organization_id
     ).first()
     
     if not interaction:
@@ -169,11 +175,9 @@ def update_interaction(
     Actualiza una interacción existente.
     """
     # Buscar la interacción
-    interaction = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
+    interaction = db.query(Interaction).filter(
         Interaction.id == interaction_id,
-        Customer.organization_id == current_user.organization_id
+        Interaction.organization_id == current_user.organization_id
     ).first()
     
     if not interaction:
@@ -183,11 +187,18 @@ def update_interaction(
     if interaction_data.followup_completed and not interaction_data.followup_completed_date:
         interaction_data.followup_completed_date = datetime.now(timezone.utc)
     
+    # Si cambia la fecha, el día anterior del resumen debe recalcularse
+    if interaction_data.date_time is not None:
+        AnalyticsRollupService.mark_dirty(db, current_user.organization_id, [interaction.date_time])
+    
     # Actualizar solo los campos proporcionados
     update_data = interaction_data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(interaction, key, value)
     
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     # Guardar cambios
     db.commit()
     db.refresh(interaction)
@@ -204,18 +215,23 @@ def delete_interaction(
     Elimina una interacción.
     """
     # Buscar la interacción
-    interaction = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
+    interaction = db.query(Interaction).filter(
         Interaction.id == interaction_id,
-        Customer.organization_id == current_user.organization_id
+        Interaction.organization_id == current_user.organization_id
     ).first()
     
     if not interaction:
         raise HTTPException(status_code=404, detail="Interacción no encontrada")
     
+    # El día de la interacción debe recalcularse en los resúmenes
+    AnalyticsRollupService.mark_dirty(db, current_user.organization_id, [interaction.date_time])
+    
     # Eliminar la interacción
     db.delete(interaction)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
     
     return interaction
@@ -225,8 +241,7 @@ def list_customer_interactions(
     customer_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    page: CursorPage = Depends(cursor_pagination)
 ):
     """
     Lista todas las interacciones de un cliente específico.
@@ -241,11 +256,11 @@ def list_customer_interactions(
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
     # Obtener las interacciones del cliente
-    interactions = db.query(Interaction).filter(
+    query = db.query(Interaction).filter(
+        Interaction.organization_id == current_user.organization_id,
         Interaction.customer_id == customer_id
-    ).order_by(
-        Interaction.date_time.desc()
-    ).offset(skip).limit(limit).all()
+    )
+    interactions = page.paginate(query, Interaction.date_time, Interaction.id, descending=True)
     
     return interactions
 
@@ -254,8 +269,7 @@ def list_pending_followups(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     days: int = 7,
-    skip: int = 0,
-    limit: int = 100
+    page: CursorPage = Depends(cursor_pagination)
 ):
     """
     Lista las interacciones que requieren seguimiento en los próximos días.
@@ -265,17 +279,14 @@ def list_pending_followups(
     limit_date = today + timedelta(days=days)
     
     # Buscar interacciones que requieren seguimiento
-    followups = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
-        Customer.organization_id == current_user.organization_id,
+    query = db.query(Interaction).filter(
+        Interaction.organization_id == current_user.organization_id,
         Interaction.requires_followup == True,
         Interaction.followup_completed == False,
         Interaction.followup_date <= limit_date,
         Interaction.followup_date >= today
-    ).order_by(
-        Interaction.followup_date
-    ).offset(skip).limit(limit).all()
+    )
+    followups = page.paginate(query, Interaction.followup_date, Interaction.id)
     
     return followups
 
@@ -290,11 +301,9 @@ def complete_followup(
     Marca el seguimiento de una interacción como completado.
     """
     # Buscar la interacción
-    interaction = db.query(Interaction).join(
-        Customer, Interaction.customer_id == Customer.id
-    ).filter(
+    interaction = db.query(Interaction).filter(
         Interaction.id == interaction_id,
-        Customer.organization_id == current_user.organization_id
+        Interaction.organization_id == current_user.organization_id
     ).first()
     
     if not interaction:
@@ -0,0 +1,36 @@
+"""
+Endpoints internos de operación:
+- Estadísticas del pool de conexiones a la base de datos
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.db.base import engine, async_engine, POOL_OPTIONS
+from app.db.pool_metrics import sync_pool_metrics, async_pool_metrics
+from app.models.user import User
+from app.api.deps import get_current_admin
+
+# Crear router
+router = APIRouter()
+
+@router.get("/pool-stats")
+def get_pool_stats(
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Devuelve el estado de los pools de conexiones de este proceso.
+    Útil para dimensionar los workers frente a max_connections de PostgreSQL.
+    """
+    pools = [
+        sync_pool_metrics.snapshot(engine.pool),
+        async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+    ]
+    
+    # Conexiones máximas que puede abrir este proceso entre ambos motores
+    max_connections = len(pools) * (POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"])
+    
+    return {
+        "config": POOL_OPTIONS,
+        "max_connections_per_worker": max_connections,
+        "pools": pools
+    }
@@ -1,12 +1,13 @@
 # backend/app/api/endpoints/invitations.py
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime, timezone
+from datetime import datetime
 import json
 from pydantic import BaseModel, EmailStr
 
-from app.db.base import get_db
+from app.db.base import get_async_db, utcnow
 from app.models.user import User
 from app.models.invitation import Invitation
 from app.models.organization import Organization
@@ -43,19 +44,20 @@ class InvitationAccept(BaseModel):
 async def create_invitation(
     invitation_data: InvitationCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)  # Solo admin puede invitar
 ):
     """
     Crea una invitación para un nuevo miembro del equipo.
     """
     # Verificar si ya existe una invitación para este email
-    existing_invitation = db.query(Invitation).filter(
+    result = await db.execute(select(Invitation).where(
         Invitation.organization_id == current_user.organization_id,
         Invitation.email == invitation_data.email,
         Invitation.is_accepted == False,
-        Invitation.expires_at > datetime.now(timezone.utc)
-    ).first()
+        Invitation.expires_at > utcnow()
+    ))
+    existing_invitation = result.scalars().first()
     
     if existing_invitation:
         raise HTTPException(
@@ -64,10 +66,11 @@ async def create_invitation(
         )
     
     # Verificar si ya existe un usuario con este email en la organización
-    existing_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.email == invitation_data.email,
         User.organization_id == current_user.organization_id
-    ).first()
+    ))
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(
@@ -90,11 +93,11 @@ async def create_invitation(
     )
     
     db.add(invitation)
-    db.commit()
-    db.refresh(invitation)
+    await db.commit()
+    await db.refresh(invitation)
     
     # Obtener información para el correo
-    organization = db.query(Organization).filter(Organization.id == current_user.organization_id).first()
+    organization = await db.get(Organization, current_user.organization_id)
     
     # Enviar correo electrónico de invitación
     await EmailService.send_invitation_email(
@@ -110,34 +113,36 @@ async def create_invitation(
 
 @router.get("/", response_model=List[InvitationResponse])
 async def list_invitations(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)  # Solo admin puede ver invitaciones
 ):
     """
     Lista todas las invitaciones activas de la organización.
     """
-    invitations = db.query(Invitation).filter(
+    result = await db.execute(select(Invitation).where(
         Invitation.organization_id == current_user.organization_id,
         Invitation.is_accepted == False,
-        Invitation.expires_at > datetime.now(timezone.utc)
-    ).all()
+        Invitation.expires_at > utcnow()
+    ))
+    invitations = result.scalars().all()
     
     return invitations
 
 @router.delete("/{invitation_id}", response_model=InvitationResponse)
 async def cancel_invitation(
     invitation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin)  # Solo admin puede cancelar invitaciones
 ):
     """
     Cancela una invitación existente.
     """
-    invitation = db.query(Invitation).filter(
+    result = await db.execute(select(Invitation).where(
         Invitation.id == invitation_id,
         Invitation.organization_id == current_user.organization_id,
         Invitation.is_accepted == False
-    ).first()
+    ))
+    invitation = result.scalars().first()
     
     if not invitation:
         raise HTTPException(
@@ -146,26 +151,27 @@ async def cancel_invitation(
         )
     
     # Establecer fecha de expiración como ahora para invalidarla
-    invitation.expires_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(invitation)
+    invitation.expires_at = utcnow()
+    await db.commit()
+    await db.refresh(invitation)
     
     return invitation
 
 @router.post("/accept", response_model=dict)
 async def accept_invitation(
     invitation_data: InvitationAccept,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Acepta una invitación y crea un nuevo usuario.
     """
     # Buscar la invitación por token
-    invitation = db.query(Invitation).filter(
+    result = await db.execute(select(Invitation).where(
         Invitation.token == invitation_data.token,
         Invitation.is_accepted == False,
-        Invitation.expires_at > datetime.now(timezone.utc)
-    ).first()
+        Invitation.expires_at > utcnow()
+    ))
+    invitation = result.scalars().first()
     
     if not invitation:
         raise HTTPException(
@@ -174,7 +180,8 @@ async def accept_invitation(
         )
     
     # Verificar si ya existe un usuario con este email
-    existing_user = db.query(User).filter(User.email == invitation.email).first()
+    result = await db.execute(select(User).where(User.email == invitation.email))
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(
@@ -197,8 +204,8 @@ async def accept_invitation(
     
     # Guardar cambios
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Generar token de acceso
     access_token = create_access_token(subject=user.id)
@@ -219,16 +226,17 @@ async def accept_invitation(
 @router.get("/verify/{token}")
 async def verify_invitation(
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Verifica si una invitación es válida.
     """
-    invitation = db.query(Invitation).filter(
+    result = await db.execute(select(Invitation).where(
         Invitation.token == token,
         Invitation.is_accepted == False,
-        Invitation.expires_at > datetime.now(timezone.utc)
-    ).first()
+        Invitation.expires_at > utcnow()
+    ))
+    invitation = result.scalars().first()
     
     if not invitation:
         raise HTTPException(
@@ -237,9 +245,7 @@ async def verify_invitation(
         )
     
     # Obtener organización
-    organization = db.query(Organization).filter(
-        Organization.id == invitation.organization_id
-    ).first()
+    organization = await db.get(Organization, invitation.organization_id)
     
     return {
         "valid": True,
@@ -1,10 +1,13 @@
 # backend/app/api/endpoints/kula.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+import json
+import logging
 
-from app.db.base import get_db
+from app.db.base import get_async_db, AsyncSessionLocal
 from app.models.user import User
 from app.api.deps import get_current_user
 from app.core.ai.kula_service import KulaService
@@ -35,6 +38,8 @@ class MessageResponse(BaseModel):
 # Crear router
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # Verificar configuración de OpenAI
 if not OpenAIConfig.validate():
     print("WARNING: OPENAI_API_KEY no está configurada. La funcionalidad de Kula estará limitada.")
@@ -42,7 +47,7 @@ if not OpenAIConfig.validate():
 @router.post("/query", response_model=KulaResponse)
 async def query_kula(
     query_data: KulaQuery,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -65,9 +70,57 @@ async def query_kula(
     
     return response
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formatea un evento Server-Sent Events.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/query/stream")
+async def stream_kula_query(
+    query_data: KulaQuery,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Envía una consulta a Kula y devuelve la respuesta como Server-Sent Events
+    a medida que se genera (eventos start, delta, done y error).
+    """
+    # Verificar configuración de OpenAI
+    if not OpenAIConfig.validate():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio de Kula no está disponible actualmente. Contacte al administrador."
+        )
+    
+    async def events():
+        # Sesión propia: las dependencias con yield se cierran antes de que
+        # termine de enviarse una respuesta en streaming
+        async with AsyncSessionLocal() as db:
+            kula_service = KulaService(db)
+            try:
+                async for event, data in kula_service.stream_query(
+                    user=current_user,
+                    query=query_data.query,
+                    conversation_id=query_data.conversation_id
+                ):
+                    yield _sse_event(event, data)
+            except Exception as e:
+                logger.error(f"Error al generar la respuesta de Kula: {e}")
+                await db.rollback()
+                yield _sse_event("error", {"detail": "No se pudo completar la respuesta de Kula."})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Evitar que un proxy acumule la respuesta
+        }
+    )
+
 @router.get("/conversations", response_model=List[ConversationResponse])
-def get_conversations(
-    db: Session = Depends(get_db),
+async def get_conversations(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100)
@@ -76,7 +129,7 @@ def get_conversations(
     Obtiene las conversaciones del usuario actual.
     """
     kula_service = KulaService(db)
-    conversations = kula_service.get_conversations(
+    conversations = await kula_service.get_conversations(
         user_id=current_user.id,
         skip=skip,
         limit=limit
@@ -85,16 +138,16 @@ def get_conversations(
     return conversations
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Obtiene los mensajes de una conversación específica.
     """
     kula_service = KulaService(db)
-    messages = kula_service.get_conversation_messages(
+    messages = await kula_service.get_conversation_messages(
         conversation_id=conversation_id,
         user_id=current_user.id
     )
@@ -108,16 +161,16 @@ def get_conversation_messages(
     return messages
 
 @router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def archive_conversation(
+async def archive_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Archiva una conversación.
     """
     kula_service = KulaService(db)
-    success = kula_service.archive_conversation(
+    success = await kula_service.archive_conversation(
         conversation_id=conversation_id,
         user_id=current_user.id
     )
@@ -131,7 +184,7 @@ def archive_conversation(
 @router.get("/help/{topic}", response_model=KulaResponse)
 async def get_help(
     topic: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -11,6 +11,9 @@ from app.models.pipeline_stage import PipelineStage
 from app.models.opportunity import Opportunity
 from app.models.stage_history import StageHistory
 from app.api.deps import get_current_user
+from app.api.pagination import CursorPage, cursor_pagination
+from app.services.kpi_service import KpiService
+from app.services.analytics_rollups import AnalyticsRollupService
 
 # Definir modelos Pydantic
 from pydantic import BaseModel, Field
@@ -136,6 +139,10 @@ def create_opportunity(
     )
     
     db.add(stage_history)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
     db.refresh(opportunity)
     
@@ -145,8 +152,7 @@ def create_opportunity(
 def list_opportunities(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100,
+    page: CursorPage = Depends(cursor_pagination),
     pipeline_id: Optional[int] = None,
     stage_id: Optional[int] = None,
     customer_id: Optional[int] = None,
@@ -182,8 +188,8 @@ def list_opportunities(
         search_term = f"%{search}%"
         query = query.filter(Opportunity.title.ilike(search_term))
     
-    # Aplicar paginación
-    opportunities = query.order_by(Opportunity.created_at.desc()).offset(skip).limit(limit).all()
+    # Aplicar paginación por cursor, de la más reciente a la más antigua
+    opportunities = page.paginate(query, Opportunity.created_at, Opportunity.id, descending=True)
     
     return opportunities
 
@@ -224,11 +230,17 @@ def update_opportunity(
     if not opportunity:
         raise HTTPException(status_code=404, detail="Oportunidad no encontrada")
     
+    # El día en que contaba como ganada puede cambiar: recalcular el resumen anterior
+    AnalyticsRollupService.mark_dirty(db, current_user.organization_id, [opportunity.updated_at])
+    
     # Actualizar campos
     update_data = opportunity_data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(opportunity, key, value)
     
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
     db.refresh(opportunity)
     
@@ -251,8 +263,20 @@ def delete_opportunity(
     if not opportunity:
         raise HTTPException(status_code=404, detail="Oportunidad no encontrada")
     
+    # Los días con la oportunidad o sus cambios de etapa deben recalcularse
+    AnalyticsRollupService.mark_dirty(
+        db,
+        current_user.organization_id,
+        [opportunity.created_at, opportunity.updated_at]
+        + [history.changed_at for history in opportunity.stage_history]
+    )
+    
     # Eliminar la oportunidad y su historial asociado
     db.delete(opportunity)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
     
     return {"success": True, "message": "Oportunidad eliminada correctamente"}
@@ -293,6 +317,9 @@ def change_stage(
     # Obtener la etapa anterior
     from_stage_id = opportunity.stage_id
     
+    # El día en que contaba como ganada puede cambiar: recalcular el resumen anterior
+    AnalyticsRollupService.mark_dirty(db, current_user.organization_id, [opportunity.updated_at])
+    
     # Calcular el tiempo en la etapa anterior
     now = datetime.now()
     time_in_stage = None
@@ -323,6 +350,10 @@ def change_stage(
     )
     
     db.add(stage_history)
+    
+    # Invalidar las instantáneas de KPIs del dashboard
+    KpiService.mark_stale(db, current_user.organization_id)
+    
     db.commit()
     db.refresh(opportunity)
     
@@ -10,6 +10,7 @@ from app.models.user import User
 from app.models.password_reset import PasswordReset
 from app.core.security import get_password_hash
 from app.services.email_service import EmailService
+from app.core.session_cache import principal_cache
 
 router = APIRouter()
 
@@ -118,4 +119,7 @@ async def verify_password_reset(
     # Guardar cambios
     db.commit()
     
+    # Las sesiones cacheadas del usuario deben volver a validarse
+    principal_cache.invalidate_user(user.id)
+    
     return {"message": "Contraseña actualizada correctamente"}
\ No newline at end of file
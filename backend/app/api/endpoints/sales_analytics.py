@@ -0,0 +1,68 @@
+# backend/app/api/endpoints/sales_analytics.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.core.dashboard_cache import cached_dashboard_endpoint
+from app.services.sales_analytics import SalesAnalyticsService
+
+# Crear router
+router = APIRouter()
+
+@router.get("/products/top")
+@cached_dashboard_endpoint("sales-top-products", params=("period", "limit", "metric", "order"))
+def get_top_products(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    period: str = "month",  # 'week', 'month', 'quarter', 'year'
+    limit: int = Query(10, ge=1, le=100),
+    metric: str = "revenue",  # 'quantity', 'revenue', 'orders'
+    order: str = "desc"  # 'desc': más vendidos, 'asc': menos vendidos
+):
+    """
+    Obtiene los productos más o menos vendidos del período.
+    """
+    analytics = SalesAnalyticsService(db)
+    return analytics.top_products(
+        organization_id=current_user.organization_id,
+        period=period,
+        limit=limit,
+        metric=metric,
+        ascending=order == "asc"
+    )
+
+@router.get("/heatmap")
+@cached_dashboard_endpoint("sales-heatmap", params=("period", "metric"))
+def get_sales_heatmap(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    period: str = "month",  # 'week', 'month', 'quarter', 'year'
+    metric: str = "orders"  # 'orders', 'revenue'
+):
+    """
+    Obtiene la matriz de ventas por día de la semana y hora (hora local de la organización).
+    """
+    analytics = SalesAnalyticsService(db)
+    return analytics.hourly_heatmap(
+        organization_id=current_user.organization_id,
+        period=period,
+        metric=metric
+    )
+
+@router.get("/margins")
+@cached_dashboard_endpoint("sales-margins", params=("period",))
+def get_margin_by_category(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    period: str = "month"  # 'week', 'month', 'quarter', 'year'
+):
+    """
+    Obtiene ingresos, costo y margen por categoría de producto.
+    """
+    analytics = SalesAnalyticsService(db)
+    return analytics.margin_by_category(
+        organization_id=current_user.organization_id,
+        period=period
+    )
@@ -0,0 +1,210 @@
+# backend/app/api/endpoints/segments.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Any, List, Optional
+
+from app.db.base import get_db
+from app.models.user import User
+from app.models.segment_definition import SegmentDefinition
+from app.api.deps import get_current_user, get_current_admin
+from app.services.segmentation import SegmentationEngine, SegmentRuleError, compile_rules
+from app.services.rfm_analysis import RfmAnalysisService
+
+# Definir modelos Pydantic
+from pydantic import BaseModel
+
+class SegmentDefinitionBase(BaseModel):
+    name: str
+    display_name: str
+    description: Optional[str] = None
+    color: Optional[str] = None
+    icon: Optional[str] = None
+    priority: Optional[int] = 100
+    rules: Any
+    is_active: Optional[bool] = True
+
+class SegmentDefinitionCreate(SegmentDefinitionBase):
+    pass
+
+class SegmentDefinitionUpdate(BaseModel):
+    name: Optional[str] = None
+    display_name: Optional[str] = None
+    description: Optional[str] = None
+    color: Optional[str] = None
+    icon: Optional[str] = None
+    priority: Optional[int] = None
+    rules: Optional[Any] = None
+    is_active: Optional[bool] = None
+
+class SegmentDefinitionResponse(SegmentDefinitionBase):
+    id: int
+    organization_id: int
+    is_system: Optional[bool] = False
+    
+    class Config:
+        from_attributes = True
+
+# Crear router
+router = APIRouter()
+
+def _check_unique_name(db: Session, organization_id: int, name: str, segment_id: Optional[int] = None) -> None:
+    """
+    Comprueba que la organización no tiene otro segmento con el mismo nombre.
+    """
+    query = db.query(SegmentDefinition.id).filter(
+        SegmentDefinition.organization_id == organization_id,
+        SegmentDefinition.name == name
+    )
+    if segment_id is not None:
+        query = query.filter(SegmentDefinition.id != segment_id)
+    if query.first():
+        raise HTTPException(status_code=400, detail="Ya existe un segmento con ese nombre")
+
+def _validate_rules(rules: Any) -> None:
+    """
+    Comprueba que las reglas se pueden traducir a SQL.
+    """
+    try:
+        compile_rules(rules)
+    except SegmentRuleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[SegmentDefinitionResponse])
+def list_segment_definitions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista los segmentos activos de la organización en orden de evaluación.
+    """
+    return SegmentationEngine(db).get_definitions(current_user.organization_id)
+
+@router.post("/", response_model=SegmentDefinitionResponse)
+def create_segment_definition(
+    segment_data: SegmentDefinitionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Crea un segmento personalizado con reglas sobre las métricas de compra y
+    reclasifica a los clientes de la organización.
+    Requiere permisos de administrador.
+    """
+    _validate_rules(segment_data.rules)
+    _check_unique_name(db, current_user.organization_id, segment_data.name)
+    
+    segment = SegmentDefinition(
+        **segment_data.dict(),
+        organization_id=current_user.organization_id,
+        is_system=False
+    )
+    
+    db.add(segment)
+    db.commit()
+    
+    SegmentationEngine(db).assign_segments(current_user.organization_id)
+    db.refresh(segment)
+    
+    return segment
+
+@router.put("/{segment_id}", response_model=SegmentDefinitionResponse)
+def update_segment_definition(
+    segment_id: int,
+    segment_data: SegmentDefinitionUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Actualiza un segmento de la organización y reclasifica a sus clientes.
+    Requiere permisos de administrador.
+    """
+    segment = db.query(SegmentDefinition).filter(
+        SegmentDefinition.id == segment_id,
+        SegmentDefinition.organization_id == current_user.organization_id
+    ).first()
+    
+    if not segment:
+        raise HTTPException(status_code=404, detail="Segmento no encontrado")
+    
+    update_data = segment_data.dict(exclude_unset=True)
+    if "rules" in update_data:
+        _validate_rules(update_data["rules"])
+    if update_data.get("name"):
+        _check_unique_name(db, current_user.organization_id, update_data["name"], segment.id)
+    
+    engine = SegmentationEngine(db)
+    
+    # Los clientes con el nombre anterior se liberan en la misma transacción
+    if update_data.get("name") and update_data["name"] != segment.name:
+        engine.release_segment(current_user.organization_id, segment.name)
+    
+    for key, value in update_data.items():
+        setattr(segment, key, value)
+    
+    db.commit()
+    
+    engine.assign_segments(current_user.organization_id)
+    db.refresh(segment)
+    
+    return segment
+
+@router.delete("/{segment_id}")
+def delete_segment_definition(
+    segment_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Elimina un segmento personalizado y reclasifica a sus clientes.
+    Los segmentos predefinidos solo se pueden desactivar.
+    Requiere permisos de administrador.
+    """
+    segment = db.query(SegmentDefinition).filter(
+        SegmentDefinition.id == segment_id,
+        SegmentDefinition.organization_id == current_user.organization_id
+    ).first()
+    
+    if not segment:
+        raise HTTPException(status_code=404, detail="Segmento no encontrado")
+    
+    if segment.is_system:
+        raise HTTPException(status_code=400, detail="Los segmentos predefinidos no se pueden eliminar")
+    
+    engine = SegmentationEngine(db)
+    engine.release_segment(current_user.organization_id, segment.name)
+    db.delete(segment)
+    db.commit()
+    
+    engine.assign_segments(current_user.organization_id)
+    
+    return {"message": "Segmento eliminado correctamente"}
+
+@router.post("/recalculate")
+def recalculate_segments(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Reclasifica a todos los clientes de la organización con un único UPDATE.
+    Requiere permisos de administrador.
+    """
+    updated = SegmentationEngine(db).assign_segments(current_user.organization_id)
+    
+    return {"updated_customers": updated}
+
+@router.post("/rfm")
+def calculate_rfm(
+    clusters: Optional[int] = Query(None, ge=2, le=12, description="Número de grupos KMeans (opcional)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Calcula las puntuaciones RFM (1 a 5) de los clientes con compras y,
+    opcionalmente, los agrupa con KMeans. Los resultados se guardan en el cliente
+    y pueden usarse en las reglas de los segmentos (rfm_score, rfm_cluster, ...).
+    Requiere permisos de administrador.
+    """
+    try:
+        return RfmAnalysisService(db).score(current_user.organization_id, n_clusters=clusters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
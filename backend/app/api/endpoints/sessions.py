@@ -1,14 +1,16 @@
 # backend/app/api/endpoints/sessions.py
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from typing import List
 from pydantic import BaseModel
 
-from app.db.base import get_db
+from app.db.base import get_async_db, utcnow
 from app.models.user import User
 from app.models.active_session import ActiveSession
 from app.api.deps import get_current_user
+from app.core.session_cache import principal_cache
 
 router = APIRouter()
 
@@ -27,7 +29,7 @@ class SessionResponse(BaseModel):
 @router.get("/", response_model=List[SessionResponse])
 async def get_active_sessions(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -38,11 +40,12 @@ async def get_active_sessions(
     current_token = auth_header.split("Bearer ")[1] if auth_header and "Bearer " in auth_header else None
     
     # Obtener todas las sesiones activas
-    sessions = db.query(ActiveSession).filter(
+    result = await db.execute(select(ActiveSession).where(
         ActiveSession.user_id == current_user.id,
         ActiveSession.is_active == True,
-        ActiveSession.expires_at > datetime.now(timezone.utc)
-    ).all()
+        ActiveSession.expires_at > utcnow()
+    ))
+    sessions = result.scalars().all()
     
     # Marcar la sesión actual
     session_responses = []
@@ -64,26 +67,29 @@ async def get_active_sessions(
 
 @router.delete("/all", summary="Revoca todas las sesiones")
 async def revoke_all_sessions(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Revoca todas las sesiones, incluida la actual.
     """
     # Actualizar todas las sesiones
-    db.query(ActiveSession).filter(
+    await db.execute(update(ActiveSession).where(
         ActiveSession.user_id == current_user.id,
         ActiveSession.is_active == True
-    ).update({"is_active": False})
+    ).values(is_active=False))
     
-    db.commit()
+    await db.commit()
+    
+    # Invalidar los principales cacheados del usuario
+    principal_cache.invalidate_user(current_user.id)
     
     return {"message": "Todas las sesiones han sido cerradas, deberá iniciar sesión nuevamente"}
 
 @router.delete("/all/except-current", summary="Revoca todas las sesiones excepto la actual")
 async def revoke_all_except_current(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -100,13 +106,17 @@ async def revoke_all_except_current(
         )
     
     # Actualizar todas las sesiones excepto la actual
-    db.query(ActiveSession).filter(
+    await db.execute(update(ActiveSession).where(
         ActiveSession.user_id == current_user.id,
         ActiveSession.token != current_token,
         ActiveSession.is_active == True
-    ).update({"is_active": False})
+    ).values(is_active=False))
+    
+    await db.commit()
     
-    db.commit()
+    # Invalidar los principales cacheados del usuario (la sesión actual
+    # simplemente se volverá a validar en la siguiente petición)
+    principal_cache.invalidate_user(current_user.id)
     
     return {"message": "Todas las demás sesiones han sido cerradas"}
 
@@ -114,17 +124,18 @@ async def revoke_all_except_current(
 @router.delete("/{session_id}", summary="Revoca una sesión específica")
 async def revoke_session(
     session_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Revoca una sesión específica.
     """
     # Buscar la sesión
-    session = db.query(ActiveSession).filter(
+    result = await db.execute(select(ActiveSession).where(
         ActiveSession.id == session_id,
         ActiveSession.user_id == current_user.id
-    ).first()
+    ))
+    session = result.scalars().first()
     
     if not session:
         raise HTTPException(
@@ -134,6 +145,9 @@ async def revoke_session(
     
     # Desactivar la sesión
     session.is_active = False
-    db.commit()
+    await db.commit()
+    
+    # Invalidar el principal cacheado para el token de esta sesión
+    principal_cache.invalidate_token(session.token)
     
     return {"message": "Sesión cerrada correctamente"}
\ No newline at end of file
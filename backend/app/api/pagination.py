@@ -0,0 +1,147 @@
+# backend/app/api/pagination.py
+"""
+Paginación por cursor (keyset) compartida por los endpoints de listado.
+En lugar de offset(skip), cada página continúa a partir de la pareja
+(clave de orden, id) del último elemento devuelto, de modo que las páginas
+profundas cuestan lo mismo que la primera.
+
+El cursor de la página siguiente se devuelve en la cabecera X-Next-Cursor;
+el cuerpo de la respuesta sigue siendo la lista de elementos.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query as ORMQuery
+
+# Cabecera con el cursor de la página siguiente
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Tamaño máximo de página permitido
+MAX_PAGE_SIZE = 500
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+def encode_cursor(sort_key: str, sort_value: Any, id_value: int) -> str:
+    """
+    Genera un cursor opaco a partir de la posición del último elemento.
+    """
+    payload = json.dumps(
+        {"k": sort_key, "v": _encode_value(sort_value), "id": id_value},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_key: str) -> tuple:
+    """
+    Recupera (valor de orden, id) de un cursor.
+    Lanza un error 400 si el cursor no es válido o pertenece a otro listado.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if payload["k"] != sort_key:
+            raise ValueError("El cursor pertenece a otro orden")
+        return _decode_value(payload["v"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+class CursorPage:
+    """
+    Parámetros de paginación de una petición.
+    Se obtiene con la dependencia `cursor_pagination`.
+    """
+    def __init__(self, response: Response, limit: int, skip: int = 0, cursor: Optional[str] = None):
+        self.response = response
+        self.limit = limit
+        self.skip = skip
+        self.cursor = cursor
+
+    def position(self, sort_key: str) -> Optional[tuple]:
+        """
+        Devuelve (valor de orden, id) del cursor recibido, o None en la primera página.
+        """
+        if not self.cursor:
+            return None
+        return decode_cursor(self.cursor, sort_key)
+
+    def set_next(self, sort_key: str, sort_value: Any, id_value: int) -> None:
+        """
+        Publica el cursor de la página siguiente en la cabecera de la respuesta.
+        """
+        self.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key, sort_value, id_value)
+
+    def paginate(self, query: ORMQuery, sort_column, id_column, descending: bool = False) -> List[Any]:
+        """
+        Aplica el orden, el predicado keyset y el límite a la consulta.
+
+        Args:
+            query: Consulta ya filtrada
+            sort_column: Columna de orden (puede ser la misma que id_column)
+            id_column: Clave primaria, usada para desempatar
+            descending: Si el listado va de mayor a menor
+
+        Returns:
+            Lista con los elementos de la página
+        """
+        single_key = sort_column is id_column
+        sort_key = sort_column.key
+
+        if self.cursor:
+            sort_value, id_value = decode_cursor(self.cursor, sort_key)
+            if single_key:
+                position = id_column < id_value if descending else id_column > id_value
+            else:
+                row = tuple_(sort_column, id_column)
+                boundary = tuple_(sort_value, id_value)
+                position = row < boundary if descending else row > boundary
+            query = query.filter(position)
+        elif self.skip:
+            # Compatibilidad con clientes que aún paginan con skip
+            query = query.offset(self.skip)
+
+        if single_key:
+            order = [id_column.desc() if descending else id_column.asc()]
+        else:
+            order = [
+                sort_column.desc() if descending else sort_column.asc(),
+                id_column.desc() if descending else id_column.asc(),
+            ]
+
+        # Pedir un elemento de más para saber si existe una página siguiente
+        items = query.order_by(*order).limit(self.limit + 1).all()
+
+        if len(items) > self.limit:
+            items = items[:self.limit]
+            last = items[-1]
+            self.set_next(sort_key, getattr(last, sort_key), getattr(last, id_column.key))
+
+        return items
+
+def cursor_pagination(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en X-Next-Cursor por la página anterior"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0, description="Desplazamiento clásico; se ignora si se envía cursor")
+) -> CursorPage:
+    """
+    Dependencia con los parámetros de paginación de los listados.
+    """
+    return CursorPage(response=response, limit=limit, skip=skip, cursor=cursor)
@@ -0,0 +1,164 @@
+"""
+Escritura diferida y agrupada de la última actividad de las sesiones.
+En lugar de actualizar ActiveSession.last_activity (y hacer commit) en cada
+petición, las sesiones tocadas se acumulan en memoria y se escriben con un
+único UPDATE cada cierto tiempo o al alcanzar un número máximo de sesiones.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import case, update
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.active_session import ActiveSession
+
+logger = logging.getLogger(__name__)
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Las columnas DateTime sin zona horaria se guardan en UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class ActivityFlusher:
+    """
+    Acumula las sesiones con actividad y las persiste en lote desde un hilo en segundo plano.
+    """
+    def __init__(
+        self,
+        flush_interval_seconds: float = 10.0,
+        max_batch_size: int = 500,
+        min_resolution_seconds: float = 60.0,
+    ):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+        self.min_resolution = timedelta(seconds=min_resolution_seconds)
+
+        # session_id -> momento de la última actividad pendiente de escribir
+        self._pending: Dict[int, datetime] = {}
+        # session_id -> última actividad conocida (escrita o pendiente)
+        self._last_seen: Dict[int, datetime] = {}
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, session_id: int, last_activity: Optional[datetime] = None) -> bool:
+        """
+        Registra actividad en una sesión.
+
+        Args:
+            session_id: ID de la sesión activa
+            last_activity: Última actividad conocida en la base de datos (opcional)
+
+        Returns:
+            True si la actividad quedó pendiente de escribir, False si la
+            sesión se tocó hace menos que la resolución mínima
+        """
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            known = self._last_seen.get(session_id)
+            last_activity = _as_utc(last_activity)
+            if last_activity is not None and (known is None or last_activity > known):
+                known = last_activity
+
+            if known is not None and now - known < self.min_resolution:
+                return False
+
+            self._pending[session_id] = now
+            self._last_seen[session_id] = now
+            batch_full = len(self._pending) >= self.max_batch_size
+
+        # Despertar al hilo para no esperar al intervalo si el lote está lleno
+        if batch_full:
+            self._wakeup.set()
+
+        return True
+
+    def flush(self) -> int:
+        """
+        Escribe todas las actividades pendientes con un único UPDATE.
+
+        Returns:
+            Número de sesiones actualizadas
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+            # Olvidar sesiones que de todos modos volverían a escribirse
+            cutoff = datetime.now(timezone.utc) - self.min_resolution
+            self._last_seen = {
+                session_id: seen for session_id, seen in self._last_seen.items()
+                if seen > cutoff
+            }
+
+        if not pending:
+            return 0
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(ActiveSession)
+                .where(ActiveSession.id.in_(list(pending.keys())))
+                .values(last_activity=case(pending, value=ActiveSession.id))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"No se pudo guardar la actividad de {len(pending)} sesiones: {e}")
+
+            # Devolver las actividades a la cola sin pisar otras más recientes
+            with self._lock:
+                for session_id, seen in pending.items():
+                    current = self._pending.get(session_id)
+                    if current is None or current < seen:
+                        self._pending[session_id] = seen
+            return 0
+        finally:
+            db.close()
+
+        return len(pending)
+
+    def start(self) -> None:
+        """
+        Inicia el hilo que vacía periódicamente la cola.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Detiene el hilo y escribe lo que quede pendiente.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=self.flush_interval_seconds)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            self.flush()
+
+# Instancia compartida por todo el proceso
+activity_flusher = ActivityFlusher(
+    flush_interval_seconds=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    max_batch_size=settings.ACTIVITY_FLUSH_MAX_BATCH,
+    min_resolution_seconds=settings.ACTIVITY_MIN_RESOLUTION_SECONDS,
+)
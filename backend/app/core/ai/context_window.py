@@ -0,0 +1,140 @@
+# backend/app/core/ai/context_window.py
+"""
+Ventana de contexto de las conversaciones con Kula.
+
+En cada turno solo se envían al modelo los últimos K mensajes literales y un
+resumen acumulado de los anteriores, guardado en Conversation.meta_info. Los
+mensajes se leen en orden descendente por (conversation_id, created_at) con
+un límite fijo, de modo que la lectura, la memoria y los tokens de cada turno
+no crecen con la longitud de la conversación.
+
+Los mensajes que salen de la ventana se incorporan al resumen por lotes de
+`summary_batch` mensajes, del más antiguo sin resumir al más reciente, como
+máximo un lote por turno; hasta entonces no se envían al modelo. Así, una
+conversación larga anterior a la ventana se resume por completo en varios
+turnos sin que cada turno lea todo el historial.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+
+# Clave de Conversation.meta_info con el resumen acumulado
+SUMMARY_KEY = "context_summary"
+
+ROLE_LABELS = {
+    "user": "Usuario",
+    "assistant": "Kula",
+    "system": "Sistema",
+}
+
+def extractive_summary(previous: Optional[str], messages: List[Message], max_chars: int) -> str:
+    """
+    Resumen sin modelo: una línea breve por mensaje, conservando lo más reciente
+    cuando se supera el tamaño máximo.
+    """
+    lines = [previous] if previous else []
+    for message in messages:
+        text = " ".join(message.content.split())
+        if len(text) > 200:
+            text = text[:197] + "..."
+        lines.append(f"- {ROLE_LABELS.get(message.role, message.role)}: {text}")
+
+    summary = "\n".join(lines)
+    if len(summary) > max_chars:
+        summary = "..." + summary[-(max_chars - 3):]
+    return summary
+
+class ConversationContext:
+    """
+    Gestiona qué parte del historial de una conversación se envía al modelo.
+    """
+    def __init__(
+        self,
+        db: AsyncSession,
+        summarizer=None,
+        window_messages: int = settings.KULA_CONTEXT_MESSAGES,
+        summary_batch: int = settings.KULA_SUMMARY_BATCH_MESSAGES,
+        summary_max_chars: int = settings.KULA_SUMMARY_MAX_CHARS,
+    ):
+        """
+        Args:
+            db: Sesión asíncrona
+            summarizer: Función asíncrona (resumen_anterior, mensajes) -> resumen;
+                por defecto un resumen extractivo sin llamadas al modelo
+            window_messages: Mensajes recientes que se envían literalmente (K)
+            summary_batch: Mensajes fuera de la ventana que disparan una actualización del resumen
+            summary_max_chars: Longitud máxima del resumen
+        """
+        self.db = db
+        self.summarizer = summarizer
+        self.window_messages = window_messages
+        self.summary_batch = summary_batch
+        self.summary_max_chars = summary_max_chars
+
+    async def build(self, conversation: Conversation) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Obtiene el historial a enviar y actualiza el resumen si hace falta.
+        No confirma la transacción.
+
+        Returns:
+            (mensajes recientes en orden cronológico, resumen de los anteriores o None)
+        """
+        state = dict((conversation.meta_info or {}).get(SUMMARY_KEY) or {})
+        summary = state.get("summary")
+
+        # Solo los mensajes posteriores a lo ya resumido, como máximo K + lote
+        query = select(Message).where(Message.conversation_id == conversation.id)
+        if state.get("until_id") is not None:
+            query = query.where(Message.id > state["until_id"])
+        result = await self.db.execute(
+            query.order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(self.window_messages + self.summary_batch)
+        )
+        messages = list(reversed(result.scalars().all()))
+
+        overflow = len(messages) - self.window_messages
+        if self.summary_batch > 0 and overflow >= self.summary_batch:
+            # Se resume el lote más antiguo sin resumir, no el que precede a la
+            # ventana: en conversaciones largas puede haber más mensajes antes de
+            # los leídos, y se incorporan en orden en los turnos siguientes
+            result = await self.db.execute(
+                query.order_by(Message.created_at.asc(), Message.id.asc())
+                .limit(self.summary_batch)
+            )
+            folded = list(result.scalars().all())
+            summary = await self._summarize(summary, folded)
+
+            state.update({
+                "summary": summary,
+                "until_id": folded[-1].id,
+                "messages": state.get("messages", 0) + len(folded),
+            })
+            # Reasignar el diccionario para que SQLAlchemy detecte el cambio en la columna JSON
+            conversation.meta_info = {**(conversation.meta_info or {}), SUMMARY_KEY: state}
+
+        # Nunca más de K mensajes literales: los que salieron de la ventana y aún
+        # no están resumidos quedan pendientes para los siguientes resúmenes
+        messages = messages[-self.window_messages:] if self.window_messages > 0 else []
+
+        history = [{"role": message.role, "content": message.content} for message in messages]
+        return history, summary
+
+    async def _summarize(self, previous: Optional[str], messages: List[Message]) -> str:
+        if self.summarizer is not None:
+            summary = await self.summarizer(previous, messages)
+            if summary:
+                return summary[-self.summary_max_chars:]
+        return extractive_summary(previous, messages, self.summary_max_chars)
+
+def with_summary(system_message: str, summary: Optional[str]) -> str:
+    """
+    Añade el resumen de la conversación al mensaje de sistema.
+    """
+    if not summary:
+        return system_message
+    return f"{system_message}\n\nResumen de la conversación anterior:\n{summary}"
@@ -2,26 +2,30 @@
 """
 Servicio principal para Kula, el asistente de IA de PymeAI.
 """
-from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import json
+import time
 
 from app.models.user import User
+from app.models.organization import Organization
 from app.models.conversation import Conversation
 from app.models.message import Message
-from .openai_service import OpenAIService
+from .context_window import ConversationContext, with_summary
+from .openai_service import openai_service
 
 class KulaService:
     """
     Servicio para manejar las interacciones con Kula.
     """
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """
         Inicializa el servicio con una conexión a la base de datos.
         """
         self.db = db
-        self.openai_service = OpenAIService()
+        self.openai_service = openai_service
     
     async def process_query(
         self, 
@@ -40,52 +44,14 @@ class KulaService:
         Returns:
             Un diccionario con la respuesta y metadatos
         """
-        # Obtener o crear conversación
-        conversation = None
-        if conversation_id:
-            conversation = self.db.query(Conversation).filter(
-                Conversation.id == conversation_id,
-                Conversation.user_id == user.id
-            ).first()
-        
-        if not conversation:
-            # Crear nueva conversación
-            conversation = Conversation(
-                user_id=user.id,
-                organization_id=user.organization_id,
-                title=self._generate_title(query)
-            )
-            self.db.add(conversation)
-            self.db.flush()  # Para obtener el ID asignado
-        
-        # Obtener historial de mensajes para contexto
-        messages_history = []
-        if conversation_id:
-            db_messages = self.db.query(Message).filter(
-                Message.conversation_id == conversation.id
-            ).order_by(Message.created_at).all()
-            
-            messages_history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in db_messages
-            ]
-        
-        # Guardar mensaje del usuario
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=query
-        )
-        self.db.add(user_message)
-        
-        # Añadir contexto específico para PymeAI
-        system_message = self._get_system_message(user)
+        conversation, messages_history, system_message = await self._start_turn(user, query, conversation_id)
         
         # Obtener respuesta de OpenAI
         response_text = await self.openai_service.generate_response(
             prompt=query,
             system_message=system_message,
-            conversation_history=messages_history
+            conversation_history=messages_history,
+            organization_id=user.organization_id
         )
         
         # Guardar respuesta de Kula
@@ -104,7 +70,10 @@ class KulaService:
         conversation.updated_at = datetime.now()
         
         # Guardar cambios
-        self.db.commit()
+        await self.db.commit()
+        
+        # Cargar la fecha de creación asignada por la base de datos
+        await self.db.refresh(assistant_message)
         
         # Devolver respuesta con metadatos
         return {
@@ -113,7 +82,132 @@ class KulaService:
             "created_at": assistant_message.created_at.isoformat()
         }
     
-    def get_conversations(self, user_id: int, limit: int = 10, skip: int = 0) -> List[Dict[str, Any]]:
+    async def stream_query(
+        self,
+        user: User,
+        query: str,
+        conversation_id: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Procesa una consulta del usuario devolviendo la respuesta de Kula a
+        medida que se genera.
+        
+        El mensaje del usuario se confirma antes de llamar al modelo, de modo
+        que no queda una transacción abierta durante la generación; la
+        respuesta se guarda una sola vez al terminar, con su consumo de tokens.
+        
+        Args:
+            user: El usuario que realiza la consulta
+            query: La consulta del usuario
+            conversation_id: ID de la conversación si es una continuación (opcional)
+            
+        Yields:
+            Eventos (tipo, datos): "start" con la conversación, "delta" con cada
+            fragmento de texto y "done" con el mensaje guardado
+        """
+        started = time.perf_counter()
+        conversation, messages_history, system_message = await self._start_turn(user, query, conversation_id)
+        conversation.updated_at = datetime.now()
+        await self.db.commit()
+        
+        yield "start", {"conversation_id": conversation.id}
+        
+        usage: Dict[str, Any] = {}
+        parts = []
+        first_token_ms = None
+        async for chunk in self.openai_service.stream_response(
+            prompt=query,
+            system_message=system_message,
+            conversation_history=messages_history,
+            usage=usage,
+            organization_id=user.organization_id
+        ):
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000)
+            parts.append(chunk)
+            yield "delta", {"content": chunk}
+        
+        response_text = "".join(parts)
+        
+        # Guardar respuesta de Kula
+        assistant_message = Message(
+            conversation_id=conversation.id,
+            role="assistant",
+            content=response_text,
+            tokens=usage.get("completion_tokens"),
+            meta_info={
+                "prompt_tokens": usage.get("prompt_tokens"),
+                "first_token_ms": first_token_ms,
+                "duration_ms": round((time.perf_counter() - started) * 1000),
+                "streamed": True
+            }
+        )
+        self.db.add(assistant_message)
+        conversation.updated_at = datetime.now()
+        await self.db.commit()
+        
+        # Cargar la fecha de creación asignada por la base de datos
+        await self.db.refresh(assistant_message)
+        
+        yield "done", {
+            "conversation_id": conversation.id,
+            "message_id": assistant_message.id,
+            "tokens": assistant_message.tokens,
+            "created_at": assistant_message.created_at.isoformat()
+        }
+    
+    async def _start_turn(
+        self,
+        user: User,
+        query: str,
+        conversation_id: Optional[int] = None
+    ) -> Tuple[Conversation, List[Dict[str, str]], str]:
+        """
+        Prepara un turno de la conversación: obtiene o crea la conversación,
+        carga el contexto y añade el mensaje del usuario (sin confirmar).
+        
+        Returns:
+            (conversación, historial para el modelo, mensaje de sistema)
+        """
+        # Obtener o crear conversación
+        conversation = None
+        if conversation_id:
+            result = await self.db.execute(select(Conversation).where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user.id
+            ))
+            conversation = result.scalars().first()
+        
+        if not conversation:
+            # Crear nueva conversación
+            conversation = Conversation(
+                user_id=user.id,
+                organization_id=user.organization_id,
+                title=self._generate_title(query)
+            )
+            self.db.add(conversation)
+            await self.db.flush()  # Para obtener el ID asignado
+        
+        # Obtener historial de mensajes para contexto: últimos mensajes y resumen de los anteriores
+        messages_history = []
+        summary = None
+        if conversation_id:
+            messages_history, summary = await ConversationContext(self.db).build(conversation)
+        
+        # Guardar mensaje del usuario
+        user_message = Message(
+            conversation_id=conversation.id,
+            role="user",
+            content=query
+        )
+        self.db.add(user_message)
+        
+        # Añadir contexto específico para PymeAI
+        system_message = with_summary(await self._get_system_message(user), summary)
+        
+        return conversation, messages_history, system_message
+    
+    async def get_conversations(self, user_id: int, limit: int = 10, skip: int = 0) -> List[Dict[str, Any]]:
         """
         Obtiene las conversaciones del usuario.
         
@@ -125,10 +219,11 @@ class KulaService:
         Returns:
             Lista de conversaciones
         """
-        conversations = self.db.query(Conversation).filter(
+        result = await self.db.execute(select(Conversation).where(
             Conversation.user_id == user_id,
             Conversation.is_archived == False
-        ).order_by(Conversation.updated_at.desc()).offset(skip).limit(limit).all()
+        ).order_by(Conversation.updated_at.desc()).offset(skip).limit(limit))
+        conversations = result.scalars().all()
         
         return [
             {
@@ -140,7 +235,7 @@ class KulaService:
             for conv in conversations
         ]
     
-    def get_conversation_messages(self, conversation_id: int, user_id: int) -> List[Dict[str, Any]]:
+    async def get_conversation_messages(self, conversation_id: int, user_id: int) -> List[Dict[str, Any]]:
         """
         Obtiene los mensajes de una conversación.
         
@@ -152,18 +247,20 @@ class KulaService:
             Lista de mensajes
         """
         # Verificar que la conversación pertenece al usuario
-        conversation = self.db.query(Conversation).filter(
+        result = await self.db.execute(select(Conversation).where(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id
-        ).first()
+        ))
+        conversation = result.scalars().first()
         
         if not conversation:
             return []
         
         # Obtener mensajes
-        messages = self.db.query(Message).filter(
+        result = await self.db.execute(select(Message).where(
             Message.conversation_id == conversation_id
-        ).order_by(Message.created_at).all()
+        ).order_by(Message.created_at))
+        messages = result.scalars().all()
         
         return [
             {
@@ -175,7 +272,7 @@ class KulaService:
             for msg in messages
         ]
     
-    def archive_conversation(self, conversation_id: int, user_id: int) -> bool:
+    async def archive_conversation(self, conversation_id: int, user_id: int) -> bool:
         """
         Archiva una conversación.
         
@@ -186,16 +283,17 @@ class KulaService:
         Returns:
             True si se archivó correctamente, False en caso contrario
         """
-        conversation = self.db.query(Conversation).filter(
+        result = await self.db.execute(select(Conversation).where(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id
-        ).first()
+        ))
+        conversation = result.scalars().first()
         
         if not conversation:
             return False
         
         conversation.is_archived = True
-        self.db.commit()
+        await self.db.commit()
         
         return True
     
@@ -208,13 +306,16 @@ class KulaService:
             return query[:47] + "..."
         return query
     
-    def _get_system_message(self, user: User) -> str:
+    async def _get_system_message(self, user: User) -> str:
         """
         Crea un mensaje de sistema personalizado con contexto específico.
         """
+        # El usuario autenticado no tiene relaciones cargadas: consultar la organización
+        organization = await self.db.get(Organization, user.organization_id)
+        
         return (
             f"Eres Kula, el asistente de IA para PymeAI, una plataforma para pequeñas y medianas empresas en Costa Rica. "
-            f"Estás hablando con {user.first_name} {user.last_name}, quien trabaja para {user.organization.name}. "
+            f"Estás hablando con {user.first_name} {user.last_name}, quien trabaja para {organization.name}. "
             f"Tu objetivo es ayudar a los usuarios a entender sus datos comerciales, responder preguntas sobre el sistema "
             f"y proporcionar recomendaciones para mejorar su negocio. "
             f"Cuando respondas preguntas sobre el sistema, debes mencionar que PymeAI incluye: "
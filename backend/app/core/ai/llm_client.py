@@ -0,0 +1,254 @@
+# backend/app/core/ai/llm_client.py
+"""
+Cliente asíncrono compartido para la API de chat compatible con OpenAI.
+
+Un único httpx.AsyncClient por proceso mantiene las conexiones abiertas
+(keep-alive) entre peticiones, con tiempos de espera por petición. Los
+errores transitorios (429, 5xx, fallos de conexión) se reintentan con espera
+exponencial aleatoria, respetando Retry-After, y cada organización tiene un
+número máximo de peticiones simultáneas para que una sola no acapare el
+límite del proveedor.
+
+La URL base es configurable, de modo que las pruebas pueden apuntar el
+cliente a un servidor local (ver tests/fake_llm_server.py).
+"""
+import asyncio
+import json
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .openai_config import OpenAIConfig
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Respuestas que se reintentan
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Espera base del primer reintento (segundos)
+RETRY_BASE_DELAY = 0.5
+
+class OpenAIServiceError(Exception):
+    """
+    Error devuelto por la API del modelo.
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMClient:
+    """
+    Cliente de la API de chat con conexiones compartidas, reintentos y
+    límite de concurrencia por organización.
+    """
+    def __init__(self, **options):
+        """
+        Args:
+            options: Valores que sustituyen a los de OpenAIConfig (api_key, base_url,
+                timeout, connect_timeout, max_connections, max_retries,
+                retry_max_delay, org_concurrency)
+        """
+        self._client = None
+        self._loop = None
+        self._org_slots: Dict[int, asyncio.Semaphore] = {}
+        self.configure(**options)
+
+    def configure(self, **options) -> None:
+        """
+        Cambia la configuración del cliente. Las conexiones existentes se
+        descartan y se abren de nuevo en la siguiente petición.
+        """
+        config = {**OpenAIConfig.get_config(), **options}
+        self.api_key = config["api_key"]
+        self.base_url = config["base_url"]
+        self.timeout = config["timeout"]
+        self.connect_timeout = config["connect_timeout"]
+        self.max_connections = config["max_connections"]
+        self.max_retries = config["max_retries"]
+        self.retry_max_delay = config["retry_max_delay"]
+        self.org_concurrency = config["org_concurrency"]
+
+        # El cliente anterior se cierra en el bucle de eventos al que pertenece
+        self._discard()
+
+    @property
+    def available(self) -> bool:
+        """
+        Indica si hay API KEY y httpx para llamar al modelo.
+        """
+        return bool(self.api_key) and httpx is not None
+
+    async def chat(self, payload: Dict[str, Any], organization_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Envía una petición de chat completa y devuelve la respuesta JSON.
+        Los errores al leer el cuerpo (p. ej. ReadTimeout) se reintentan como
+        los de la petición y, agotados los intentos, se lanzan como OpenAIServiceError.
+
+        Args:
+            payload: Cuerpo de la petición (model, messages, ...)
+            organization_id: Organización que realiza la petición (límite de concurrencia)
+        """
+        async with self._org_slot(organization_id):
+            for attempt in range(self.max_retries + 1):
+                response = await self._send({**payload, "stream": False})
+                try:
+                    body = await response.aread()
+                except httpx.HTTPError as e:
+                    # Nada se ha devuelto todavía: se puede repetir la petición completa
+                    if attempt == self.max_retries:
+                        raise OpenAIServiceError(f"Respuesta del modelo interrumpida: {e}") from e
+                    delay = self._backoff(attempt)
+                    logger.warning(f"Error al leer la respuesta del modelo ({e!r}); reintento en {delay:.2f} s")
+                    await asyncio.sleep(delay)
+                    continue
+                finally:
+                    await response.aclose()
+
+                try:
+                    return json.loads(body)
+                except ValueError as e:
+                    raise OpenAIServiceError(f"Respuesta no válida de la API del modelo: {e}") from e
+
+    async def stream_chat(
+        self,
+        payload: Dict[str, Any],
+        organization_id: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Envía una petición de chat en streaming y devuelve cada evento JSON.
+        Solo se reintenta antes de recibir la respuesta: una vez enviado
+        algún fragmento al usuario, los errores se propagan.
+
+        Args:
+            payload: Cuerpo de la petición (model, messages, ...)
+            organization_id: Organización que realiza la petición (límite de concurrencia)
+        """
+        async with self._org_slot(organization_id):
+            response = await self._send({**payload, "stream": True})
+            try:
+                async for line in response.aiter_lines():
+                    # Formato SSE: líneas "data: {...}" y "data: [DONE]" al final
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    yield json.loads(data)
+            except httpx.HTTPError as e:
+                raise OpenAIServiceError(f"Respuesta del modelo interrumpida: {e}") from e
+            finally:
+                await response.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Cierra las conexiones abiertas (al apagar la aplicación).
+        """
+        client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            await client.aclose()
+
+    async def _send(self, payload: Dict[str, Any]) -> "httpx.Response":
+        """
+        Envía la petición con reintentos y devuelve la respuesta abierta
+        (en streaming) con un estado correcto.
+        """
+        if httpx is None:
+            raise OpenAIServiceError("httpx no está instalado")
+
+        client = self._get_client()
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            request = client.build_request("POST", "/chat/completions", json=payload, headers=headers)
+            try:
+                response = await client.send(request, stream=True)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise OpenAIServiceError(f"No se pudo conectar con la API del modelo: {e}") from e
+                delay = self._backoff(attempt)
+                logger.warning(f"Error de conexión con la API del modelo ({e}); reintento en {delay:.2f} s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code < 400:
+                return response
+
+            body = await response.aread()
+            await response.aclose()
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                delay = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(f"La API del modelo respondió {response.status_code}; reintento en {delay:.2f} s")
+                await asyncio.sleep(delay)
+                continue
+
+            raise OpenAIServiceError(
+                f"Error {response.status_code} de la API del modelo: {body.decode(errors='replace')[:200]}",
+                status_code=response.status_code
+            )
+
+    def _backoff(self, attempt: int) -> float:
+        # Espera exponencial con aleatoriedad completa para no sincronizar los reintentos
+        return random.uniform(0, min(self.retry_max_delay, RETRY_BASE_DELAY * 2 ** attempt))
+
+    def _retry_after(self, response: "httpx.Response") -> Optional[float]:
+        try:
+            return min(float(response.headers["Retry-After"]), self.retry_max_delay)
+        except (KeyError, ValueError):
+            return None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # Las conexiones pertenecen al bucle de eventos que las abrió
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._discard()
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+            self._loop = loop
+            self._org_slots = {}
+        return self._client
+
+    def _discard(self) -> None:
+        client, loop = self._client, self._loop
+        self._client, self._loop = None, None
+        self._org_slots = {}
+        if client is None or loop is None or loop.is_closed():
+            return
+
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if loop is current:
+            loop.create_task(client.aclose())
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    @asynccontextmanager
+    async def _org_slot(self, organization_id: Optional[int]):
+        if organization_id is None or self.org_concurrency <= 0:
+            yield
+            return
+
+        # Crear el cliente antes para que los semáforos sean del bucle actual
+        self._get_client()
+        slot = self._org_slots.get(organization_id)
+        if slot is None:
+            slot = self._org_slots[organization_id] = asyncio.Semaphore(self.org_concurrency)
+        async with slot:
+            yield
+
+# Instancia compartida por todo el proceso
+llm_client = LLMClient()
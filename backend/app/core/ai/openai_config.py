@@ -19,6 +19,15 @@ class OpenAIConfig:
     model: str = os.getenv("OPENAI_MODEL", "gpt-4o")
     temperature: float = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     max_tokens: int = int(os.getenv("OPENAI_MAX_TOKENS", "1000"))
+    # API compatible con OpenAI (permite apuntar a otro proveedor o a un servidor local)
+    base_url: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    timeout: float = float(os.getenv("OPENAI_TIMEOUT", "60"))  # Máximo entre dos fragmentos de la respuesta
+    connect_timeout: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    # Cliente compartido: conexiones reutilizables, reintentos y límite por organización
+    max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+    max_retries: int = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+    retry_max_delay: float = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "8"))
+    org_concurrency: int = int(os.getenv("OPENAI_ORG_CONCURRENCY", "4"))  # Peticiones simultáneas por organización
     
     @classmethod
     def get_config(cls):
@@ -29,7 +38,14 @@ class OpenAIConfig:
             "api_key": cls.api_key,
             "model": cls.model,
             "temperature": cls.temperature,
-            "max_tokens": cls.max_tokens
+            "max_tokens": cls.max_tokens,
+            "base_url": cls.base_url,
+            "timeout": cls.timeout,
+            "connect_timeout": cls.connect_timeout,
+            "max_connections": cls.max_connections,
+            "max_retries": cls.max_retries,
+            "retry_max_delay": cls.retry_max_delay,
+            "org_concurrency": cls.org_concurrency
         }
     
     @classmethod
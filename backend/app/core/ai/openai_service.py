@@ -2,62 +2,151 @@
 """
 Servicio para interactuar con la API de OpenAI.
 """
-from typing import List, Dict, Any, Optional
+import logging
+import re
+from typing import List, Dict, Any, Optional, AsyncIterator
 from .openai_config import OpenAIConfig
+from .llm_client import LLMClient, OpenAIServiceError, llm_client
+
+logger = logging.getLogger(__name__)
 
 class OpenAIService:
     """
     Servicio para interactuar con la API de OpenAI.
     """
-    def __init__(self):
+    def __init__(self, client: Optional[LLMClient] = None):
         """
         Inicializa el servicio con la configuración de OpenAI.
+        
+        Args:
+            client: Cliente de la API (por defecto, el compartido por el proceso)
         """
         config = OpenAIConfig.get_config()
-        self.api_key = config["api_key"]
+        self.client = client or llm_client
         self.model = config["model"]
         self.temperature = config["temperature"]
         self.max_tokens = config["max_tokens"]
     
+    def _build_messages(
+        self,
+        prompt: str,
+        system_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Construye la lista de mensajes en el formato de la API de chat.
+        """
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _payload(
+        self,
+        prompt: str,
+        system_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": self._build_messages(prompt, system_message, conversation_history),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        system_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        usage: Optional[Dict[str, Any]] = None,
+        organization_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Genera la respuesta en fragmentos a medida que el modelo los produce
+        (API de chat con stream=true). Sin API KEY, o sin httpx instalado, se
+        trocea la respuesta simulada.
+        
+        Args:
+            prompt: El mensaje del usuario
+            system_message: Instrucciones para el modelo (opcional)
+            conversation_history: Historial de conversación anterior (opcional)
+            usage: Diccionario que se completa al terminar con prompt_tokens y completion_tokens
+            organization_id: Organización que realiza la consulta (límite de concurrencia)
+            
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        if not self.client.available:
+            chunks = re.findall(r"\s*\S+", self._simulated_response(prompt))
+            for chunk in chunks:
+                yield chunk
+            if usage is not None:
+                usage.update({"prompt_tokens": None, "completion_tokens": len(chunks)})
+            return
+        
+        payload = self._payload(prompt, system_message, conversation_history)
+        # El último evento trae el consumo de tokens real
+        payload["stream_options"] = {"include_usage": True}
+        
+        chunks = 0
+        reported = None
+        async for event in self.client.stream_chat(payload, organization_id):
+            if event.get("usage"):
+                reported = event["usage"]
+            for choice in event.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    chunks += 1
+                    yield content
+        
+        if usage is not None:
+            # Si el proveedor no informa el consumo, cada fragmento se cuenta como un token
+            usage.update({
+                "prompt_tokens": reported.get("prompt_tokens") if reported else None,
+                "completion_tokens": reported.get("completion_tokens", chunks) if reported else chunks
+            })
+    
     async def generate_response(
         self, 
         prompt: str, 
         system_message: Optional[str] = None,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        organization_id: Optional[int] = None
     ) -> str:
         """
-        Genera una respuesta simulada (para pruebas sin API KEY).
+        Genera la respuesta completa del modelo. Sin API KEY, o sin httpx
+        instalado, devuelve una respuesta simulada (para pruebas).
         
         Args:
             prompt: El mensaje del usuario
             system_message: Instrucciones para el modelo (opcional)
             conversation_history: Historial de conversación anterior (opcional)
+            organization_id: Organización que realiza la consulta (límite de concurrencia)
             
         Returns:
-            La respuesta simulada
+            La respuesta del modelo
         """
-        # Si tenemos API KEY y queremos usar OpenAI, descomentar este código
-        # y comentar el resto de la función
-        # try:
-        #     openai.api_key = self.api_key
-        #     messages = []
-        #     if system_message:
-        #         messages.append({"role": "system", "content": system_message})
-        #     if conversation_history:
-        #         messages.extend(conversation_history)
-        #     messages.append({"role": "user", "content": prompt})
-        #     
-        #     response = await openai.ChatCompletion.acreate(
-        #         model=self.model,
-        #         messages=messages,
-        #         temperature=self.temperature,
-        #         max_tokens=self.max_tokens
-        #     )
-        #     return response.choices[0].message["content"]
-        # except Exception as e:
-        #     print(f"Error al llamar a la API de OpenAI: {e}")
-        #     return f"Lo siento, tuve un problema al procesar tu solicitud. Error: {str(e)}"
+        if not self.client.available:
+            return self._simulated_response(prompt)
         
+        try:
+            response = await self.client.chat(
+                self._payload(prompt, system_message, conversation_history),
+                organization_id
+            )
+            return response["choices"][0]["message"]["content"] or ""
+        except (OpenAIServiceError, KeyError, IndexError, ValueError) as e:
+            logger.error(f"Error al llamar a la API de OpenAI: {e}")
+            return "Lo siento, tuve un problema al procesar tu solicitud. Inténtalo de nuevo en unos momentos."
+    
+    def _simulated_response(self, prompt: str) -> str:
+        """
+        Genera una respuesta simulada según la consulta del usuario.
+        """
         # Simulamos diferentes respuestas según la consulta del usuario
         prompt_lower = prompt.lower()
         
@@ -132,4 +221,7 @@ class OpenAIService:
                 "clientes, análisis de ventas, seguimiento de oportunidades y más funcionalidades de la plataforma. "
                 "¿Hay algo específico sobre PymeAI que te gustaría conocer? Puedes preguntarme sobre CRM, pipeline de ventas, "
                 "dashboard, o cualquier otra característica del sistema."
-            )
\ No newline at end of file
+            )
+
+# Instancia compartida por todo el proceso
+openai_service = OpenAIService()
@@ -31,6 +31,53 @@ class Settings(BaseSettings):
     ENVIRONMENT: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
     
+    # Pool de conexiones a la base de datos (por proceso y por motor: sync y async)
+    # Conexiones máximas por worker = 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # Segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # Segundos antes de renovar una conexión
+    DB_POOL_PRE_PING: bool = True
+    
+    # Caché de autenticación (usuario + sesión por token)
+    # Con varios workers cada proceso tiene su propia caché, por lo que una sesión
+    # revocada puede seguir siendo aceptada por otro worker hasta que venza el TTL.
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Zona horaria por defecto de las organizaciones (series del dashboard)
+    DEFAULT_TIMEZONE: str = "America/Costa_Rica"
+    
+    # Instantáneas de KPIs del dashboard
+    KPI_SNAPSHOT_ENABLED: bool = True
+    KPI_SNAPSHOT_MAX_AGE_SECONDS: int = 300  # Antigüedad máxima antes de recalcular
+    
+    # Escritura diferida de ActiveSession.last_activity
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = 10.0
+    ACTIVITY_FLUSH_MAX_BATCH: int = 500
+    ACTIVITY_MIN_RESOLUTION_SECONDS: float = 60.0
+    
+    # Resegmentación incremental de clientes modificados
+    SEGMENTATION_WORKER_ENABLED: bool = True
+    SEGMENTATION_FLUSH_INTERVAL_SECONDS: float = 5.0
+    SEGMENTATION_SWEEP_INTERVAL_SECONDS: float = 3600.0
+    
+    # Resúmenes diarios de la analítica (recalculados por marcador de agua)
+    ANALYTICS_ROLLUPS_ENABLED: bool = True
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: float = 60.0
+    
+    # Caché de respuestas del dashboard (invalidada al confirmar escrituras)
+    DASHBOARD_CACHE_ENABLED: bool = True
+    DASHBOARD_CACHE_TTL_SECONDS: float = 60.0
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 5000
+    DASHBOARD_CACHE_REDIS_URL: Optional[str] = None  # Compartir la caché entre procesos
+    
+    # Ventana de contexto de Kula: mensajes literales y resumen de los anteriores
+    KULA_CONTEXT_MESSAGES: int = 12
+    KULA_SUMMARY_BATCH_MESSAGES: int = 8  # Mensajes fuera de la ventana que disparan el resumen
+    KULA_SUMMARY_MAX_CHARS: int = 2000
+    
     @field_validator("SQLALCHEMY_DATABASE_URI", mode='before')
     def assemble_db_connection(cls, v: Optional[str], info) -> Any:
         if isinstance(v, str):
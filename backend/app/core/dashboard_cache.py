@@ -0,0 +1,232 @@
+"""
+Caché de respuestas del dashboard.
+Guarda el resultado de cada endpoint por (organización, endpoint, parámetros)
+con TTL y límite LRU. Cada organización tiene un contador de versión que forma
+parte de la clave: las escrituras de clientes, oportunidades, interacciones y
+cambios de etapa lo incrementan al confirmar la transacción, de modo que una
+lectura posterior nunca devuelve KPIs anteriores a la escritura.
+
+Por defecto la caché vive en la memoria del proceso (con varios workers, cada
+uno tiene la suya y solo ve los incrementos de sus propias escrituras). Con
+DASHBOARD_CACHE_REDIS_URL las versiones y los valores se comparten en un
+servidor compatible con Redis.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# redis es opcional: solo se necesita si se configura DASHBOARD_CACHE_REDIS_URL
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Clave de Session.info con las organizaciones a invalidar tras el commit
+PENDING_ORGS_KEY = "dashboard_cache_orgs"
+
+class MemoryBackend:
+    """
+    Almacenamiento en memoria del proceso, TTL + LRU.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, organization_id: int) -> int:
+        with self._lock:
+            return self._versions.get(organization_id, 0)
+
+    def bump(self, organization_id: int) -> None:
+        with self._lock:
+            self._versions[organization_id] = self._versions.get(organization_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+class RedisBackend:
+    """
+    Almacenamiento compartido entre procesos en un servidor compatible con Redis.
+    El límite de memoria lo aplica el servidor (maxmemory + allkeys-lru).
+    """
+    def __init__(self, url: str, prefix: str = "dashboard"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(f"{self.prefix}:value:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self.client.set(
+            f"{self.prefix}:value:{key}",
+            json.dumps(jsonable_encoder(value)),
+            px=int(ttl_seconds * 1000)
+        )
+
+    def version(self, organization_id: int) -> int:
+        raw = self.client.get(f"{self.prefix}:version:{organization_id}")
+        return int(raw) if raw is not None else 0
+
+    def bump(self, organization_id: int) -> None:
+        self.client.incr(f"{self.prefix}:version:{organization_id}")
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+class DashboardCache:
+    """
+    Caché versionada por organización de las respuestas del dashboard.
+    """
+    def __init__(self, backend, ttl_seconds: float = 60.0, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+    @staticmethod
+    def _key(organization_id: int, version: int, endpoint: str, params: Dict[str, Any]) -> str:
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return f"{organization_id}:{version}:{endpoint}:{encoded}"
+
+    def get_or_compute(
+        self,
+        organization_id: int,
+        endpoint: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Devuelve la respuesta en caché o la calcula y la guarda.
+        Si el almacenamiento falla, se calcula sin caché.
+        """
+        if not self.enabled:
+            return compute()
+
+        try:
+            version = self.backend.version(organization_id)
+            key = self._key(organization_id, version, endpoint, params)
+            cached = self.backend.get(key)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f"Caché del dashboard no disponible: {e}")
+            return compute()
+
+        value = compute()
+
+        try:
+            self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar en la caché del dashboard: {e}")
+
+        return value
+
+    def bump(self, organization_id: int) -> None:
+        """
+        Invalida todas las respuestas en caché de una organización.
+        """
+        try:
+            self.backend.bump(organization_id)
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché del dashboard (org {organization_id}): {e}")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+def invalidate_on_commit(db: Session, organization_id: int) -> None:
+    """
+    Programa la invalidación de la caché de la organización para cuando se
+    confirme la transacción en curso. Hacerlo antes del commit permitiría que
+    otra petición guardara datos antiguos con la versión nueva.
+    """
+    db.info.setdefault(PENDING_ORGS_KEY, set()).add(organization_id)
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_orgs(session) -> None:
+    for organization_id in session.info.pop(PENDING_ORGS_KEY, ()):
+        dashboard_cache.bump(organization_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_orgs(session) -> None:
+    session.info.pop(PENDING_ORGS_KEY, None)
+
+def cached_dashboard_endpoint(
+    endpoint: str,
+    params: Iterable[str] = (),
+    bypass_when: Optional[Callable[[Dict[str, Any]], bool]] = None
+):
+    """
+    Decorador para endpoints síncronos del dashboard con `current_user` como dependencia.
+
+    Args:
+        endpoint: Nombre del endpoint en la clave de caché
+        params: Parámetros de la petición que forman parte de la clave
+        bypass_when: Condición sobre los parámetros para no usar la caché
+    """
+    params = tuple(params)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if bypass_when is not None and bypass_when(kwargs):
+                return func(*args, **kwargs)
+
+            organization_id = kwargs["current_user"].organization_id
+            key_params = {name: kwargs.get(name) for name in params}
+            return dashboard_cache.get_or_compute(
+                organization_id, endpoint, key_params, lambda: func(*args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+def _create_backend():
+    if settings.DASHBOARD_CACHE_REDIS_URL:
+        if redis is None:
+            logger.warning("DASHBOARD_CACHE_REDIS_URL definido pero redis no está instalado; se usa memoria")
+        else:
+            return RedisBackend(settings.DASHBOARD_CACHE_REDIS_URL)
+    return MemoryBackend(max_entries=settings.DASHBOARD_CACHE_MAX_ENTRIES)
+
+# Instancia compartida por todo el proceso
+dashboard_cache = DashboardCache(
+    backend=_create_backend(),
+    ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    enabled=settings.DASHBOARD_CACHE_ENABLED,
+)
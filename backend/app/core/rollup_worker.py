@@ -0,0 +1,85 @@
+"""
+Mantenimiento periódico de los resúmenes diarios de la analítica.
+Un hilo en segundo plano recalcula cada cierto tiempo los días modificados
+desde el último marcador de agua (ver app/services/analytics_rollups.py).
+La primera ejecución, sin marcador, calcula todo el histórico. En cada
+ejecución se recalculan además las instantáneas de KPIs invalidadas por
+escrituras, para que no las recalcule la siguiente petición del dashboard.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.services.analytics_rollups import AnalyticsRollupService
+from app.services.kpi_service import KpiService
+
+logger = logging.getLogger(__name__)
+
+class RollupWorker:
+    """
+    Recalcula los resúmenes diarios desde un hilo en segundo plano.
+    """
+    def __init__(self, interval_seconds: float = 60.0, enabled: bool = True):
+        self.interval_seconds = interval_seconds
+        self.enabled = enabled
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """
+        Ejecuta un recálculo incremental.
+
+        Returns:
+            Número de días recalculados
+        """
+        db = SessionLocal()
+        try:
+            recomputed = AnalyticsRollupService(db).refresh()
+            if settings.KPI_SNAPSHOT_ENABLED:
+                KpiService(db).refresh_stale_snapshots(include_expired=False)
+            return recomputed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """
+        Inicia el hilo de recálculo.
+        """
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Detiene el hilo. Lo pendiente se recalcula en la siguiente ejecución.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Error al recalcular los resúmenes diarios: {e}")
+            self._stopped.wait(timeout=self.interval_seconds)
+
+# Instancia compartida por todo el proceso
+rollup_worker = RollupWorker(
+    interval_seconds=settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS,
+    enabled=settings.ANALYTICS_ROLLUPS_ENABLED,
+)
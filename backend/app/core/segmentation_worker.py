@@ -0,0 +1,217 @@
+"""
+Resegmentación incremental de clientes.
+Los endpoints que modifican clientes (compras, interacciones, ediciones)
+marcan sus IDs como pendientes y un hilo en segundo plano los reevalúa por
+organización contra las reglas de segmentación, en lugar de recalcular toda
+la base de clientes. Una vez al día se recalcula además el riesgo de abandono
+y se barren los clientes que cruzaron un umbral de días desde la última
+compra sin actividad. La fecha del último barrido se guarda en la base de
+datos y un bloqueo consultivo garantiza que, con varios workers, solo uno
+lo ejecute.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.analytics_rollup import RollupWatermark
+from app.models.organization import Organization
+from app.services.churn_scoring import ChurnScoringService
+from app.services.segmentation import SegmentationEngine
+
+logger = logging.getLogger(__name__)
+
+# Clave del bloqueo consultivo que serializa el barrido diario entre procesos
+SWEEP_LOCK_KEY = 20250918
+
+# Marcador con la fecha del último barrido (tabla rollup_watermarks)
+SWEEP_WATERMARK_NAME = "segmentation_sweep"
+
+class SegmentationWorker:
+    """
+    Acumula los clientes modificados y los resegmenta desde un hilo en segundo plano.
+    """
+    def __init__(
+        self,
+        flush_interval_seconds: float = 5.0,
+        sweep_interval_seconds: float = 3600.0,
+        enabled: bool = True,
+    ):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.enabled = enabled
+
+        # organization_id -> IDs de clientes pendientes de resegmentar
+        self._dirty: Dict[int, Set[int]] = {}
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_dirty(self, organization_id: int, customer_ids: Iterable[int]) -> None:
+        """
+        Marca clientes para resegmentar. Se llama después del commit del cambio.
+        """
+        if not self.enabled:
+            return
+
+        ids = {customer_id for customer_id in customer_ids if customer_id is not None}
+        if not ids:
+            return
+
+        with self._lock:
+            self._dirty.setdefault(organization_id, set()).update(ids)
+
+    def flush(self) -> int:
+        """
+        Resegmenta los clientes pendientes, una sentencia por organización.
+
+        Returns:
+            Número de clientes cuyo segmento cambió
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+
+        if not dirty:
+            return 0
+
+        changed = 0
+        db = SessionLocal()
+        try:
+            engine = SegmentationEngine(db)
+            for organization_id, customer_ids in dirty.items():
+                try:
+                    changed += engine.assign_segments(organization_id, customer_ids=sorted(customer_ids))
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(
+                        f"No se pudo resegmentar {len(customer_ids)} clientes de la organización {organization_id}: {e}"
+                    )
+                    # Devolver los clientes a la cola para el siguiente intento
+                    with self._lock:
+                        self._dirty.setdefault(organization_id, set()).update(customer_ids)
+        finally:
+            db.close()
+
+        return changed
+
+    def sweep(self, today: Optional[date] = None) -> int:
+        """
+        Barrido diario de los clientes que cruzaron umbrales de días desde la última compra.
+        Solo se ejecuta una vez por día entre todos los procesos; si no hubo
+        barrido durante varios días, la ventana cubre todos los días transcurridos.
+
+        Returns:
+            Número de clientes cuyo segmento cambió
+        """
+        today = today or date.today()
+
+        # El bloqueo se mantiene en una transacción aparte durante todo el
+        # barrido, ya que el recálculo confirma por organización
+        lock_db = SessionLocal()
+        try:
+            locked = lock_db.execute(select(func.pg_try_advisory_xact_lock(SWEEP_LOCK_KEY))).scalar()
+            if not locked:
+                return 0
+
+            watermark = lock_db.get(RollupWatermark, SWEEP_WATERMARK_NAME)
+            last_sweep_date = watermark.value.date() if watermark else None
+            if last_sweep_date is not None and last_sweep_date >= today:
+                return 0
+
+            days_elapsed = (today - last_sweep_date).days if last_sweep_date else 1
+            changed = self._sweep_organizations(days_elapsed)
+
+            swept_at = datetime.combine(today, time())
+            if watermark is None:
+                lock_db.add(RollupWatermark(name=SWEEP_WATERMARK_NAME, value=swept_at))
+            else:
+                watermark.value = swept_at
+            lock_db.commit()
+        finally:
+            lock_db.close()
+
+        logger.info(f"Barrido de segmentación completado: {changed} clientes reclasificados")
+
+        return changed
+
+    def _sweep_organizations(self, days_elapsed: int) -> int:
+        changed = 0
+        db = SessionLocal()
+        try:
+            # Riesgo de abandono de todas las organizaciones (cambia con cada día sin compras)
+            churn = ChurnScoringService(db)
+            for (organization_id,) in db.query(Organization.id).all():
+                try:
+                    churn.score(organization_id)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Error al puntuar el riesgo de abandono de la organización {organization_id}: {e}")
+
+            engine = SegmentationEngine(db)
+            for organization_id in SegmentationEngine.organizations_with_definitions(db):
+                try:
+                    changed += engine.sweep_time_thresholds(organization_id, days_elapsed=days_elapsed)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Error en el barrido de segmentación de la organización {organization_id}: {e}")
+        finally:
+            db.close()
+
+        return changed
+
+    def start(self) -> None:
+        """
+        Inicia el hilo de resegmentación.
+        """
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="segmentation-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Detiene el hilo y procesa lo que quede pendiente.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds)
+            self._thread = None
+        if self.enabled:
+            self.flush()
+
+    def _run(self) -> None:
+        seconds_since_sweep = self.sweep_interval_seconds
+        while not self._stopped.is_set():
+            # El barrido comprueba cada sweep_interval_seconds si cambió el día
+            if seconds_since_sweep >= self.sweep_interval_seconds:
+                seconds_since_sweep = 0.0
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.warning(f"Error en el barrido de segmentación: {e}")
+
+            self._wakeup.wait(timeout=self.flush_interval_seconds)
+            self._wakeup.clear()
+            seconds_since_sweep += self.flush_interval_seconds
+            if self._stopped.is_set():
+                break
+            self.flush()
+
+# Instancia compartida por todo el proceso
+segmentation_worker = SegmentationWorker(
+    flush_interval_seconds=settings.SEGMENTATION_FLUSH_INTERVAL_SECONDS,
+    sweep_interval_seconds=settings.SEGMENTATION_SWEEP_INTERVAL_SECONDS,
+    enabled=settings.SEGMENTATION_WORKER_ENABLED,
+)
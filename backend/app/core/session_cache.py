@@ -0,0 +1,166 @@
+"""
+Caché en memoria de principales autenticados.
+Evita consultar la base de datos en cada petición para resolver el usuario
+y validar la sesión activa asociada a un token JWT.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from app.core.config import settings
+
+# Columnas del usuario que se guardan en caché.
+# La contraseña NO se guarda: si un endpoint la necesita se carga bajo demanda.
+CACHED_USER_FIELDS = (
+    "id",
+    "organization_id",
+    "email",
+    "first_name",
+    "last_name",
+    "role",
+    "is_active",
+    "created_at",
+)
+
+@dataclass
+class CachedPrincipal:
+    """
+    Datos de un usuario autenticado y de su sesión activa.
+    """
+    user_fields: Dict[str, Any]
+    session_id: int
+    session_expires_at: datetime
+    last_activity: Optional[datetime]
+    cached_at: float
+
+    @property
+    def user_id(self) -> int:
+        return self.user_fields["id"]
+
+    @property
+    def organization_id(self) -> int:
+        return self.user_fields["organization_id"]
+
+    @property
+    def role(self) -> str:
+        return self.user_fields["role"]
+
+def hash_token(token: str) -> str:
+    """
+    Genera la clave de caché para un token (nunca se guarda el token en claro).
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+class PrincipalCache:
+    """
+    Caché TTL + LRU de principales, indexada por el hash del token.
+
+    Es segura para hilos: los endpoints síncronos de FastAPI se ejecutan
+    en un threadpool y comparten esta instancia.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        """
+        Devuelve el principal asociado al token si sigue vigente.
+        """
+        key = hash_token(token)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            # Expirado por TTL o porque la sesión ya venció
+            session_expires_at = entry.session_expires_at
+            if session_expires_at.tzinfo is None:
+                session_expires_at = session_expires_at.replace(tzinfo=timezone.utc)
+
+            if now - entry.cached_at > self.ttl_seconds or session_expires_at <= datetime.now(timezone.utc):
+                self._remove(key)
+                return None
+
+            # Marcar como usado recientemente (LRU)
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, token: str, user, session) -> CachedPrincipal:
+        """
+        Guarda en caché el usuario y la sesión resueltos para un token.
+        """
+        key = hash_token(token)
+        entry = CachedPrincipal(
+            user_fields={field: getattr(user, field) for field in CACHED_USER_FIELDS},
+            session_id=session.id,
+            session_expires_at=session.expires_at,
+            last_activity=session.last_activity,
+            cached_at=time.monotonic(),
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_user.setdefault(entry.user_id, set()).add(key)
+
+            # Expulsar las entradas menos usadas si se supera el límite
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+        return entry
+
+    def invalidate_token(self, token: str) -> None:
+        """
+        Elimina de la caché la entrada de un token concreto.
+        """
+        with self._lock:
+            self._remove(hash_token(token))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Elimina todas las entradas de un usuario (revocación masiva, cambio de contraseña).
+        """
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """
+        Vacía la caché por completo.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        # Debe llamarse con el lock adquirido
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        user_keys = self._keys_by_user.get(entry.user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry.user_id]
+
+# Instancia compartida por todo el proceso
+principal_cache = PrincipalCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,69 @@
+"""
+Carga masiva de arreglos NumPy en tablas temporales.
+Los servicios analíticos calculan sus resultados en arreglos y los aplican
+con un único UPDATE ... FROM; esta utilidad rellena la tabla temporal con
+COPY en PostgreSQL y con un INSERT de varias filas en otros motores.
+"""
+
+import io
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import Connection
+
+# Filas por bloque de COPY / INSERT
+CHUNK_SIZE = 50000
+
+def _column_as_text(values: np.ndarray) -> np.ndarray:
+    # Texto para COPY; NaN (o None) se convierte en NULL
+    text = values.astype(str)
+    if values.dtype.kind == "f":
+        text[np.isnan(values)] = "\\N"
+    elif values.dtype.kind == "O":
+        text[np.equal(values, None)] = "\\N"
+    return text
+
+def _python_value(value):
+    if value is None:
+        return None
+    if isinstance(value, np.floating) and np.isnan(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+def load_staging_table(connection: Connection, table: Table, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Crea la tabla temporal y la rellena con los arreglos (una entrada por columna).
+
+    Args:
+        connection: Conexión de la transacción en curso
+        table: Tabla temporal (prefijo TEMPORARY)
+        columns: Nombre de columna -> arreglo; todos con la misma longitud
+    """
+    table.create(bind=connection)
+
+    names = list(columns)
+    size = len(next(iter(columns.values()))) if columns else 0
+
+    if connection.dialect.name == "postgresql":
+        cursor = connection.connection.cursor()
+        try:
+            for start in range(0, size, CHUNK_SIZE):
+                block = np.column_stack([
+                    _column_as_text(columns[name][start:start + CHUNK_SIZE]) for name in names
+                ])
+                buffer = io.StringIO("\n".join("\t".join(row) for row in block) + "\n")
+                cursor.copy_expert(
+                    f"COPY {table.name} ({', '.join(names)}) FROM STDIN",
+                    buffer
+                )
+        finally:
+            cursor.close()
+        return
+
+    for start in range(0, size, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, size)
+        connection.execute(insert(table), [
+            {name: _python_value(columns[name][i]) for name in names}
+            for i in range(start, end)
+        ])
@@ -0,0 +1,72 @@
+"""
+Particiones mensuales de las tablas de hechos (purchases y purchase_items).
+Cada mes es una partición por rango de purchased_at, de modo que las
+consultas por período solo leen los meses afectados. Las particiones se
+crean por adelantado en la migración y, si llega una compra de un mes sin
+partición (p. ej. una importación histórica), antes de insertarla.
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Iterable, Set, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Tablas particionadas por mes según purchased_at, en orden de creación
+PURCHASE_TABLES = ("purchases", "purchase_items")
+
+# Particiones que ya se sabe que existen en este proceso
+_known_partitions: Set[Tuple[str, date]] = set()
+_lock = threading.Lock()
+
+def month_start(value: Union[date, datetime]) -> date:
+    """
+    Primer día del mes de la fecha indicada.
+    """
+    return date(value.year, value.month, 1)
+
+def next_month(month: date) -> date:
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+def ensure_monthly_partitions(
+    engine: Engine,
+    values: Iterable[Union[date, datetime]],
+    tables: Iterable[str] = PURCHASE_TABLES
+) -> None:
+    """
+    Crea las particiones mensuales que falten para las fechas indicadas.
+
+    Se ejecuta en una transacción propia y debe llamarse antes de tomar
+    bloqueos en la transacción de la petición: crear una partición bloquea
+    la tabla padre hasta que terminen las inserciones en curso.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    months = sorted({month_start(value) for value in values})
+    missing = [
+        (table, month)
+        for month in months
+        for table in tables
+        if (table, month) not in _known_partitions
+    ]
+    if not missing:
+        return
+
+    with _lock:
+        with engine.begin() as connection:
+            # No esperar indefinidamente detrás de transacciones largas
+            connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+            for table, month in missing:
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+                    f"PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                ))
+        _known_partitions.update(missing)
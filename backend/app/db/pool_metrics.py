@@ -0,0 +1,122 @@
+"""
+Métricas del pool de conexiones de SQLAlchemy.
+Permite dimensionar el número de workers frente a max_connections de PostgreSQL:
+conexiones en uso, overflow y un histograma del tiempo de espera para obtener
+una conexión del pool.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Type
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+# Límites superiores (en segundos) de los buckets del histograma de espera
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class PoolMetrics:
+    """
+    Acumula estadísticas de espera y uso de un pool de conexiones.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._bucket_counts: List[int] = [0] * (len(WAIT_BUCKETS) + 1)
+        self._wait_count = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        """
+        Registra el tiempo que tardó una petición en obtener una conexión.
+        """
+        index = len(WAIT_BUCKETS)
+        for i, upper in enumerate(WAIT_BUCKETS):
+            if seconds <= upper:
+                index = i
+                break
+
+        with self._lock:
+            self._bucket_counts[index] += 1
+            self._wait_count += 1
+            self._wait_sum += seconds
+            if seconds > self._wait_max:
+                self._wait_max = seconds
+
+    def observe_timeout(self) -> None:
+        """
+        Registra una petición que agotó pool_timeout sin obtener conexión.
+        """
+        with self._lock:
+            self._timeouts += 1
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        """
+        Devuelve el estado actual del pool y el histograma de esperas.
+        """
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+            wait_count = self._wait_count
+            wait_sum = self._wait_sum
+            wait_max = self._wait_max
+            timeouts = self._timeouts
+
+        # Histograma acumulado, al estilo Prometheus
+        histogram = []
+        cumulative = 0
+        for upper, count in zip(list(WAIT_BUCKETS) + ["+Inf"], bucket_counts):
+            cumulative += count
+            histogram.append({"le": upper, "count": cumulative})
+
+        stats: Dict[str, Any] = {
+            "name": self.name,
+            "pool_class": type(pool).__name__,
+            "wait": {
+                "count": wait_count,
+                "sum_seconds": round(wait_sum, 6),
+                "avg_seconds": round(wait_sum / wait_count, 6) if wait_count else 0.0,
+                "max_seconds": round(wait_max, 6),
+                "timeouts": timeouts,
+                "histogram": histogram,
+            },
+        }
+
+        # Solo los pools con cola (QueuePool) exponen tamaño y overflow
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                stats[attr] = method()
+
+        timeout = getattr(pool, "timeout", None)
+        if callable(timeout):
+            stats["timeout"] = timeout()
+
+        return stats
+
+def instrumented_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    Crea una subclase del pool que mide el tiempo de espera al obtener conexiones.
+
+    Se usa una clase (y no un atributo de instancia) porque SQLAlchemy recrea el
+    pool con `self.__class__` tras un dispose() o una invalidación.
+    """
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.observe_timeout()
+                raise
+            metrics.observe_wait(time.perf_counter() - start)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    InstrumentedPool.__qualname__ = InstrumentedPool.__name__
+    return InstrumentedPool
+
+# Métricas de los dos motores definidos en app/db/base.py
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
@@ -17,6 +17,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Importar routers
 from app.api.api import api_router
+from app.core.activity_flusher import activity_flusher
+from app.core.segmentation_worker import segmentation_worker
+from app.core.rollup_worker import rollup_worker
+from app.core.ai.llm_client import llm_client
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -37,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,  # Permite enviar credenciales (cookies, headers de autenticación)
     allow_methods=["*"],     # Permite todos los métodos HTTP (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],     # Permite todos los headers HTTP
+    expose_headers=["X-Next-Cursor"],  # Cursor de la página siguiente en los listados
 )
 
 # Incluir routers de la API con prefijos diferentes
@@ -47,6 +52,23 @@ app.include_router(api_router, prefix="/api")
 # Esto hará que tanto /api/auth/... como /api/api/auth/... funcionen
 app.include_router(api_router, prefix="/api/api")
 
+# Tareas en segundo plano ligadas al ciclo de vida de la aplicación
+@app.on_event("startup")
+async def start_background_workers():
+    activity_flusher.start()
+    segmentation_worker.start()
+    rollup_worker.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    # Escribir la actividad de sesiones que quede pendiente
+    activity_flusher.stop()
+    # Resegmentar los clientes que queden pendientes
+    segmentation_worker.stop()
+    rollup_worker.stop()
+    # Cerrar las conexiones con la API del modelo
+    await llm_client.aclose()
+
 # Endpoint raíz para verificar que la API está funcionando
 @app.get("/")
 async def root():
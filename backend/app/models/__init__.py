@@ -17,4 +17,8 @@ from app.models.pipeline_stage import PipelineStage
 from app.models.opportunity import Opportunity
 from app.models.stage_history import StageHistory
 from app.models.conversation import Conversation
-from app.models.message import Message
\ No newline at end of file
+from app.models.message import Message
+from app.models.kpi_snapshot import KpiSnapshot
+from app.models.segment_definition import SegmentDefinition
+from app.models.purchase import Purchase, PurchaseItem
+from app.models.analytics_rollup import DailySalesRollup, DailyInteractionRollup, DailyStageTransitionRollup, RollupDirtyDay, RollupWatermark
@@ -0,0 +1,94 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, PrimaryKeyConstraint
+from app.db.base import Base, utcnow
+
+class DailySalesRollup(Base):
+    """
+    Modelo para el resumen diario de ventas por organización.
+    El día es el día local de la organización (ver app/services/sales_timeseries.py).
+    """
+    __tablename__ = "daily_sales_rollups"
+    __table_args__ = (
+        PrimaryKeyConstraint("organization_id", "day", name="pk_daily_sales_rollups"),
+    )
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    # Métricas del día
+    won_count = Column(Integer, nullable=False, default=0)  # Oportunidades ganadas (por updated_at)
+    won_value = Column(Float, nullable=False, default=0.0)
+    new_opportunities = Column(Integer, nullable=False, default=0)  # Por created_at
+
+    computed_at = Column(DateTime, nullable=False, default=utcnow)
+
+class DailyInteractionRollup(Base):
+    """
+    Modelo para el resumen diario de interacciones por tipo y resultado.
+    """
+    __tablename__ = "daily_interaction_rollups"
+    __table_args__ = (
+        PrimaryKeyConstraint("organization_id", "day", "type", "outcome", name="pk_daily_interaction_rollups"),
+    )
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    type = Column(String, nullable=False)
+    outcome = Column(String, nullable=False, default="")  # "" si la interacción no tiene resultado
+
+    # Métricas del día
+    interactions_count = Column(Integer, nullable=False, default=0)
+    total_duration_minutes = Column(Integer, nullable=False, default=0)
+
+    computed_at = Column(DateTime, nullable=False, default=utcnow)
+
+class DailyStageTransitionRollup(Base):
+    """
+    Modelo para el resumen diario de cambios de etapa por pipeline.
+    """
+    __tablename__ = "daily_stage_transition_rollups"
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    pipeline_id = Column(Integer, ForeignKey("pipelines.id"), nullable=False)
+    from_stage_id = Column(Integer, ForeignKey("pipeline_stages.id"), nullable=True)  # Null en la primera etapa
+    to_stage_id = Column(Integer, ForeignKey("pipeline_stages.id"), nullable=False)
+
+    # Métricas del día
+    transitions_count = Column(Integer, nullable=False, default=0)
+    total_time_in_stage = Column(Integer, nullable=False, default=0)  # Segundos en la etapa anterior
+    timed_transitions = Column(Integer, nullable=False, default=0)  # Cambios con time_in_stage conocido
+
+    computed_at = Column(DateTime, nullable=False, default=utcnow)
+
+class RollupDirtyDay(Base):
+    """
+    Modelo para los días pendientes de recalcular.
+    Lo registran las escrituras que el marcador de agua no detecta: eliminaciones
+    y cambios que mueven una fila de un día a otro.
+    """
+    __tablename__ = "rollup_dirty_days"
+    __table_args__ = (
+        PrimaryKeyConstraint("organization_id", "day", name="pk_rollup_dirty_days"),
+    )
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    marked_at = Column(DateTime, nullable=False, default=utcnow)
+
+class RollupWatermark(Base):
+    """
+    Modelo para el marcador de agua del cálculo incremental de los resúmenes.
+    Las filas modificadas después de `value` aún no están reflejadas.
+    """
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    value = Column(DateTime, nullable=False)
+
+# Lectura por organización y rango de días: el coste depende de los días, no de las filas
+Index(
+    "ix_daily_stage_transition_rollups_org_day",
+    DailyStageTransitionRollup.organization_id,
+    DailyStageTransitionRollup.day
+)
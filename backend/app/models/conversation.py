@@ -1,5 +1,5 @@
 # backend/app/models/conversation.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -21,6 +21,7 @@ class Conversation(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     is_archived = Column(Boolean, default=False)
+    meta_info = Column(JSON, nullable=True)  # Resumen acumulado del historial (ver app/core/ai/context_window.py)
     
     # Relaciones
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
@@ -1,8 +1,10 @@
 # backend/app/models/customer.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Text, Date
+import re
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Text, Date, Index
 from datetime import datetime, date, timedelta
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from app.db.base import Base
 
 class Customer(Base):
@@ -14,7 +16,7 @@ class Customer(Base):
     
     # Identificación
     id = Column(Integer, primary_key=True, index=True)
-    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False, index=True)
     
     # Información básica
     first_name = Column(String, nullable=False)
@@ -42,10 +44,83 @@ class Customer(Base):
     total_spent = Column(Float, default=0.0)
     average_purchase_value = Column(Float, default=0.0)
     purchase_frequency_days = Column(Float, nullable=True)  # Promedio de días entre compras
-    days_since_last_purchase = Column(Integer, nullable=True)
     segment_updated_at = Column(DateTime, nullable=True)
     
+    # Análisis RFM (recencia, frecuencia, valor monetario), puntuaciones de 1 a 5
+    rfm_recency_score = Column(Integer, nullable=True)
+    rfm_frequency_score = Column(Integer, nullable=True)
+    rfm_monetary_score = Column(Integer, nullable=True)
+    rfm_score = Column(String(3), nullable=True)  # Ej.: "545"
+    rfm_cluster = Column(Integer, nullable=True)  # Grupo KMeans, 0 = menor valor
+    rfm_updated_at = Column(DateTime, nullable=True)
+    
+    # Riesgo de abandono (0 a 1), recalculado a diario
+    churn_risk_score = Column(Float, nullable=True)
+    churn_scored_at = Column(DateTime, nullable=True)
+    
+    @hybrid_property
+    def days_since_last_purchase(self):
+        """
+        Días desde la última compra. Se calcula al consultar en lugar de guardarse,
+        para que nunca quede desactualizado.
+        """
+        if self.last_purchase_date is None:
+            return None
+        return (date.today() - self.last_purchase_date).days
+    
+    @days_since_last_purchase.expression
+    def days_since_last_purchase(cls):
+        return func.current_date() - cls.last_purchase_date
+    
+    @staticmethod
+    def normalize_phone(phone):
+        """
+        Solo los dígitos del teléfono, sin el prefijo de Costa Rica (506) en
+        los números de 8 dígitos: "+506 8888-1234" y "88881234" son iguales.
+        """
+        if not phone:
+            return None
+        digits = re.sub(r"^506(\d{8})$", r"\1", re.sub(r"\D", "", phone))
+        return digits or None
+    
+    @hybrid_property
+    def phone_digits(self):
+        """
+        Teléfono normalizado, para detectar duplicados con distinto formato.
+        """
+        return Customer.normalize_phone(self.phone)
+    
+    @phone_digits.expression
+    def phone_digits(cls):
+        # Debe coincidir con la expresión del índice ix_customers_org_phone_digits
+        return func.regexp_replace(
+            func.regexp_replace(cls.phone, r"\D", "", "g"),
+            r"^506(\d{8})$", r"\1"
+        )
+    
     # Relaciones
     organization = relationship("Organization", back_populates="customers")
     interactions = relationship("Interaction", back_populates="customer", cascade="all, delete-orphan")
-    opportunities = relationship("Opportunity", back_populates="customer")
\ No newline at end of file
+    opportunities = relationship("Opportunity", back_populates="customer")
+
+# Índice para el barrido diario de segmentación por días desde la última compra
+Index(
+    "ix_customers_org_last_purchase_date",
+    Customer.organization_id,
+    Customer.last_purchase_date
+)
+
+# Índice para la lista de clientes en riesgo ordenada por puntuación
+Index(
+    "ix_customers_org_churn_risk",
+    Customer.organization_id,
+    Customer.churn_risk_score.desc(),
+    Customer.id.desc()
+)
+
+# Índice de expresión para buscar duplicados por teléfono normalizado en las importaciones
+Index(
+    "ix_customers_org_phone_digits",
+    Customer.organization_id,
+    Customer.phone_digits
+)
@@ -1,5 +1,5 @@
 # backend/app/models/interaction.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -15,6 +15,8 @@ class Interaction(Base):
     # Identificación
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    # Copia de customers.organization_id para filtrar sin unir con customers
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Información básica
@@ -36,8 +38,28 @@ class Interaction(Base):
     
     # Metadatos
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
     
     # Relaciones
     customer = relationship("Customer", back_populates="interactions")
-    user = relationship("User", back_populates="interactions")
\ No newline at end of file
+    user = relationship("User", back_populates="interactions")
+
+# Índices compuestos para los listados y la cola de seguimientos por organización
+Index(
+    "ix_interactions_org_date_time",
+    Interaction.organization_id,
+    Interaction.date_time.desc()
+)
+Index(
+    "ix_interactions_org_followup",
+    Interaction.organization_id,
+    Interaction.requires_followup,
+    Interaction.followup_completed,
+    Interaction.followup_date
+)
+Index(
+    "ix_interactions_customer_date_time",
+    Interaction.customer_id,
+    Interaction.date_time.desc(),
+    Interaction.id.desc()
+)
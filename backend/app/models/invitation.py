@@ -1,9 +1,9 @@
 # backend/app/models/invitation.py
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
 from sqlalchemy.sql import func
-from datetime import datetime, timezone, timedelta
+from datetime import timedelta
 import secrets
-from app.db.base import Base
+from app.db.base import Base, utcnow
 
 class Invitation(Base):
     """
@@ -18,7 +18,7 @@ class Invitation(Base):
     token = Column(String, unique=True, nullable=False, index=True)
     role = Column(String, nullable=False, default="user")  # admin, user, analyst, readonly
     custom_permissions = Column(String, nullable=True)  # JSON string con permisos personalizados
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
     expires_at = Column(DateTime, nullable=False)
     is_accepted = Column(Boolean, default=False)
     
@@ -42,7 +42,7 @@ class Invitation(Base):
         token = secrets.token_urlsafe(32)
         
         # Calcular fecha de expiración
-        expires_at = datetime.now(timezone.utc) + timedelta(days=expires_in_days)
+        expires_at = utcnow() + timedelta(days=expires_in_days)
         
         return cls(
             organization_id=organization_id,
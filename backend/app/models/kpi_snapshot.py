@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, JSON, UniqueConstraint
+from app.db.base import Base, utcnow
+
+class KpiSnapshot(Base):
+    """
+    Modelo para las instantáneas de KPIs del dashboard.
+    Guarda el resultado ya calculado de la visión general por organización y período,
+    de modo que la primera carga del dashboard sea una única búsqueda por índice.
+    """
+    __tablename__ = "dashboard_kpi_snapshots"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "period", name="uq_dashboard_kpi_snapshots_org_period"),
+    )
+    
+    # Identificación
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    period = Column(String, nullable=False)  # week, month, quarter, year
+    
+    # Datos calculados
+    data = Column(JSON, nullable=False)  # Respuesta completa de /dashboard/overview
+    computed_at = Column(DateTime, nullable=False, default=utcnow)
+    
+    # Se marca como obsoleta cuando cambian clientes, oportunidades o interacciones
+    is_stale = Column(Boolean, nullable=False, default=False)
@@ -1,5 +1,5 @@
 # backend/app/models/message.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -25,4 +25,12 @@ class Message(Base):
     meta_info = Column(JSON, nullable=True)  # Metadatos adicionales (entidades, acciones, etc.)
     
     # Relaciones
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+
+# Ventana de contexto de Kula: últimos mensajes de una conversación
+Index(
+    "ix_messages_conversation_created_at",
+    Message.conversation_id,
+    Message.created_at.desc(),
+    Message.id.desc()
+)
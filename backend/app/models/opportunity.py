@@ -1,5 +1,5 @@
 # backend/app/models/opportunity.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Text, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -32,7 +32,7 @@ class Opportunity(Base):
     # Estado y fechas
     status = Column(String, default="open")  # open, won, lost
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), index=True)
     last_stage_change = Column(DateTime, nullable=True)  # Última vez que cambió de etapa
     expected_close_date = Column(DateTime, nullable=True)  # Fecha estimada de cierre
     
@@ -42,4 +42,12 @@ class Opportunity(Base):
     stage = relationship("PipelineStage", back_populates="opportunities")
     customer = relationship("Customer", back_populates="opportunities")
     user = relationship("User", back_populates="opportunities")
-    stage_history = relationship("StageHistory", back_populates="opportunity", cascade="all, delete-orphan")
\ No newline at end of file
+    stage_history = relationship("StageHistory", back_populates="opportunity", cascade="all, delete-orphan")
+
+# Índice para la paginación por cursor del listado de oportunidades
+Index(
+    "ix_opportunities_org_created_at",
+    Opportunity.organization_id,
+    Opportunity.created_at.desc(),
+    Opportunity.id.desc()
+)
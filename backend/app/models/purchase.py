@@ -0,0 +1,101 @@
+from sqlalchemy import (
+    Column, BigInteger, Boolean, Integer, String, Float, Date, DateTime, Text, ForeignKey,
+    ForeignKeyConstraint, Index, PrimaryKeyConstraint, true
+)
+from app.db.base import Base, utcnow
+
+class Purchase(Base):
+    """
+    Modelo para el registro de compras (tabla de hechos de solo inserción).
+    Está particionada por mes según purchased_at (ver app/db/partitions.py), por
+    lo que la clave primaria incluye la fecha. Las métricas de compra de
+    Customer se derivan de este registro y se pueden reconstruir desde él.
+    """
+    __tablename__ = "purchases"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "purchased_at", name="pk_purchases"),
+        {"postgresql_partition_by": "RANGE (purchased_at)"},
+    )
+
+    # Identificación
+    id = Column(BigInteger, autoincrement=True, nullable=False)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+
+    # Momento de la compra (UTC) y fecha comercial usada en las métricas del cliente
+    purchased_at = Column(DateTime, nullable=False)
+    purchase_date = Column(Date, nullable=False)
+    # False si solo se conocía la fecha (purchased_at es la medianoche local)
+    has_time = Column(Boolean, nullable=False, default=True, server_default=true())
+
+    # Importe
+    amount = Column(Float, nullable=False)
+    items_count = Column(Integer, nullable=False, default=1)
+    currency = Column(String, nullable=True)
+
+    # Origen: api, batch, pos, import...
+    source = Column(String, nullable=True)
+    notes = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+class PurchaseItem(Base):
+    """
+    Modelo para las líneas de producto de una compra (opcionales).
+    Se particiona por mes igual que purchases, con la fecha de la compra copiada.
+    """
+    __tablename__ = "purchase_items"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "purchased_at", name="pk_purchase_items"),
+        ForeignKeyConstraint(
+            ["purchase_id", "purchased_at"], ["purchases.id", "purchases.purchased_at"],
+            name="fk_purchase_items_purchase"
+        ),
+        {"postgresql_partition_by": "RANGE (purchased_at)"},
+    )
+
+    # Identificación
+    id = Column(BigInteger, autoincrement=True, nullable=False)
+    purchase_id = Column(BigInteger, nullable=False)
+    purchased_at = Column(DateTime, nullable=False)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
+
+    # Producto (sin catálogo propio: se guarda tal como lo envía el punto de venta)
+    product_sku = Column(String, nullable=True)
+    product_name = Column(String, nullable=False)
+    category = Column(String, nullable=True)
+
+    # Cantidades e importes
+    quantity = Column(Float, nullable=False, default=1.0)
+    unit_price = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=True)  # Para calcular márgenes
+    line_total = Column(Float, nullable=False)
+
+# Los rangos de tiempo se resuelven con BRIN (datos insertados en orden
+# cronológico) y con la poda de particiones; el historial de un cliente, con B-tree
+Index("ix_purchases_purchased_at_brin", Purchase.purchased_at, postgresql_using="brin")
+Index(
+    "ix_purchases_org_customer_date",
+    Purchase.organization_id,
+    Purchase.customer_id,
+    Purchase.purchase_date
+)
+Index("ix_purchase_items_purchased_at_brin", PurchaseItem.purchased_at, postgresql_using="brin")
+Index("ix_purchase_items_purchase_id", PurchaseItem.purchase_id)
+
+# Analítica de ventas por organización y período: las columnas incluidas
+# permiten resolver las agregaciones con recorridos solo de índice
+Index(
+    "ix_purchases_org_purchased_at",
+    Purchase.organization_id,
+    Purchase.purchased_at,
+    postgresql_include=["amount", "has_time"]
+)
+Index(
+    "ix_purchase_items_org_purchased_at",
+    PurchaseItem.organization_id,
+    PurchaseItem.purchased_at,
+    postgresql_include=[
+        "product_sku", "product_name", "category", "quantity", "unit_cost", "line_total", "purchase_id"
+    ]
+)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, JSON, UniqueConstraint
+from app.db.base import Base
+
+class SegmentDefinition(Base):
+    """
+    Modelo para las definiciones de segmentos de clientes.
+    Cada organización define sus segmentos con reglas JSON sobre las métricas
+    de compra de los clientes; el motor de segmentación las traduce a SQL.
+    """
+    __tablename__ = "segment_definitions"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "name", name="uq_segment_definitions_org_name"),
+    )
+    
+    # Identificación
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)  # Valor que se guarda en Customer.segment
+    
+    # Presentación
+    display_name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    color = Column(String, nullable=True)
+    icon = Column(String, nullable=True)
+    
+    # Evaluación: se asigna el primer segmento (menor prioridad) cuyas reglas se cumplan
+    priority = Column(Integer, default=100)
+    rules = Column(JSON, nullable=False)
+    is_active = Column(Boolean, default=True)
+    is_system = Column(Boolean, default=False)  # Segmentos predefinidos (VIP, frecuentes, etc.)
@@ -19,7 +19,7 @@ class StageHistory(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Usuario que realizó el cambio
     
     # Información del cambio
-    changed_at = Column(DateTime, server_default=func.now())
+    changed_at = Column(DateTime, server_default=func.now(), index=True)
     notes = Column(Text, nullable=True)  # Notas sobre el cambio
     time_in_stage = Column(Integer, nullable=True)  # Tiempo (en segundos) que estuvo en la etapa anterior
     
@@ -0,0 +1,65 @@
+# backend/app/scripts/import_customers.py
+"""
+Importa clientes en bloque desde un archivo CSV o XLSX.
+Ejecutar con: python -m app.scripts.import_customers --organization-id 1 clientes.csv
+(Usa directamente la base de datos configurada en DATABASE_URL)
+"""
+import argparse
+import json
+import sys
+import time
+
+from app.db.base import SessionLocal
+from app.api.endpoints.customers import CustomerCreate
+from app.services.customer_import import CustomerImportService, iter_file_rows, DEFAULT_CHUNK_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de clientes")
+    parser.add_argument("path", help="Archivo CSV o XLSX a importar")
+    parser.add_argument("--organization-id", type=int, required=True, help="ID de la organización")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque")
+    parser.add_argument("--errors", help="Archivo JSON donde guardar los errores por fila")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def print_progress(result):
+        elapsed = time.perf_counter() - start
+        rate = result.total_rows / elapsed if elapsed > 0 else 0
+        print(
+            f"  {result.total_rows} filas | {result.created} creados | "
+            f"{result.duplicates} duplicados | {result.error_count} errores | {rate:.0f} filas/s"
+        )
+
+    print(f"=== Importando clientes desde {args.path} ===")
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as file:
+            result = CustomerImportService(db, CustomerCreate).import_rows(
+                args.organization_id,
+                iter_file_rows(file, args.path),
+                chunk_size=args.chunk_size,
+                on_progress=print_progress
+            )
+    except (ValueError, UnicodeDecodeError) as e:
+        print(f"❌ Error: no se pudo leer el archivo: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"\nTiempo total: {time.perf_counter() - start:.1f} s")
+    print(f"✅ Clientes creados: {result.created}")
+    print(f"Duplicados omitidos: {result.duplicates}")
+
+    if result.error_count:
+        print(f"❌ Filas con errores: {result.error_count}")
+        for error in result.errors[:10]:
+            print(f"  Fila {error['row']}: {error['error']}")
+        if args.errors:
+            with open(args.errors, "w", encoding="utf-8") as output:
+                json.dump(result.errors, output, ensure_ascii=False, indent=2)
+            print(f"Errores guardados en {args.errors}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Resúmenes diarios (rollups) de la analítica del dashboard.
+
+Por organización y día local se guardan las oportunidades ganadas y nuevas,
+las interacciones por tipo y resultado y los cambios de etapa. Así, leer un
+período cuesta lo mismo que el número de días y no el número de filas.
+
+Los resúmenes se mantienen de forma incremental con un marcador de agua:
+un trabajo periódico busca los días con filas modificadas desde la última
+ejecución (por updated_at / changed_at, indexados) más los días marcados por
+las escrituras que el marcador no detecta (eliminaciones y cambios de día),
+y recalcula esos días completos desde las tablas de origen. Recalcular un
+día es idempotente, por lo que el solapamiento entre ejecuciones es seguro.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import Date, DateTime, cast, column, delete, func, insert, literal, select, tuple_, union, union_all, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.dashboard_cache import dashboard_cache
+from app.db.base import utcnow
+from app.models.analytics_rollup import (
+    DailyInteractionRollup,
+    DailySalesRollup,
+    DailyStageTransitionRollup,
+    RollupDirtyDay,
+    RollupWatermark,
+)
+from app.models.interaction import Interaction
+from app.models.opportunity import Opportunity
+from app.models.organization import Organization
+from app.models.stage_history import StageHistory
+from app.services.kpi_service import PERIOD_DAYS
+from app.services.sales_timeseries import local_day, organization_timezone, to_utc
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "daily_rollups"
+
+# Clave del bloqueo consultivo: solo un proceso recalcula los resúmenes a la vez
+ADVISORY_LOCK_KEY = 20250924
+
+# Margen para las transacciones que estaban en curso cuando se tomó el marcador
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Días por sentencia de recálculo y separación máxima entre días del mismo bloque
+DAYS_PER_BATCH = 366
+MAX_DAY_GAP = 31
+
+def day_batches(days: Iterable[date]) -> Iterator[List[date]]:
+    """
+    Agrupa los días en bloques cercanos, para que cada recálculo lea un
+    rango acotado de las tablas de origen.
+    """
+    batch: List[date] = []
+    for day in sorted(set(days)):
+        if batch and ((day - batch[-1]).days > MAX_DAY_GAP or len(batch) >= DAYS_PER_BATCH):
+            yield batch
+            batch = []
+        batch.append(day)
+    if batch:
+        yield batch
+
+class AnalyticsRollupService:
+    """
+    Servicio para mantener y consultar los resúmenes diarios.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    @staticmethod
+    def mark_dirty(db: Session, organization_id: int, timestamps: Iterable[Optional[datetime]]) -> None:
+        """
+        Marca para recalcular los días (locales) de las fechas UTC indicadas.
+        Se llama dentro de la transacción de las eliminaciones y de los cambios
+        que pueden mover una fila a otro día, con los valores anteriores.
+        """
+        rows = [(timestamp,) for timestamp in timestamps if timestamp is not None]
+        if not rows:
+            return
+
+        changed = values(column("changed_at", DateTime), name="changed").data(rows)
+        timezone_name = organization_timezone(organization_id)
+        statement = pg_insert(RollupDirtyDay).from_select(
+            ["organization_id", "day", "marked_at"],
+            select(
+                literal(organization_id),
+                local_day(changed.c.changed_at, timezone_name),
+                literal(utcnow(), DateTime),
+            ).distinct()
+        )
+        # Volver a marcar un día actualiza marked_at: así no se pierde si el
+        # trabajo lo está procesando en ese momento (ver refresh)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["organization_id", "day"],
+            set_={"marked_at": statement.excluded.marked_at}
+        ))
+
+    def refresh(self) -> int:
+        """
+        Recalcula los días modificados desde el último marcador de agua.
+
+        Returns:
+            Número de días (por organización) recalculados
+        """
+        locked = self.db.execute(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY))).scalar()
+        if not locked:
+            return 0
+
+        started_at = utcnow()
+        watermark = self.db.get(RollupWatermark, WATERMARK_NAME)
+        since = watermark.value if watermark else None
+
+        dirty = self.db.execute(
+            select(RollupDirtyDay.organization_id, RollupDirtyDay.day, RollupDirtyDay.marked_at)
+        ).all()
+
+        changed: Dict[int, Set[date]] = {}
+        for organization_id, day in self.changed_days(since):
+            changed.setdefault(organization_id, set()).add(day)
+        for organization_id, day, _ in dirty:
+            changed.setdefault(organization_id, set()).add(day)
+
+        recomputed = 0
+        for organization_id, days in changed.items():
+            self.rebuild_days(organization_id, days)
+            recomputed += len(days)
+
+        if dirty:
+            # Solo las marcas leídas: las renovadas mientras tanto siguen pendientes
+            self.db.execute(delete(RollupDirtyDay).where(
+                tuple_(RollupDirtyDay.organization_id, RollupDirtyDay.day, RollupDirtyDay.marked_at).in_(
+                    [tuple(row) for row in dirty]
+                )
+            ))
+
+        new_value = started_at - WATERMARK_OVERLAP
+        if watermark is None:
+            self.db.add(RollupWatermark(name=WATERMARK_NAME, value=new_value))
+        elif new_value > watermark.value:
+            watermark.value = new_value
+
+        self.db.commit()
+
+        # Las series del dashboard leen los resúmenes: invalidar sus respuestas en caché
+        for organization_id in changed:
+            dashboard_cache.bump(organization_id)
+
+        if recomputed:
+            logger.info(f"Resúmenes diarios: {recomputed} días recalculados en {len(changed)} organizaciones")
+
+        return recomputed
+
+    def changed_days(self, since: Optional[datetime] = None) -> List[tuple]:
+        """
+        Obtiene los pares (organización, día local) con filas modificadas
+        después de `since` (todos si es None).
+        """
+        timezone_name = organization_timezone()
+
+        def changes(source, organization_column, day_column, changed_column):
+            statement = select(
+                organization_column.label("organization_id"),
+                local_day(day_column, timezone_name).label("day"),
+            ).select_from(source)
+            if since is not None:
+                statement = statement.where(changed_column > since)
+            return statement
+
+        opportunities = Opportunity.__table__.join(
+            Organization.__table__, Organization.id == Opportunity.organization_id
+        )
+        interactions = Interaction.__table__.join(
+            Organization.__table__, Organization.id == Interaction.organization_id
+        )
+        stage_history = StageHistory.__table__.join(
+            Opportunity.__table__, Opportunity.id == StageHistory.opportunity_id
+        ).join(
+            Organization.__table__, Organization.id == Opportunity.organization_id
+        )
+
+        statement = union(
+            changes(opportunities, Opportunity.organization_id, Opportunity.created_at, Opportunity.updated_at),
+            changes(opportunities, Opportunity.organization_id, Opportunity.updated_at, Opportunity.updated_at),
+            changes(interactions, Interaction.organization_id, Interaction.date_time, Interaction.updated_at),
+            changes(stage_history, Opportunity.organization_id, StageHistory.changed_at, StageHistory.changed_at),
+        )
+
+        return [(organization_id, day) for organization_id, day in self.db.execute(statement) if day is not None]
+
+    def rebuild_days(self, organization_id: int, days: Iterable[date]) -> None:
+        """
+        Recalcula por completo los resúmenes de los días indicados.
+        No confirma la transacción.
+        """
+        timezone_name = organization_timezone(organization_id)
+
+        for batch in day_batches(days):
+            # Rango UTC que cubre el bloque de días locales
+            low = to_utc(cast(literal(batch[0], Date), DateTime), timezone_name)
+            high = to_utc(cast(literal(batch[-1] + timedelta(days=1), Date), DateTime), timezone_name)
+            computed_at = literal(utcnow(), DateTime)
+
+            for model in (DailySalesRollup, DailyInteractionRollup, DailyStageTransitionRollup):
+                self.db.execute(delete(model).where(
+                    model.organization_id == organization_id,
+                    model.day.in_(batch)
+                ))
+
+            # Ventas: ganadas por día de updated_at y nuevas por día de created_at
+            won = select(
+                local_day(Opportunity.updated_at, timezone_name).label("day"),
+                literal(1).label("won"),
+                func.coalesce(Opportunity.value, 0).label("value"),
+                literal(0).label("new"),
+            ).where(
+                Opportunity.organization_id == organization_id,
+                Opportunity.status == "won",
+                Opportunity.updated_at >= low,
+                Opportunity.updated_at < high
+            )
+            new = select(
+                local_day(Opportunity.created_at, timezone_name).label("day"),
+                literal(0).label("won"),
+                literal(0).label("value"),
+                literal(1).label("new"),
+            ).where(
+                Opportunity.organization_id == organization_id,
+                Opportunity.created_at >= low,
+                Opportunity.created_at < high
+            )
+            events = union_all(won, new).subquery()
+
+            self.db.execute(insert(DailySalesRollup).from_select(
+                ["organization_id", "day", "won_count", "won_value", "new_opportunities", "computed_at"],
+                select(
+                    literal(organization_id),
+                    events.c.day,
+                    func.sum(events.c.won),
+                    func.sum(events.c.value),
+                    func.sum(events.c.new),
+                    computed_at,
+                ).where(events.c.day.in_(batch)).group_by(events.c.day)
+            ))
+
+            # Interacciones por tipo y resultado
+            interaction_day = local_day(Interaction.date_time, timezone_name)
+            outcome = func.coalesce(Interaction.outcome, "")
+            self.db.execute(insert(DailyInteractionRollup).from_select(
+                ["organization_id", "day", "type", "outcome", "interactions_count",
+                 "total_duration_minutes", "computed_at"],
+                select(
+                    literal(organization_id),
+                    interaction_day,
+                    Interaction.type,
+                    outcome,
+                    func.count(Interaction.id),
+                    func.coalesce(func.sum(Interaction.duration_minutes), 0),
+                    computed_at,
+                ).where(
+                    Interaction.organization_id == organization_id,
+                    Interaction.date_time >= low,
+                    Interaction.date_time < high,
+                    interaction_day.in_(batch)
+                ).group_by(interaction_day, Interaction.type, outcome)
+            ))
+
+            # Cambios de etapa por pipeline
+            transition_day = local_day(StageHistory.changed_at, timezone_name)
+            self.db.execute(insert(DailyStageTransitionRollup).from_select(
+                ["organization_id", "day", "pipeline_id", "from_stage_id", "to_stage_id",
+                 "transitions_count", "total_time_in_stage", "timed_transitions", "computed_at"],
+                select(
+                    literal(organization_id),
+                    transition_day,
+                    Opportunity.pipeline_id,
+                    StageHistory.from_stage_id,
+                    StageHistory.to_stage_id,
+                    func.count(StageHistory.id),
+                    func.coalesce(func.sum(StageHistory.time_in_stage), 0),
+                    func.count(StageHistory.time_in_stage),
+                    computed_at,
+                ).join(
+                    Opportunity, Opportunity.id == StageHistory.opportunity_id
+                ).where(
+                    Opportunity.organization_id == organization_id,
+                    StageHistory.changed_at >= low,
+                    StageHistory.changed_at < high,
+                    transition_day.in_(batch)
+                ).group_by(
+                    transition_day,
+                    Opportunity.pipeline_id,
+                    StageHistory.from_stage_id,
+                    StageHistory.to_stage_id
+                )
+            ))
+
+    def activity_summary(self, organization_id: int, period: str = "month") -> Dict[str, Any]:
+        """
+        Resume la actividad del período leyendo solo los resúmenes diarios.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+
+        Returns:
+            Diccionario con ventas, interacciones y cambios de etapa del período
+        """
+        if period not in PERIOD_DAYS:
+            period = "month"
+
+        timezone_name = organization_timezone(organization_id)
+        start_day = cast(func.timezone(timezone_name, func.now()), Date) - (PERIOD_DAYS[period] - 1)
+
+        sales = self.db.execute(
+            select(
+                func.coalesce(func.sum(DailySalesRollup.won_count), 0),
+                func.coalesce(func.sum(DailySalesRollup.won_value), 0),
+                func.coalesce(func.sum(DailySalesRollup.new_opportunities), 0),
+            ).where(
+                DailySalesRollup.organization_id == organization_id,
+                DailySalesRollup.day >= start_day
+            )
+        ).one()
+
+        interactions = self.db.execute(
+            select(
+                DailyInteractionRollup.type,
+                DailyInteractionRollup.outcome,
+                func.sum(DailyInteractionRollup.interactions_count),
+                func.sum(DailyInteractionRollup.total_duration_minutes),
+            ).where(
+                DailyInteractionRollup.organization_id == organization_id,
+                DailyInteractionRollup.day >= start_day
+            ).group_by(DailyInteractionRollup.type, DailyInteractionRollup.outcome)
+        ).all()
+
+        transitions = self.db.execute(
+            select(
+                DailyStageTransitionRollup.pipeline_id,
+                DailyStageTransitionRollup.from_stage_id,
+                DailyStageTransitionRollup.to_stage_id,
+                func.sum(DailyStageTransitionRollup.transitions_count),
+                func.sum(DailyStageTransitionRollup.total_time_in_stage),
+                func.sum(DailyStageTransitionRollup.timed_transitions),
+            ).where(
+                DailyStageTransitionRollup.organization_id == organization_id,
+                DailyStageTransitionRollup.day >= start_day
+            ).group_by(
+                DailyStageTransitionRollup.pipeline_id,
+                DailyStageTransitionRollup.from_stage_id,
+                DailyStageTransitionRollup.to_stage_id
+            )
+        ).all()
+
+        interactions_by_type: Dict[str, int] = {}
+        interactions_by_outcome: Dict[str, int] = {}
+        interaction_rows = []
+        for type_, outcome, count, duration in interactions:
+            outcome = outcome or "unknown"
+            interactions_by_type[type_] = interactions_by_type.get(type_, 0) + int(count)
+            interactions_by_outcome[outcome] = interactions_by_outcome.get(outcome, 0) + int(count)
+            interaction_rows.append({
+                "type": type_,
+                "outcome": outcome,
+                "count": int(count),
+                "total_duration_minutes": int(duration or 0)
+            })
+
+        transition_rows = []
+        for pipeline_id, from_stage_id, to_stage_id, count, total_time, timed in transitions:
+            transition_rows.append({
+                "pipeline_id": pipeline_id,
+                "from_stage_id": from_stage_id,
+                "to_stage_id": to_stage_id,
+                "count": int(count),
+                # Promedio en días, como en las métricas del pipeline
+                "avg_time_in_days": round(float(total_time) / timed / 86400, 1) if timed else 0
+            })
+
+        won_count, won_value, new_opportunities = sales
+        return {
+            "period": period,
+            "sales": {
+                "won_count": int(won_count),
+                "won_value": float(won_value),
+                "new_opportunities": int(new_opportunities)
+            },
+            "interactions_by_type": interactions_by_type,
+            "interactions_by_outcome": interactions_by_outcome,
+            "interactions": interaction_rows,
+            "stage_transitions": transition_rows
+        }
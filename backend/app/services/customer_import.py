@@ -0,0 +1,306 @@
+"""
+Importación masiva de clientes desde CSV o XLSX.
+
+El archivo se lee fila a fila y se procesa por bloques: cada bloque se valida
+con el esquema de creación de clientes, se descartan los duplicados (por email
+o teléfono dentro de la organización) y se inserta con un único INSERT de
+varias filas y un commit. Nunca se carga el archivo completo en memoria.
+"""
+import csv
+import io
+import logging
+import unicodedata
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from app.core.segmentation_worker import segmentation_worker
+from app.models.customer import Customer
+from app.services.customer_search import CustomerSearchService
+from app.services.kpi_service import KpiService
+
+# openpyxl es opcional: solo se necesita para importar archivos XLSX
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque (un INSERT y un commit por bloque)
+DEFAULT_CHUNK_SIZE = 1000
+
+# Máximo de errores detallados en el resultado; el resto solo se cuentan
+MAX_REPORTED_ERRORS = 1000
+
+# Nombres de columna aceptados para cada campo del cliente
+COLUMN_ALIASES = {
+    "first_name": "first_name", "nombre": "first_name", "nombres": "first_name",
+    "last_name": "last_name", "apellido": "last_name", "apellidos": "last_name",
+    "email": "email", "correo": "email", "correo electronico": "email", "e-mail": "email",
+    "phone": "phone", "telefono": "phone", "celular": "phone", "movil": "phone",
+    "address": "address", "direccion": "address",
+    "segment": "segment", "segmento": "segment",
+    "notes": "notes", "notas": "notes",
+}
+
+def _normalize_header(header: Optional[str]) -> str:
+    text = unicodedata.normalize("NFKD", (header or "").strip().lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.replace("_", " ").strip()
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    Deja solo los dígitos del teléfono para comparar duplicados
+    (misma normalización que Customer.phone_digits).
+    """
+    return Customer.normalize_phone(phone)
+
+def iter_csv_rows(file: BinaryIO, encoding: str = "utf-8-sig") -> Iterator[Dict[str, Any]]:
+    """
+    Lee un CSV fila a fila como diccionarios.
+    Detecta el separador (coma o punto y coma) con la primera línea.
+    """
+    text = io.TextIOWrapper(file, encoding=encoding, newline="")
+    first_line = text.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    headers = next(csv.reader([first_line], delimiter=delimiter), [])
+
+    for values in csv.reader(text, delimiter=delimiter):
+        if not any(value.strip() for value in values):
+            continue
+        yield dict(zip(headers, values))
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """
+    Lee la primera hoja de un XLSX fila a fila (modo de solo lectura de openpyxl).
+    """
+    if load_workbook is None:
+        raise ValueError("Para importar archivos XLSX es necesario instalar openpyxl")
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [str(value) if value is not None else "" for value in next(rows, ())]
+        for values in rows:
+            if not any(value is not None and str(value).strip() for value in values):
+                continue
+            yield {
+                header: "" if value is None else str(value)
+                for header, value in zip(headers, values)
+            }
+    finally:
+        workbook.close()
+
+def iter_file_rows(file: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    """
+    Elige el lector según la extensión del archivo.
+    """
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_rows(file)
+    return iter_csv_rows(file)
+
+class ImportResult:
+    """
+    Resumen de una importación.
+    """
+    def __init__(self):
+        self.total_rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_rows": self.total_rows,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+class CustomerImportService:
+    """
+    Servicio para importar clientes en bloque.
+    """
+    def __init__(self, db: Session, schema: Type[BaseModel]):
+        """
+        Inicializa el servicio.
+
+        Args:
+            db: Conexión a la base de datos
+            schema: Modelo Pydantic con el que se valida cada fila (CustomerCreate)
+        """
+        self.db = db
+        self.schema = schema
+
+    def import_rows(
+        self,
+        organization_id: int,
+        rows: Iterable[Dict[str, Any]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_progress: Optional[Callable[[ImportResult], None]] = None
+    ) -> ImportResult:
+        """
+        Importa las filas en bloques.
+
+        Args:
+            organization_id: Organización a la que pertenecen los clientes
+            rows: Filas del archivo como diccionarios (encabezado -> valor)
+            chunk_size: Número de filas por bloque
+            on_progress: Función llamada tras cada bloque con el resultado parcial
+
+        Returns:
+            Resumen de la importación con los errores por fila
+        """
+        result = ImportResult()
+
+        # Emails y teléfonos ya vistos en el archivo (para duplicados internos)
+        seen_emails: Set[str] = set()
+        seen_phones: Set[str] = set()
+
+        chunk: List[tuple] = []
+        for row_number, raw in enumerate(rows, start=2):  # La fila 1 es el encabezado
+            result.total_rows += 1
+            chunk.append((row_number, raw))
+            if len(chunk) >= chunk_size:
+                self._import_chunk(organization_id, chunk, result, seen_emails, seen_phones)
+                chunk = []
+                if on_progress:
+                    on_progress(result)
+
+        if chunk:
+            self._import_chunk(organization_id, chunk, result, seen_emails, seen_phones)
+            if on_progress:
+                on_progress(result)
+
+        if result.created:
+            # Invalidar las instantáneas de KPIs del dashboard
+            KpiService.mark_stale(self.db, organization_id)
+            self.db.commit()
+            CustomerSearchService.invalidate(organization_id)
+
+        return result
+
+    def _map_row(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Traduce los encabezados del archivo a campos del cliente.
+        Las columnas desconocidas se guardan en custom_fields.
+        """
+        data: Dict[str, Any] = {}
+        custom_fields: Dict[str, Any] = {}
+
+        for header, value in raw.items():
+            if header is None:
+                continue
+            value = value.strip() if isinstance(value, str) else value
+            if value in ("", None):
+                continue
+
+            field = COLUMN_ALIASES.get(_normalize_header(header))
+            if field:
+                data[field] = value
+            else:
+                custom_fields[header.strip()] = value
+
+        if custom_fields:
+            data["custom_fields"] = custom_fields
+        return data
+
+    def _import_chunk(
+        self,
+        organization_id: int,
+        chunk: List[tuple],
+        result: ImportResult,
+        seen_emails: Set[str],
+        seen_phones: Set[str]
+    ) -> None:
+        # 1) Validar las filas del bloque
+        valid: List[tuple] = []
+        for row_number, raw in chunk:
+            try:
+                customer_data = self.schema(**self._map_row(raw))
+            except ValidationError as e:
+                message = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                )
+                result.add_error(row_number, message)
+                continue
+            valid.append((row_number, customer_data.dict()))
+
+        if not valid:
+            return
+
+        # 2) Buscar en una sola consulta los clientes existentes con esos emails o teléfonos
+        emails = {data["email"].lower() for _, data in valid if data.get("email")}
+        phones = {normalize_phone(data.get("phone")) for _, data in valid} - {None}
+
+        existing_emails: Set[str] = set()
+        existing_phones: Set[str] = set()
+        if emails or phones:
+            conditions = []
+            if emails:
+                conditions.append(func.lower(Customer.email).in_(emails))
+            if phones:
+                # Misma normalización en ambos lados (índice ix_customers_org_phone_digits)
+                conditions.append(Customer.phone_digits.in_(phones))
+            for email, phone in self.db.query(Customer.email, Customer.phone).filter(
+                Customer.organization_id == organization_id,
+                or_(*conditions)
+            ).all():
+                if email:
+                    existing_emails.add(email.lower())
+                if phone:
+                    existing_phones.add(normalize_phone(phone))
+
+        # 3) Descartar duplicados contra la base de datos y contra el propio archivo
+        to_insert: List[Dict[str, Any]] = []
+        inserted_rows: List[int] = []
+        for row_number, data in valid:
+            email = data["email"].lower() if data.get("email") else None
+            phone = normalize_phone(data.get("phone"))
+
+            if (email and (email in existing_emails or email in seen_emails)) or \
+                    (phone and (phone in existing_phones or phone in seen_phones)):
+                result.duplicates += 1
+                continue
+
+            if email:
+                seen_emails.add(email)
+            if phone:
+                seen_phones.add(phone)
+
+            to_insert.append({
+                **data,
+                "organization_id": organization_id,
+                "status": "active",
+            })
+            inserted_rows.append(row_number)
+
+        if not to_insert:
+            return
+
+        # 4) Insertar el bloque con un INSERT de varias filas y confirmar
+        try:
+            created_ids = self.db.execute(
+                insert(Customer).returning(Customer.id), to_insert
+            ).scalars().all()
+            self.db.commit()
+            result.created += len(to_insert)
+
+            # Los clientes nuevos se segmentan en segundo plano
+            segmentation_worker.mark_dirty(organization_id, created_ids)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error al insertar un bloque de {len(to_insert)} clientes: {e}")
+            for row_number in inserted_rows:
+                result.add_error(row_number, "Error al guardar el bloque en la base de datos")
@@ -0,0 +1,321 @@
+"""
+Búsqueda de clientes por nombre, apellido y email.
+
+En PostgreSQL se apoya en un índice GIN de trigramas (pg_trgm) sobre el
+documento normalizado `f_unaccent(lower(nombre || apellido || email))`, de
+modo que `LIKE '%texto%'` no recorre todos los clientes de la organización.
+Los resultados se ordenan por coincidencia de prefijo y similitud, y las
+páginas siguientes continúan a partir de la posición (rango de prefijo,
+similitud, id) del último resultado devuelto.
+
+En otros motores (SQLite en pruebas) se usa un índice de n-gramas en memoria
+por organización con el mismo comportamiento.
+"""
+import logging
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, func, literal, or_
+from sqlalchemy.orm import Query, Session
+
+from app.models.customer import Customer
+
+logger = logging.getLogger(__name__)
+
+# Longitud de los n-gramas del índice en memoria (igual que pg_trgm)
+NGRAM_SIZE = 3
+
+def normalize(text: Optional[str]) -> str:
+    """
+    Pasa a minúsculas y elimina los acentos (José -> jose, Peña -> pena),
+    igual que f_unaccent(lower(...)) en PostgreSQL.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(term: str) -> List[str]:
+    """
+    Divide el texto buscado en palabras normalizadas.
+    """
+    return [token for token in normalize(term).split() if token]
+
+def search_document():
+    """
+    Expresión SQL del documento de búsqueda.
+    Debe coincidir con la expresión del índice ix_customers_search_trgm.
+    """
+    return func.f_unaccent(func.lower(
+        func.coalesce(Customer.first_name, "") + " " +
+        func.coalesce(Customer.last_name, "") + " " +
+        func.coalesce(Customer.email, "")
+    ))
+
+# Posición de un resultado: (rango de prefijo, similitud, id). El rango vale 2
+# si el documento empieza por el texto, 1 si alguna palabra empieza por él y 0 si no
+SearchKey = Tuple[int, float, int]
+
+def search_order(key: SearchKey) -> tuple:
+    """
+    Clave de ordenación: mayor rango, mayor similitud y menor id primero.
+    """
+    prefix_rank, similarity, customer_id = key
+    return (-prefix_rank, -similarity, customer_id)
+
+def _escape_like(token: str) -> str:
+    return token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class NgramIndex:
+    """
+    Índice invertido de n-gramas en memoria para los clientes de una organización.
+    """
+    def __init__(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Optional[str]]]):
+        self._documents: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+        for customer_id, first_name, last_name, email in rows:
+            document = " ".join(normalize(value) for value in (first_name, last_name, email))
+            self._documents[customer_id] = document
+            for gram in self._grams(document):
+                self._postings.setdefault(gram, set()).add(customer_id)
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        padded = f" {text} "
+        if len(padded) < NGRAM_SIZE:
+            return {padded}
+        return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+    def search(self, tokens: List[str]) -> List[int]:
+        """
+        Devuelve los IDs que contienen todas las palabras, ordenados por relevancia.
+        """
+        return [customer_id for _, _, customer_id in self.rank(tokens)]
+
+    def rank(self, tokens: List[str]) -> List[SearchKey]:
+        """
+        Devuelve (rango de prefijo, similitud, id) de los clientes que contienen
+        todas las palabras, en orden de relevancia (ver search_order).
+        """
+        candidates: Optional[Set[int]] = None
+
+        for token in tokens:
+            # Solo los n-gramas interiores de la palabra: el texto puede aparecer en cualquier posición
+            grams = {token[i:i + NGRAM_SIZE] for i in range(len(token) - NGRAM_SIZE + 1)}
+            for gram in grams:
+                posting = self._postings.get(gram, set())
+                candidates = set(posting) if candidates is None else candidates & posting
+                if not candidates:
+                    return []
+
+        if candidates is None:
+            # Palabras más cortas que un n-grama: recorrer los documentos
+            candidates = set(self._documents)
+
+        matches = [
+            customer_id for customer_id in candidates
+            if all(token in self._documents[customer_id] for token in tokens)
+        ]
+
+        phrase = " ".join(tokens)
+        query_grams = self._grams(phrase)
+
+        def key(customer_id: int) -> SearchKey:
+            document = self._documents[customer_id]
+            if document.startswith(phrase):
+                prefix_rank = 2
+            elif f" {phrase}" in document:
+                prefix_rank = 1
+            else:
+                prefix_rank = 0
+            document_grams = self._grams(document)
+            similarity = len(query_grams & document_grams) / len(query_grams | document_grams)
+            return (prefix_rank, similarity, customer_id)
+
+        return sorted((key(customer_id) for customer_id in matches), key=search_order)
+
+class _MemoryIndexRegistry:
+    """
+    Índices en memoria por organización, reconstruidos tras cada invalidación.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[int, NgramIndex] = {}
+
+    def get(self, db: Session, organization_id: int) -> NgramIndex:
+        with self._lock:
+            index = self._indexes.get(organization_id)
+        if index is not None:
+            return index
+
+        rows = db.query(
+            Customer.id, Customer.first_name, Customer.last_name, Customer.email
+        ).filter(
+            Customer.organization_id == organization_id
+        ).all()
+        index = NgramIndex(rows)
+
+        with self._lock:
+            self._indexes[organization_id] = index
+        return index
+
+    def invalidate(self, organization_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(organization_id, None)
+
+# Índices en memoria compartidos por el proceso (solo fuera de PostgreSQL)
+memory_indexes = _MemoryIndexRegistry()
+
+class CustomerSearchService:
+    """
+    Servicio de búsqueda de clientes con ranking y coincidencia por prefijo.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def search(self, query: Query, organization_id: int, term: str, limit: int = 100) -> List[Customer]:
+        """
+        Busca clientes que contengan todas las palabras del texto.
+
+        Args:
+            query: Consulta de clientes ya filtrada (organización, estado, segmento)
+            organization_id: ID de la organización
+            term: Texto buscado
+            limit: Número máximo de resultados
+
+        Returns:
+            Lista de clientes ordenada por relevancia
+        """
+        customers, _ = self.search_page(query, organization_id, term, limit=limit)
+        return customers
+
+    def search_page(
+        self,
+        query: Query,
+        organization_id: int,
+        term: str,
+        limit: int = 100,
+        after: Optional[SearchKey] = None,
+        skip: int = 0
+    ) -> Tuple[List[Customer], Optional[SearchKey]]:
+        """
+        Devuelve una página de resultados de la búsqueda.
+
+        Args:
+            query: Consulta de clientes ya filtrada (organización, estado, segmento)
+            organization_id: ID de la organización
+            term: Texto buscado
+            limit: Tamaño de la página
+            after: Posición del último resultado de la página anterior (keyset)
+            skip: Desplazamiento clásico; se ignora si se indica after
+
+        Returns:
+            (clientes de la página, posición del último si hay más resultados o None)
+        """
+        if after is not None:
+            skip = 0
+
+        tokens = tokenize(term)
+        if not tokens:
+            if after is not None:
+                query = query.filter(Customer.id > after[2])
+            customers = query.order_by(Customer.id).offset(skip).limit(limit + 1).all()
+            keys = [(0, 0.0, customer.id) for customer in customers]
+        elif self.db.get_bind().dialect.name == "postgresql":
+            customers, keys = self._search_postgres(query, tokens, limit + 1, after, skip)
+        else:
+            customers, keys = self._search_memory(query, organization_id, tokens, limit + 1, after, skip)
+
+        # Se pide un resultado de más para saber si existe una página siguiente
+        if len(customers) > limit:
+            return customers[:limit], keys[limit - 1]
+        return customers, None
+
+    @staticmethod
+    def invalidate(organization_id: int) -> None:
+        """
+        Descarta el índice en memoria de una organización.
+        Se llama desde los endpoints que crean, modifican o eliminan clientes.
+        """
+        memory_indexes.invalidate(organization_id)
+
+    def _search_postgres(
+        self,
+        query: Query,
+        tokens: List[str],
+        limit: int,
+        after: Optional[SearchKey],
+        skip: int
+    ) -> Tuple[List[Customer], List[SearchKey]]:
+        document = search_document()
+        phrase = " ".join(tokens)
+
+        for token in tokens:
+            query = query.filter(document.like(f"%{_escape_like(token)}%", escape="\\"))
+
+        escaped_phrase = _escape_like(phrase)
+        prefix_rank = case(
+            (document.like(f"{escaped_phrase}%", escape="\\"), 2),
+            (document.like(f"% {escaped_phrase}%", escape="\\"), 1),
+            else_=0
+        )
+        similarity = func.similarity(document, literal(phrase))
+
+        if after is not None:
+            # Posición posterior a la del cursor en el orden (rango DESC, similitud DESC, id)
+            after_rank, after_similarity, after_id = after
+            query = query.filter(or_(
+                prefix_rank < after_rank,
+                and_(prefix_rank == after_rank, or_(
+                    similarity < after_similarity,
+                    and_(similarity == after_similarity, Customer.id > after_id)
+                ))
+            ))
+
+        rows = query.add_columns(prefix_rank, similarity).order_by(
+            prefix_rank.desc(),
+            similarity.desc(),
+            Customer.id
+        ).offset(skip).limit(limit).all()
+
+        customers = [customer for customer, _, _ in rows]
+        keys = [(rank, float(value), customer.id) for customer, rank, value in rows]
+        return customers, keys
+
+    def _search_memory(
+        self,
+        query: Query,
+        organization_id: int,
+        tokens: List[str],
+        limit: int,
+        after: Optional[SearchKey],
+        skip: int
+    ) -> Tuple[List[Customer], List[SearchKey]]:
+        ranked = memory_indexes.get(self.db, organization_id).rank(tokens)
+        if after is not None:
+            boundary = search_order(after)
+            ranked = [key for key in ranked if search_order(key) > boundary]
+        if not ranked:
+            return [], []
+
+        # Aplicar los demás filtros por bloques de candidatos, en orden de
+        # relevancia, hasta completar el desplazamiento y el límite
+        keys = {key[2]: key for key in ranked}
+        position = {key[2]: i for i, key in enumerate(ranked)}
+        wanted = skip + limit
+        chunk_size = max(wanted * 4, 200)
+        customers: List[Customer] = []
+        for start in range(0, len(ranked), chunk_size):
+            chunk = [key[2] for key in ranked[start:start + chunk_size]]
+            customers.extend(query.filter(Customer.id.in_(chunk)).all())
+            if len(customers) >= wanted:
+                break
+
+        customers.sort(key=lambda customer: position[customer.id])
+        customers = customers[skip:wanted]
+        return customers, [keys[customer.id] for customer in customers]
@@ -0,0 +1,278 @@
+"""
+Servicio de KPIs del dashboard.
+Calcula todas las métricas de la visión general con dos sentencias SQL
+(agregados condicionales y una UNION ALL de distribuciones) y, opcionalmente,
+las sirve desde una instantánea por organización y período.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.dashboard_cache import invalidate_on_commit
+from app.db.base import utcnow
+from app.models.customer import Customer
+from app.models.interaction import Interaction
+from app.models.kpi_snapshot import KpiSnapshot
+from app.models.opportunity import Opportunity
+from app.models.pipeline_stage import PipelineStage
+
+logger = logging.getLogger(__name__)
+
+# Duración de cada período del dashboard
+PERIOD_DAYS = {
+    "week": 7,
+    "month": 30,
+    "quarter": 90,
+    "year": 365,
+}
+
+def period_start(period: str, now: Optional[datetime] = None) -> datetime:
+    """
+    Devuelve el inicio del período seleccionado (por defecto: mes).
+    """
+    now = now or datetime.now()
+    return now - timedelta(days=PERIOD_DAYS.get(period, 30))
+
+class KpiService:
+    """
+    Servicio para calcular y almacenar los KPIs del dashboard.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def get_overview(self, organization_id: int, period: str = "month", use_snapshot: bool = True) -> Dict[str, Any]:
+        """
+        Obtiene la visión general del dashboard.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+            use_snapshot: Si se puede responder desde la instantánea guardada
+
+        Returns:
+            Diccionario con los KPIs de la visión general
+        """
+        if period not in PERIOD_DAYS:
+            period = "month"
+
+        if not (use_snapshot and settings.KPI_SNAPSHOT_ENABLED):
+            return self.compute_overview(organization_id, period)
+
+        snapshot = self.db.query(KpiSnapshot).filter(
+            KpiSnapshot.organization_id == organization_id,
+            KpiSnapshot.period == period
+        ).first()
+
+        if snapshot and self._is_fresh(snapshot):
+            return snapshot.data
+
+        return self.refresh_snapshot(organization_id, period)
+
+    def compute_overview(self, organization_id: int, period: str = "month") -> Dict[str, Any]:
+        """
+        Calcula los KPIs directamente sobre las tablas de origen.
+        """
+        start_date = period_start(period)
+
+        # 1) Métricas escalares en una sola fila usando agregados condicionales
+        opportunity_metrics = select(
+            func.count(Opportunity.id).filter(
+                Opportunity.status == "open"
+            ).label("active_opportunities_count"),
+            func.count(Opportunity.id).filter(
+                Opportunity.status == "won",
+                Opportunity.updated_at >= start_date
+            ).label("won_opportunities_count"),
+            func.coalesce(
+                func.sum(Opportunity.value).filter(Opportunity.status == "open"), 0
+            ).label("total_pipeline_value"),
+        ).where(
+            Opportunity.organization_id == organization_id
+        ).subquery()
+
+        customers_count = select(func.count(Customer.id)).where(
+            Customer.organization_id == organization_id,
+            Customer.status == "active"
+        ).scalar_subquery()
+
+        # Rango sobre ix_interactions_org_date_time: el coste depende de las
+        # interacciones del período y no del número de clientes de la organización
+        recent_interactions_count = select(func.count(Interaction.id)).where(
+            Interaction.organization_id == organization_id,
+            Interaction.date_time >= start_date
+        ).scalar_subquery()
+
+        row = self.db.execute(
+            select(
+                customers_count.label("customers_count"),
+                recent_interactions_count.label("recent_interactions_count"),
+                opportunity_metrics.c.active_opportunities_count,
+                opportunity_metrics.c.won_opportunities_count,
+                opportunity_metrics.c.total_pipeline_value,
+            )
+        ).one()
+
+        # 2) Distribuciones por segmento y por etapa en una sola consulta
+        segments = select(
+            literal("segment").label("kind"),
+            Customer.segment.label("name"),
+            func.count(Customer.id).label("count"),
+        ).where(
+            Customer.organization_id == organization_id,
+            Customer.status == "active",
+            Customer.segment.isnot(None)
+        ).group_by(Customer.segment)
+
+        stages = select(
+            literal("stage").label("kind"),
+            func.coalesce(PipelineStage.name, "Unknown").label("name"),
+            func.count(Opportunity.id).label("count"),
+        ).select_from(Opportunity).outerjoin(
+            PipelineStage, PipelineStage.id == Opportunity.stage_id
+        ).where(
+            Opportunity.organization_id == organization_id,
+            Opportunity.status == "open"
+        ).group_by(func.coalesce(PipelineStage.name, "Unknown"))
+
+        customers_by_segment = {}
+        opportunities_by_stage = {}
+        for kind, name, count in self.db.execute(union_all(segments, stages)).all():
+            if kind == "segment":
+                customers_by_segment[name] = count
+            else:
+                opportunities_by_stage[name] = count
+
+        active_opportunities_count = row.active_opportunities_count or 0
+        total_pipeline_value = float(row.total_pipeline_value or 0)
+
+        # Calcular tamaño promedio de acuerdo
+        average_deal_size = 0.0
+        if active_opportunities_count > 0:
+            average_deal_size = total_pipeline_value / active_opportunities_count
+
+        return {
+            "customers_count": row.customers_count or 0,
+            "active_opportunities_count": active_opportunities_count,
+            "won_opportunities_count": row.won_opportunities_count or 0,
+            "total_pipeline_value": total_pipeline_value,
+            "average_deal_size": float(average_deal_size),
+            "recent_interactions_count": row.recent_interactions_count or 0,
+            "customers_by_segment": customers_by_segment,
+            "opportunities_by_stage": opportunities_by_stage
+        }
+
+    def refresh_snapshot(self, organization_id: int, period: str) -> Dict[str, Any]:
+        """
+        Recalcula y guarda la instantánea de una organización y período.
+
+        La fila se bloquea (SELECT ... FOR UPDATE) antes de calcular: una
+        escritura que llame a mark_stale mientras tanto espera a que se guarde
+        la instantánea y la deja marcada como obsoleta, en lugar de que el
+        recálculo la sobrescriba con is_stale = False.
+        """
+        snapshot = self._lock_snapshot(organization_id, period)
+
+        # Otra petición pudo recalcularla mientras se esperaba el bloqueo
+        if self._is_fresh(snapshot):
+            data = snapshot.data
+            self.db.commit()
+            return data
+
+        data = self.compute_overview(organization_id, period)
+
+        snapshot.data = data
+        snapshot.computed_at = utcnow()
+        snapshot.is_stale = False
+        self.db.commit()
+
+        return data
+
+    def refresh_stale_snapshots(self, limit: int = 100, include_expired: bool = True) -> int:
+        """
+        Recalcula solo las instantáneas marcadas como obsoletas (y, opcionalmente,
+        las vencidas). Se ejecuta periódicamente en segundo plano (ver
+        app/core/rollup_worker.py), de modo que la primera petición del dashboard
+        tras una escritura normalmente encuentra la instantánea ya recalculada.
+        Cada instantánea se bloquea con SKIP LOCKED: varios procesos pueden
+        ejecutarlo a la vez sin repetir trabajo.
+
+        Args:
+            limit: Máximo de instantáneas a recalcular
+            include_expired: Recalcular también las que superan la antigüedad máxima
+
+        Returns:
+            Número de instantáneas recalculadas
+        """
+        condition = KpiSnapshot.is_stale == True
+        if include_expired:
+            expired_before = utcnow() - timedelta(seconds=settings.KPI_SNAPSHOT_MAX_AGE_SECONDS)
+            condition = condition | (KpiSnapshot.computed_at < expired_before)
+
+        refreshed = 0
+        for _ in range(limit):
+            snapshot = self.db.query(KpiSnapshot).filter(condition).order_by(
+                KpiSnapshot.computed_at
+            ).with_for_update(skip_locked=True).first()
+            if snapshot is None:
+                break
+
+            # refresh_snapshot confirma la transacción y libera el bloqueo
+            self.refresh_snapshot(snapshot.organization_id, snapshot.period)
+            refreshed += 1
+
+        self.db.rollback()
+        return refreshed
+
+    @staticmethod
+    def mark_stale(db: Session, organization_id: int) -> None:
+        """
+        Marca como obsoletas las instantáneas de una organización.
+        Se llama desde los endpoints que modifican datos usados por los KPIs,
+        dentro de la misma transacción que el cambio. Las respuestas del
+        dashboard en caché se invalidan cuando esa transacción se confirma.
+        """
+        # Se actualizan también las ya obsoletas: así la escritura espera a
+        # cualquier recálculo en curso (ver refresh_snapshot) y lo invalida
+        db.query(KpiSnapshot).filter(
+            KpiSnapshot.organization_id == organization_id
+        ).update({"is_stale": True}, synchronize_session=False)
+        invalidate_on_commit(db, organization_id)
+
+    def _lock_snapshot(self, organization_id: int, period: str) -> KpiSnapshot:
+        """
+        Bloquea la instantánea de la organización y período, creándola antes
+        (marcada como obsoleta y confirmada) si no existe, para que las
+        escrituras concurrentes también la encuentren y esperen al bloqueo.
+        """
+        query = self.db.query(KpiSnapshot).filter(
+            KpiSnapshot.organization_id == organization_id,
+            KpiSnapshot.period == period
+        ).populate_existing().with_for_update()
+
+        snapshot = query.first()
+        if snapshot is None:
+            self.db.execute(pg_insert(KpiSnapshot).values(
+                organization_id=organization_id,
+                period=period,
+                data={},
+                computed_at=utcnow(),
+                is_stale=True
+            ).on_conflict_do_nothing(index_elements=["organization_id", "period"]))
+            self.db.commit()
+            snapshot = query.first()
+
+        return snapshot
+
+    def _is_fresh(self, snapshot: KpiSnapshot) -> bool:
+        if snapshot.is_stale:
+            return False
+        age = utcnow() - snapshot.computed_at
+        return age.total_seconds() < settings.KPI_SNAPSHOT_MAX_AGE_SECONDS
@@ -0,0 +1,157 @@
+"""
+Motor de analítica de pipelines.
+Calcula las métricas de todas las etapas con un número fijo de consultas
+agrupadas sobre opportunities y stage_history, y las combina en Python
+mediante diccionarios, en lugar de lanzar varias consultas por etapa.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.opportunity import Opportunity
+from app.models.pipeline import Pipeline
+from app.models.pipeline_stage import PipelineStage
+from app.models.stage_history import StageHistory
+
+class PipelineAnalyticsService:
+    """
+    Servicio para calcular el rendimiento de los pipelines de una organización.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def get_stage_metrics(self, organization_id: int, pipeline_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcula las métricas por etapa y la conversión general.
+
+        Usa siempre 4 consultas, independientemente del número de etapas:
+        etapas, oportunidades abiertas por etapa, transiciones del historial
+        y totales de oportunidades ganadas.
+
+        Args:
+            organization_id: ID de la organización
+            pipeline_id: Restringir a un pipeline concreto (opcional)
+
+        Returns:
+            Diccionario con stage_metrics y overall_conversion_rate
+        """
+        # 1) Etapas del pipeline (o de todos los pipelines de la organización)
+        stages_query = self.db.query(PipelineStage).join(
+            Pipeline, Pipeline.id == PipelineStage.pipeline_id
+        ).filter(
+            Pipeline.organization_id == organization_id
+        )
+        if pipeline_id:
+            stages_query = stages_query.filter(Pipeline.id == pipeline_id)
+
+        stages = stages_query.order_by(PipelineStage.order).all()
+
+        if not stages:
+            return {"stage_metrics": [], "overall_conversion_rate": 0.0}
+
+        # 2) Oportunidades abiertas por etapa (cantidad y valor)
+        open_query = self.db.query(
+            Opportunity.stage_id,
+            func.count(Opportunity.id),
+            func.coalesce(func.sum(Opportunity.value), 0)
+        ).filter(
+            Opportunity.organization_id == organization_id,
+            Opportunity.status == "open"
+        )
+        if pipeline_id:
+            open_query = open_query.filter(Opportunity.pipeline_id == pipeline_id)
+
+        open_by_stage = {
+            stage_id: (count, value)
+            for stage_id, count, value in open_query.group_by(Opportunity.stage_id).all()
+        }
+
+        # 3) Transiciones del historial agrupadas por (origen, destino).
+        # Se guardan suma y cantidad de time_in_stage para calcular el promedio
+        # por etapa de origen igual que AVG (ignorando valores nulos).
+        transitions_query = self.db.query(
+            StageHistory.from_stage_id,
+            StageHistory.to_stage_id,
+            func.count(StageHistory.id),
+            func.coalesce(func.sum(StageHistory.time_in_stage), 0),
+            func.count(StageHistory.time_in_stage)
+        ).join(
+            PipelineStage, PipelineStage.id == StageHistory.from_stage_id
+        ).join(
+            Pipeline, Pipeline.id == PipelineStage.pipeline_id
+        ).filter(
+            Pipeline.organization_id == organization_id
+        )
+        if pipeline_id:
+            transitions_query = transitions_query.filter(Pipeline.id == pipeline_id)
+
+        moves: Dict[tuple, int] = {}
+        total_moves: Dict[int, int] = {}
+        time_sum: Dict[int, float] = {}
+        time_count: Dict[int, int] = {}
+        for from_id, to_id, count, seconds, timed in transitions_query.group_by(
+            StageHistory.from_stage_id, StageHistory.to_stage_id
+        ).all():
+            moves[(from_id, to_id)] = count
+            total_moves[from_id] = total_moves.get(from_id, 0) + count
+            time_sum[from_id] = time_sum.get(from_id, 0) + float(seconds)
+            time_count[from_id] = time_count.get(from_id, 0) + timed
+
+        # Siguiente etapa de cada etapa dentro de su pipeline
+        next_stage_id: Dict[int, int] = {}
+        previous_by_pipeline: Dict[int, PipelineStage] = {}
+        for stage in sorted(stages, key=lambda s: (s.pipeline_id, s.order)):
+            previous = previous_by_pipeline.get(stage.pipeline_id)
+            if previous is not None and previous.order < stage.order:
+                next_stage_id[previous.id] = stage.id
+            previous_by_pipeline[stage.pipeline_id] = stage
+
+        stage_metrics: List[Dict[str, Any]] = []
+        for stage in stages:
+            current_count, stage_value = open_by_stage.get(stage.id, (0, 0))
+
+            avg_time = 0
+            if time_count.get(stage.id):
+                avg_time = time_sum[stage.id] / time_count[stage.id]
+
+            conversion_rate = 0
+            next_id = next_stage_id.get(stage.id)
+            if next_id is not None and total_moves.get(stage.id):
+                conversion_rate = moves.get((stage.id, next_id), 0) / total_moves[stage.id] * 100
+
+            avg_time_in_stage = round(float(avg_time) / 86400, 1) if avg_time > 0 else 0  # Convertir segundos a días
+
+            stage_metrics.append({
+                "stage_id": stage.id,
+                "stage_name": stage.name,
+                "opportunity_count": current_count,
+                "stage_value": float(stage_value),
+                "avg_time_in_days": avg_time_in_stage,
+                "conversion_rate": round(conversion_rate, 2),
+                "probability": stage.probability
+            })
+
+        # 4) Conversión general: oportunidades ganadas sobre el total
+        overall_conversion = 0
+        initial_stage = next((s for s in stages if s.order == 0), None)
+        final_stage = next((s for s in stages if s.is_won), None)
+
+        if initial_stage and final_stage:
+            won_count, total_opps = self.db.query(
+                func.count(Opportunity.id).filter(Opportunity.status == "won"),
+                func.count(Opportunity.id)
+            ).filter(
+                Opportunity.organization_id == organization_id
+            ).one()
+
+            if total_opps > 0:
+                overall_conversion = (won_count / total_opps * 100)
+
+        return {
+            "stage_metrics": stage_metrics,
+            "overall_conversion_rate": round(overall_conversion, 2)
+        }
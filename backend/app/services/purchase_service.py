@@ -0,0 +1,535 @@
+"""
+Registro de compras y actualización de las métricas de segmentación.
+
+Las métricas se actualizan siempre en el servidor con expresiones del tipo
+`purchase_count = purchase_count + n` calculadas sobre los valores vigentes de
+la fila, nunca con lectura-modificación-escritura en Python. Así dos compras
+(o dos lotes) concurrentes del mismo cliente no pierden incrementos.
+
+- Una compra: UPDATE ... RETURNING sobre el cliente.
+- Un lote: los agregados por cliente se cargan en una tabla temporal y se
+  aplican con un único UPDATE ... FROM.
+
+Cada compra se añade además, en la misma transacción, al registro de solo
+inserción `purchases` (con sus líneas de producto opcionales). Las métricas
+del cliente son valores derivados de ese registro: rebuild_customer_summaries
+las recalcula desde él en una sola pasada.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Column, Date, Float, Integer, MetaData, Table, and_, case, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db.base import utcnow
+from app.db.partitions import ensure_monthly_partitions
+from app.models.customer import Customer
+from app.models.purchase import Purchase, PurchaseItem
+from app.services.kpi_service import KpiService
+from app.services.sales_timeseries import local_zone, organization_timezone
+from app.core.segmentation_worker import segmentation_worker
+
+logger = logging.getLogger(__name__)
+
+# Peso del valor anterior en el promedio de días entre compras
+# (mismo criterio que record_customer_purchase: 70% histórico, 30% nuevo intervalo)
+FREQUENCY_DECAY = 0.7
+
+# Tabla temporal con los agregados de cada cliente en el lote.
+# Se elimina automáticamente al confirmar la transacción.
+purchase_staging = Table(
+    "purchase_batch_staging",
+    MetaData(),
+    Column("customer_id", Integer, primary_key=True),
+    Column("purchase_count", Integer, nullable=False),
+    Column("amount", Float, nullable=False),
+    Column("first_date", Date, nullable=False),
+    Column("last_date", Date, nullable=False),
+    # Factor por el que se multiplica la frecuencia tras la primera compra del lote
+    Column("frequency_decay", Float, nullable=False),
+    # Aporte de los intervalos entre compras del propio lote
+    Column("frequency_tail", Float, nullable=False),
+    # Frecuencia final si el cliente no tenía compras previas
+    Column("fresh_frequency", Float, nullable=True),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+def aggregate_purchases(purchases: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrupa las compras por cliente y precalcula la parte del promedio de días
+    entre compras que no depende del estado actual del cliente.
+
+    Aplicar el promedio compra a compra (f = 0.7 * f + 0.3 * intervalo) sobre
+    las fechas ordenadas equivale a:
+        f_final = f_tras_primera * 0.7^(n-1) + sum(0.3 * 0.7^(n-i) * intervalo_i, i = 2..n)
+    donde solo f_tras_primera depende de la última compra ya guardada.
+    """
+    dates_by_customer: Dict[int, List[date]] = defaultdict(list)
+    amount_by_customer: Dict[int, float] = defaultdict(float)
+
+    for purchase in purchases:
+        dates_by_customer[purchase["customer_id"]].append(purchase["purchase_date"])
+        amount_by_customer[purchase["customer_id"]] += purchase["amount"]
+
+    rows = []
+    for customer_id, dates in dates_by_customer.items():
+        dates.sort()
+        count = len(dates)
+        gaps = [(current - previous).days for previous, current in zip(dates, dates[1:])]
+
+        tail = 0.0
+        for i, gap in enumerate(gaps):
+            # gaps[i] es el intervalo de la compra i + 2; le quedan count - i - 2 compras detrás
+            tail += (1 - FREQUENCY_DECAY) * gap * FREQUENCY_DECAY ** (count - i - 2)
+
+        # Sin compras previas, el primer intervalo inicia el promedio
+        fresh = None
+        for gap in gaps:
+            fresh = gap if not fresh else fresh * FREQUENCY_DECAY + gap * (1 - FREQUENCY_DECAY)
+
+        rows.append({
+            "customer_id": customer_id,
+            "purchase_count": count,
+            "amount": amount_by_customer[customer_id],
+            "first_date": dates[0],
+            "last_date": dates[-1],
+            "frequency_decay": FREQUENCY_DECAY ** (count - 1),
+            "frequency_tail": tail,
+            "fresh_frequency": fresh,
+        })
+
+    return rows
+
+def purchase_update_values(
+    purchase_count,
+    amount,
+    first_date,
+    last_date,
+    frequency_decay,
+    frequency_tail,
+    fresh_frequency
+) -> Dict[str, Any]:
+    """
+    Expresiones SET que aplican un grupo de compras a un cliente.
+    Los argumentos pueden ser columnas de la tabla temporal o valores literales;
+    todas las expresiones usan los valores actuales de la fila, no los leídos
+    por la aplicación.
+    """
+    had_purchases = and_(
+        func.coalesce(Customer.purchase_count, 0) > 0,
+        Customer.last_purchase_date.isnot(None)
+    )
+    first_gap = first_date - Customer.last_purchase_date
+    previous_frequency = func.nullif(Customer.purchase_frequency_days, 0)
+    frequency_after_first = case(
+        (previous_frequency.is_(None), first_gap),
+        else_=previous_frequency * FREQUENCY_DECAY + first_gap * (1 - FREQUENCY_DECAY)
+    )
+    new_count = func.coalesce(Customer.purchase_count, 0) + purchase_count
+    new_total = func.coalesce(Customer.total_spent, 0) + amount
+
+    return {
+        "first_purchase_date": func.coalesce(Customer.first_purchase_date, first_date),
+        "last_purchase_date": case(
+            (Customer.last_purchase_date > last_date, Customer.last_purchase_date),
+            else_=last_date
+        ),
+        "purchase_count": new_count,
+        "total_spent": new_total,
+        "average_purchase_value": new_total / new_count,
+        "purchase_frequency_days": case(
+            (had_purchases, frequency_after_first * frequency_decay + frequency_tail),
+            else_=func.coalesce(fresh_frequency, Customer.purchase_frequency_days)
+        ),
+        # Una compra más reciente reinicia el riesgo de abandono hasta el
+        # siguiente cálculo diario (ver churn_scoring): el cliente sale de la
+        # lista de riesgo y las reglas de segmentación no usan la puntuación vieja
+        "churn_risk_score": case(
+            (or_(Customer.last_purchase_date.is_(None), last_date > Customer.last_purchase_date), 0.0),
+            else_=Customer.churn_risk_score
+        ),
+    }
+
+def purchase_timestamp(purchase: Dict[str, Any], timezone_name: Optional[str] = None) -> datetime:
+    """
+    Momento de la compra en UTC sin zona, como se guarda. Una hora con zona se
+    convierte a UTC (sin zona se asume UTC); si solo se conoce la fecha, se usa
+    la medianoche local de la organización para que la compra caiga en su día.
+    """
+    purchased_at = purchase.get("purchased_at")
+    if purchased_at is None:
+        purchased_at = datetime.combine(purchase["purchase_date"], time(), tzinfo=local_zone(timezone_name))
+    if purchased_at.tzinfo is not None:
+        purchased_at = purchased_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return purchased_at
+
+def summary_values(organization_id: int, customer_ids: Optional[List[int]] = None):
+    """
+    Subconsulta con las métricas de compra de cada cliente calculadas desde el
+    registro en una sola pasada con funciones de ventana.
+
+    La frecuencia reproduce el promedio incremental (f = 0.7 * f + 0.3 * intervalo,
+    iniciado con el primer intervalo distinto de cero) como suma ponderada:
+        f = g_k * 0.7^(n-k) + sum(0.3 * 0.7^(n-i) * g_i, i = k+1..n)
+    donde g_i es el intervalo de la compra i y k la primera con intervalo > 0.
+    """
+    by_customer = dict(partition_by=Purchase.customer_id)
+    in_order = dict(partition_by=Purchase.customer_id, order_by=(Purchase.purchase_date, Purchase.id))
+
+    ordered = select(
+        Purchase.customer_id,
+        Purchase.purchase_date,
+        Purchase.amount,
+        func.row_number().over(**in_order).label("position"),
+        func.count().over(**by_customer).label("total"),
+        (Purchase.purchase_date - func.lag(Purchase.purchase_date).over(**in_order)).label("gap"),
+    ).where(Purchase.organization_id == organization_id)
+    if customer_ids is not None:
+        ordered = ordered.where(Purchase.customer_id.in_(customer_ids))
+    ordered = ordered.subquery("ordered")
+
+    with_start = select(
+        ordered,
+        func.min(ordered.c.position).filter(ordered.c.gap > 0).over(
+            partition_by=ordered.c.customer_id
+        ).label("first_gap_position"),
+    ).subquery("with_start")
+
+    position = with_start.c.position
+    start = with_start.c.first_gap_position
+    decay = func.power(FREQUENCY_DECAY, with_start.c.total - position)
+    weighted_gap = case(
+        (position == start, with_start.c.gap * decay),
+        (position > start, (1 - FREQUENCY_DECAY) * with_start.c.gap * decay),
+        else_=0
+    )
+    purchase_count = func.count()
+
+    return select(
+        with_start.c.customer_id,
+        purchase_count.label("purchase_count"),
+        func.sum(with_start.c.amount).label("total_spent"),
+        func.min(with_start.c.purchase_date).label("first_purchase_date"),
+        func.max(with_start.c.purchase_date).label("last_purchase_date"),
+        case(
+            (purchase_count > 1, func.coalesce(func.sum(weighted_gap), 0)),
+            else_=None
+        ).label("purchase_frequency_days"),
+    ).group_by(with_start.c.customer_id).subquery("summary")
+
+class PurchaseService:
+    """
+    Servicio para registrar compras de uno o muchos clientes.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def record_purchase(
+        self,
+        organization_id: int,
+        customer_id: int,
+        purchase_date: date,
+        amount: float,
+        purchased_at: Optional[datetime] = None,
+        items_count: int = 1,
+        lines: Optional[List[Dict[str, Any]]] = None,
+        notes: Optional[str] = None,
+        source: str = "api"
+    ) -> Optional[Customer]:
+        """
+        Registra una compra con un único UPDATE ... RETURNING atómico y la
+        añade al registro de compras.
+
+        Args:
+            organization_id: ID de la organización
+            customer_id: ID del cliente
+            purchase_date: Fecha de la compra
+            amount: Importe de la compra
+            purchased_at: Momento exacto de la compra (UTC), si se conoce
+            items_count: Número de artículos
+            lines: Líneas de producto (product_name, unit_price, quantity...)
+            notes: Notas de la compra
+            source: Origen de la compra
+
+        Returns:
+            El cliente con las métricas actualizadas, o None si no existe en la organización
+        """
+        purchase = {
+            "customer_id": customer_id,
+            "purchase_date": purchase_date,
+            "amount": amount,
+            "purchased_at": purchased_at,
+            "items_count": items_count,
+            "lines": lines,
+            "notes": notes,
+        }
+
+        # Antes de bloquear al cliente: puede crear la partición del mes
+        self.set_timestamps(organization_id, [purchase])
+        ensure_monthly_partitions(self.db.get_bind(), [purchase["purchased_at"]])
+
+        purchase_date_value = literal(purchase_date, Date)
+
+        customer = self.db.execute(
+            update(Customer)
+            .where(
+                Customer.id == customer_id,
+                Customer.organization_id == organization_id
+            )
+            .values(**purchase_update_values(
+                purchase_count=1,
+                amount=literal(amount, Float),
+                first_date=purchase_date_value,
+                last_date=purchase_date_value,
+                frequency_decay=1.0,
+                frequency_tail=0.0,
+                fresh_frequency=None
+            ))
+            .returning(Customer)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if customer is None:
+            self.db.rollback()
+            return None
+
+        self.append_to_log(organization_id, [purchase], source=source)
+
+        # Invalidar las instantáneas de KPIs del dashboard
+        KpiService.mark_stale(self.db, organization_id)
+
+        self.db.commit()
+
+        # Resegmentar al cliente en segundo plano
+        segmentation_worker.mark_dirty(organization_id, [customer_id])
+
+        self.db.refresh(customer)
+
+        return customer
+
+    def record_purchases(
+        self,
+        organization_id: int,
+        purchases: List[Dict[str, Any]],
+        source: str = "batch"
+    ) -> Dict[str, Any]:
+        """
+        Registra un lote de compras, las añade al registro y actualiza las
+        métricas de los clientes.
+
+        Args:
+            organization_id: ID de la organización
+            purchases: Compras con customer_id, purchase_date y amount (y
+                opcionalmente purchased_at, items_count, lines y notes)
+            source: Origen de las compras
+
+        Returns:
+            Resumen con compras procesadas, clientes actualizados y clientes desconocidos
+        """
+        requested_ids = sorted({purchase["customer_id"] for purchase in purchases})
+        if not requested_ids:
+            return {"processed_purchases": 0, "updated_customers": 0, "unknown_customer_ids": []}
+
+        # Antes de bloquear a los clientes: puede crear particiones de meses nuevos
+        self.set_timestamps(organization_id, purchases)
+        ensure_monthly_partitions(self.db.get_bind(), [purchase["purchased_at"] for purchase in purchases])
+
+        # Bloquear las filas en orden de id: valida la organización y evita
+        # interbloqueos entre lotes concurrentes que tocan los mismos clientes
+        known_ids = set(self.db.execute(
+            select(Customer.id).where(
+                Customer.organization_id == organization_id,
+                Customer.id.in_(requested_ids)
+            ).order_by(Customer.id).with_for_update()
+        ).scalars().all())
+
+        unknown_ids = [customer_id for customer_id in requested_ids if customer_id not in known_ids]
+        accepted = [purchase for purchase in purchases if purchase["customer_id"] in known_ids]
+
+        if not accepted:
+            self.db.rollback()
+            return {"processed_purchases": 0, "updated_customers": 0, "unknown_customer_ids": unknown_ids}
+
+        # Cargar los agregados en la tabla temporal
+        connection = self.db.connection()
+        purchase_staging.create(bind=connection)
+        connection.execute(insert(purchase_staging), aggregate_purchases(accepted))
+
+        staged = purchase_staging.c
+
+        # Un único UPDATE para todos los clientes del lote
+        result = self.db.execute(
+            update(Customer)
+            .where(
+                Customer.id == staged.customer_id,
+                Customer.organization_id == organization_id
+            )
+            .values(**purchase_update_values(
+                purchase_count=staged.purchase_count,
+                amount=staged.amount,
+                first_date=staged.first_date,
+                last_date=staged.last_date,
+                frequency_decay=staged.frequency_decay,
+                frequency_tail=staged.frequency_tail,
+                fresh_frequency=staged.fresh_frequency
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        updated_customers = result.rowcount
+
+        self.append_to_log(organization_id, accepted, source=source)
+
+        # Invalidar las instantáneas de KPIs del dashboard
+        KpiService.mark_stale(self.db, organization_id)
+
+        self.db.commit()
+
+        # Resegmentar en segundo plano solo a los clientes del lote
+        segmentation_worker.mark_dirty(organization_id, known_ids)
+
+        logger.info(
+            f"Lote de compras (org {organization_id}): {len(accepted)} compras, "
+            f"{updated_customers} clientes actualizados, {len(unknown_ids)} clientes desconocidos"
+        )
+
+        return {
+            "processed_purchases": len(accepted),
+            "updated_customers": updated_customers,
+            "unknown_customer_ids": unknown_ids,
+        }
+
+    def set_timestamps(self, organization_id: int, purchases: List[Dict[str, Any]]) -> None:
+        """
+        Fija en cada compra purchased_at (UTC sin zona) y has_time (si se
+        conocía la hora). Las compras ya procesadas no se modifican.
+        """
+        pending = [purchase for purchase in purchases if "has_time" not in purchase]
+        if not pending:
+            return
+
+        timezone_name = None
+        if any(purchase.get("purchased_at") is None for purchase in pending):
+            timezone_name = self.db.execute(select(organization_timezone(organization_id))).scalar()
+
+        for purchase in pending:
+            purchase["has_time"] = purchase.get("purchased_at") is not None
+            purchase["purchased_at"] = purchase_timestamp(purchase, timezone_name)
+
+    def append_to_log(self, organization_id: int, purchases: List[Dict[str, Any]], source: Optional[str] = None) -> None:
+        """
+        Añade las compras (y sus líneas) al registro, con INSERT de varias filas.
+        No confirma la transacción; las particiones de sus meses deben existir.
+        """
+        self.set_timestamps(organization_id, purchases)
+        created_at = utcnow()
+        rows = [
+            {
+                "organization_id": organization_id,
+                "customer_id": purchase["customer_id"],
+                "purchased_at": purchase["purchased_at"],
+                "has_time": purchase["has_time"],
+                "purchase_date": purchase["purchase_date"],
+                "amount": purchase["amount"],
+                "items_count": purchase.get("items_count") or 1,
+                "currency": purchase.get("currency"),
+                "source": source,
+                "notes": purchase.get("notes"),
+                "created_at": created_at,
+            }
+            for purchase in purchases
+        ]
+
+        if not any(purchase.get("lines") for purchase in purchases):
+            self.db.execute(insert(Purchase), rows)
+            return
+
+        # Con líneas de producto hacen falta los IDs generados, en el orden de las filas
+        purchase_ids = self.db.execute(
+            insert(Purchase).returning(Purchase.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+
+        items = []
+        for purchase_id, row, purchase in zip(purchase_ids, rows, purchases):
+            for line in purchase.get("lines") or []:
+                quantity = line.get("quantity") or 1.0
+                items.append({
+                    "purchase_id": purchase_id,
+                    "purchased_at": row["purchased_at"],
+                    "organization_id": organization_id,
+                    "product_sku": line.get("product_sku"),
+                    "product_name": line["product_name"],
+                    "category": line.get("category"),
+                    "quantity": quantity,
+                    "unit_price": line["unit_price"],
+                    "unit_cost": line.get("unit_cost"),
+                    "line_total": line.get("line_total") or quantity * line["unit_price"],
+                })
+
+        if items:
+            self.db.execute(insert(PurchaseItem), items)
+
+    def rebuild_customer_summaries(
+        self,
+        organization_id: int,
+        customer_ids: Optional[List[int]] = None
+    ) -> int:
+        """
+        Recalcula las métricas de compra de los clientes desde el registro
+        con un único UPDATE ... FROM. Solo se modifican los clientes con
+        compras registradas en purchases.
+
+        El registro no contiene las compras anteriores a su creación: se omiten
+        los clientes cuyas métricas guardadas incluyen más compras, o una
+        primera compra anterior, que las del registro, para no perder historial.
+
+        Args:
+            organization_id: ID de la organización
+            customer_ids: Clientes a recalcular (None para toda la organización)
+
+        Returns:
+            Número de clientes actualizados
+        """
+        summary = summary_values(organization_id, customer_ids)
+
+        updated_ids = self.db.execute(
+            update(Customer)
+            .where(
+                Customer.id == summary.c.customer_id,
+                Customer.organization_id == organization_id,
+                # Solo si el registro cubre todo el historial guardado del cliente
+                summary.c.purchase_count >= func.coalesce(Customer.purchase_count, 0),
+                or_(
+                    Customer.first_purchase_date.is_(None),
+                    summary.c.first_purchase_date <= Customer.first_purchase_date
+                )
+            )
+            .values(
+                first_purchase_date=summary.c.first_purchase_date,
+                last_purchase_date=summary.c.last_purchase_date,
+                purchase_count=summary.c.purchase_count,
+                total_spent=summary.c.total_spent,
+                average_purchase_value=summary.c.total_spent / summary.c.purchase_count,
+                purchase_frequency_days=summary.c.purchase_frequency_days,
+            )
+            .returning(Customer.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        # Invalidar las instantáneas de KPIs del dashboard
+        KpiService.mark_stale(self.db, organization_id)
+
+        self.db.commit()
+
+        # Resegmentar en segundo plano a los clientes recalculados
+        segmentation_worker.mark_dirty(organization_id, updated_ids)
+
+        logger.info(f"Métricas de compra reconstruidas (org {organization_id}): {len(updated_ids)} clientes")
+
+        return len(updated_ids)
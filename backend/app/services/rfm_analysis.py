@@ -0,0 +1,239 @@
+"""
+Análisis RFM (recencia, frecuencia y valor monetario) de los clientes.
+
+Las tres métricas de la organización se leen con una sola consulta en
+streaming directamente a arreglos NumPy contiguos; las puntuaciones por
+quintiles y los grupos KMeans se calculan de forma vectorizada y los
+resultados se escriben de vuelta con un único UPDATE desde una tabla temporal
+(cargada con COPY en PostgreSQL, ver app/db/bulk.py).
+"""
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.base import utcnow
+from app.db.bulk import load_staging_table
+from app.models.customer import Customer
+
+# scikit-learn solo se necesita para la agrupación KMeans
+try:
+    from sklearn.cluster import MiniBatchKMeans
+except ImportError:
+    MiniBatchKMeans = None
+
+logger = logging.getLogger(__name__)
+
+# Filas leídas por bloque del cursor del servidor
+FETCH_SIZE = 50000
+
+# Número de niveles de cada puntuación (quintiles)
+SCORE_LEVELS = 5
+
+# Tipo de cada fila leída: id y las tres métricas
+RFM_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("recency", np.float64),
+    ("frequency", np.float64),
+    ("monetary", np.float64),
+])
+
+# Tabla temporal con los resultados; se elimina al confirmar la transacción
+rfm_staging = Table(
+    "rfm_staging",
+    MetaData(),
+    Column("customer_id", Integer, primary_key=True),
+    Column("recency_score", Integer, nullable=False),
+    Column("frequency_score", Integer, nullable=False),
+    Column("monetary_score", Integer, nullable=False),
+    Column("rfm_score", String(3), nullable=False),
+    Column("cluster", Integer, nullable=True),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+def quantile_scores(values: np.ndarray, levels: int = SCORE_LEVELS, reverse: bool = False) -> np.ndarray:
+    """
+    Puntúa cada valor de 1 a `levels` según el cuantil en el que cae.
+
+    Args:
+        values: Métrica de todos los clientes
+        levels: Número de niveles
+        reverse: Si los valores bajos son mejores (recencia)
+
+    Returns:
+        Arreglo de enteros pequeños con las puntuaciones
+    """
+    edges = np.quantile(values, np.linspace(0, 1, levels + 1)[1:-1])
+    # side="left": un valor igual a un corte cae en el nivel inferior (como pandas.qcut),
+    # así los empates masivos (p. ej. una sola compra) quedan en el nivel más bajo
+    scores = np.searchsorted(edges, values, side="left").astype(np.int8) + 1
+    if reverse:
+        scores = (levels + 1 - scores).astype(np.int8)
+    return scores
+
+def kmeans_clusters(data: np.ndarray, n_clusters: int, random_state: int = 42) -> np.ndarray:
+    """
+    Agrupa a los clientes con KMeans sobre las métricas escaladas.
+    Los grupos se renumeran de menor a mayor valor monetario medio, de modo
+    que el número de grupo es estable entre ejecuciones.
+    """
+    if MiniBatchKMeans is None:
+        raise ValueError("Para agrupar clientes es necesario instalar scikit-learn")
+
+    # log1p reduce el peso de los valores extremos; luego estandarizar cada columna
+    features = np.column_stack((
+        np.log1p(data["recency"]),
+        np.log1p(data["frequency"]),
+        np.log1p(data["monetary"]),
+    ))
+    features -= features.mean(axis=0)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    features /= std
+
+    model = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        random_state=random_state,
+        batch_size=4096,
+        n_init=3,
+    )
+    labels = model.fit_predict(features)
+
+    # Renumerar por valor monetario medio del grupo
+    sums = np.bincount(labels, weights=data["monetary"], minlength=n_clusters)
+    counts = np.bincount(labels, minlength=n_clusters)
+    means = np.divide(sums, counts, out=np.zeros(n_clusters), where=counts > 0)
+    order = np.argsort(means)
+    remap = np.empty(n_clusters, dtype=np.int16)
+    remap[order] = np.arange(n_clusters, dtype=np.int16)
+
+    return remap[labels]
+
+class RfmAnalysisService:
+    """
+    Servicio para calcular y guardar el análisis RFM de una organización.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def load_metrics(self, organization_id: int) -> np.ndarray:
+        """
+        Lee recencia, frecuencia y valor monetario de los clientes con compras
+        en un arreglo estructurado, sin materializar filas intermedias.
+        """
+        statement = select(
+            Customer.id,
+            Customer.days_since_last_purchase,
+            Customer.purchase_count,
+            func.coalesce(Customer.total_spent, 0),
+        ).where(
+            Customer.organization_id == organization_id,
+            Customer.purchase_count > 0,
+            Customer.last_purchase_date.isnot(None)
+        )
+
+        rows = self.db.execute(statement.execution_options(yield_per=FETCH_SIZE))
+        return np.fromiter((tuple(row) for row in rows), dtype=RFM_DTYPE)
+
+    def score(self, organization_id: int, n_clusters: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcula las puntuaciones RFM (y opcionalmente los grupos) y las guarda.
+
+        Args:
+            organization_id: ID de la organización
+            n_clusters: Número de grupos KMeans (None para no agrupar)
+
+        Returns:
+            Resumen con el número de clientes puntuados y la distribución
+        """
+        data = self.load_metrics(organization_id)
+        if data.size == 0:
+            return {"scored_customers": 0, "rfm_distribution": {}, "clusters": []}
+
+        recency = quantile_scores(data["recency"], reverse=True)
+        frequency = quantile_scores(data["frequency"])
+        monetary = quantile_scores(data["monetary"])
+
+        # Código "RFM" de tres dígitos (111 a 555) como entero para agregarlo rápido
+        codes = recency.astype(np.int16) * 100 + frequency * 10 + monetary
+
+        clusters = None
+        if n_clusters:
+            n_clusters = min(n_clusters, data.size)
+            clusters = kmeans_clusters(data, n_clusters)
+
+        self._write_back(organization_id, data["id"], recency, frequency, monetary, codes, clusters)
+
+        unique_codes, code_counts = np.unique(codes, return_counts=True)
+        summary = {
+            "scored_customers": int(data.size),
+            "rfm_distribution": {
+                str(code): int(count) for code, count in zip(unique_codes, code_counts)
+            },
+            "clusters": [],
+        }
+
+        if clusters is not None:
+            for cluster in range(n_clusters):
+                mask = clusters == cluster
+                if not mask.any():
+                    continue
+                summary["clusters"].append({
+                    "cluster": cluster,
+                    "customers": int(mask.sum()),
+                    "avg_recency_days": round(float(data["recency"][mask].mean()), 1),
+                    "avg_frequency": round(float(data["frequency"][mask].mean()), 2),
+                    "avg_monetary": round(float(data["monetary"][mask].mean()), 2),
+                })
+
+        return summary
+
+    def _write_back(
+        self,
+        organization_id: int,
+        ids: np.ndarray,
+        recency: np.ndarray,
+        frequency: np.ndarray,
+        monetary: np.ndarray,
+        codes: np.ndarray,
+        clusters: Optional[np.ndarray]
+    ) -> None:
+        """
+        Carga los resultados en la tabla temporal y los aplica con un único UPDATE.
+        """
+        load_staging_table(self.db.connection(), rfm_staging, {
+            "customer_id": ids,
+            "recency_score": recency,
+            "frequency_score": frequency,
+            "monetary_score": monetary,
+            "rfm_score": codes.astype(str),
+            # Sin agrupación la columna queda en NULL
+            "cluster": clusters if clusters is not None else np.full(ids.size, np.nan),
+        })
+
+        staged = rfm_staging.c
+        self.db.execute(
+            update(Customer)
+            .where(
+                Customer.id == staged.customer_id,
+                Customer.organization_id == organization_id
+            )
+            .values(
+                rfm_recency_score=staged.recency_score,
+                rfm_frequency_score=staged.frequency_score,
+                rfm_monetary_score=staged.monetary_score,
+                rfm_score=staged.rfm_score,
+                rfm_cluster=staged.cluster,
+                rfm_updated_at=utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+        logger.info(f"Análisis RFM (org {organization_id}): {ids.size} clientes puntuados")
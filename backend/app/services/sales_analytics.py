@@ -0,0 +1,309 @@
+"""
+Analítica de ventas por producto sobre el registro de compras.
+
+Cada indicador se resuelve con una única consulta agrupada sobre purchases /
+purchase_items, acotada al período con un rango de purchased_at (poda de
+particiones e índice (organization_id, purchased_at) con columnas incluidas,
+que permite recorridos solo de índice). La consulta devuelve pocas filas (una
+por producto, categoría o franja horaria) y el resto del cálculo (rankings,
+participaciones, Pareto, matrices) se hace con NumPy.
+"""
+import logging
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.purchase import Purchase, PurchaseItem
+from app.services.kpi_service import PERIOD_DAYS
+from app.services.sales_timeseries import local_zone, organization_timezone, to_local
+
+logger = logging.getLogger(__name__)
+
+# Métricas por las que se pueden ordenar los productos
+PRODUCT_METRICS = ("quantity", "revenue", "orders")
+
+# Participación acumulada usada para el análisis de Pareto
+PARETO_SHARE = 0.8
+
+# Nombre de los días para la matriz de calor (ISO: lunes = 1)
+WEEKDAYS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+UNCATEGORIZED = "Sin categoría"
+
+def period_bounds(timezone_name: str, days: int, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    Límites UTC (sin zona, como se guardan) de los últimos `days` días locales,
+    incluido hoy. Se calculan en Python para que el planificador pueda podar
+    las particiones con valores constantes.
+    """
+    now = now or datetime.now(timezone.utc)
+    zone = local_zone(timezone_name)
+
+    today = now.astimezone(zone).date()
+    start = datetime.combine(today - timedelta(days=days - 1), time(), tzinfo=zone)
+    end = datetime.combine(today + timedelta(days=1), time(), tzinfo=zone)
+
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None),
+    )
+
+def _shares(values: np.ndarray) -> np.ndarray:
+    total = values.sum()
+    return values / total if total > 0 else np.zeros_like(values)
+
+class SalesAnalyticsService:
+    """
+    Servicio para los indicadores de ventas por producto, categoría y horario.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def _period(self, organization_id: int, period: str) -> Tuple[str, str, datetime, datetime]:
+        if period not in PERIOD_DAYS:
+            period = "month"
+        timezone_name = self.db.execute(select(organization_timezone(organization_id))).scalar()
+        timezone_name = timezone_name or settings.DEFAULT_TIMEZONE
+        start, end = period_bounds(timezone_name, PERIOD_DAYS[period])
+        return period, timezone_name, start, end
+
+    def top_products(
+        self,
+        organization_id: int,
+        period: str = "month",
+        limit: int = 10,
+        metric: str = "revenue",
+        ascending: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Productos más (o menos) vendidos del período.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+            limit: Número de productos a devolver
+            metric: Métrica del ranking (quantity, revenue, orders)
+            ascending: True para los menos vendidos
+
+        Returns:
+            Ranking con participación de cada producto y resumen de Pareto
+        """
+        if metric not in PRODUCT_METRICS:
+            metric = "revenue"
+        period, timezone_name, start, end = self._period(organization_id, period)
+
+        product_key = func.coalesce(PurchaseItem.product_sku, PurchaseItem.product_name)
+        rows = self.db.execute(
+            select(
+                product_key,
+                func.max(PurchaseItem.product_name),
+                func.max(PurchaseItem.category),
+                func.sum(PurchaseItem.quantity),
+                func.sum(PurchaseItem.line_total),
+                func.count(func.distinct(PurchaseItem.purchase_id)),
+            ).where(
+                PurchaseItem.organization_id == organization_id,
+                PurchaseItem.purchased_at >= start,
+                PurchaseItem.purchased_at < end
+            ).group_by(product_key)
+        ).all()
+
+        result = {
+            "period": period,
+            "timezone": timezone_name,
+            "metric": metric,
+            "order": "asc" if ascending else "desc",
+            "products_count": len(rows),
+            "products": [],
+            "pareto": {"share": PARETO_SHARE, "products": 0, "products_share": 0.0},
+        }
+        if not rows:
+            return result
+
+        keys, names, categories, quantity, revenue, orders = zip(*rows)
+        quantity = np.asarray(quantity, dtype=np.float64)
+        revenue = np.asarray(revenue, dtype=np.float64)
+        orders = np.asarray(orders, dtype=np.int64)
+        values = {"quantity": quantity, "revenue": revenue, "orders": orders.astype(np.float64)}[metric]
+
+        # Orden estable: a igualdad de valor, por clave de producto
+        order = np.lexsort((np.asarray(keys, dtype=object).astype(str), values))
+        if not ascending:
+            order = order[::-1]
+        selected = order[:max(limit, 0)]
+
+        revenue_share = _shares(revenue)
+        metric_share = _shares(values)
+
+        # Pareto: cuántos productos concentran el PARETO_SHARE de los ingresos
+        cumulative = np.cumsum(np.sort(revenue_share)[::-1])
+        pareto_products = int(np.searchsorted(cumulative, PARETO_SHARE) + 1) if revenue.sum() > 0 else 0
+        pareto_products = min(pareto_products, len(rows))
+
+        for rank, index in enumerate(selected, start=1):
+            result["products"].append({
+                "rank": rank,
+                "product": keys[index],
+                "product_name": names[index],
+                "category": categories[index],
+                "quantity": float(quantity[index]),
+                "revenue": round(float(revenue[index]), 2),
+                "orders": int(orders[index]),
+                "share": round(float(metric_share[index]), 4),
+                "revenue_share": round(float(revenue_share[index]), 4),
+            })
+
+        result["pareto"] = {
+            "share": PARETO_SHARE,
+            "products": pareto_products,
+            "products_share": round(pareto_products / len(rows), 4),
+        }
+        return result
+
+    def hourly_heatmap(self, organization_id: int, period: str = "month", metric: str = "orders") -> Dict[str, Any]:
+        """
+        Matriz día de la semana x hora (hora local de la organización) de las compras.
+        Las compras registradas solo con fecha no tienen hora y se excluyen.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+            metric: orders (número de compras) o revenue (importe)
+
+        Returns:
+            Matriz 7 x 24, totales por día y por hora y franja de mayor actividad
+        """
+        if metric not in ("orders", "revenue"):
+            metric = "orders"
+        period, timezone_name, start, end = self._period(organization_id, period)
+
+        local_time = to_local(Purchase.purchased_at, timezone_name)
+        weekday = extract("isodow", local_time)
+        hour = extract("hour", local_time)
+        rows = self.db.execute(
+            select(
+                weekday,
+                hour,
+                func.count(),
+                func.coalesce(func.sum(Purchase.amount), 0),
+            ).where(
+                Purchase.organization_id == organization_id,
+                Purchase.purchased_at >= start,
+                Purchase.purchased_at < end,
+                Purchase.has_time
+            ).group_by(weekday, hour)
+        ).all()
+
+        matrix = np.zeros((7, 24), dtype=np.float64)
+        if rows:
+            data = np.asarray(rows, dtype=np.float64)
+            column = 2 if metric == "orders" else 3
+            matrix[data[:, 0].astype(np.intp) - 1, data[:, 1].astype(np.intp)] = data[:, column]
+
+        peak = None
+        if matrix.max() > 0:
+            day_index, peak_hour = np.unravel_index(np.argmax(matrix), matrix.shape)
+            peak = {
+                "weekday": WEEKDAYS[day_index],
+                "hour": int(peak_hour),
+                "value": round(float(matrix[day_index, peak_hour]), 2),
+            }
+
+        by_weekday = matrix.sum(axis=1)
+        by_hour = matrix.sum(axis=0)
+        scale = matrix.max() or 1.0
+
+        return {
+            "period": period,
+            "timezone": timezone_name,
+            "metric": metric,
+            "weekdays": list(WEEKDAYS),
+            "hours": list(range(24)),
+            "matrix": np.round(matrix, 2).tolist(),
+            # Intensidad relativa (0 a 1) para colorear la matriz
+            "intensity": np.round(matrix / scale, 4).tolist(),
+            "by_weekday": dict(zip(WEEKDAYS, np.round(by_weekday, 2).tolist())),
+            "by_hour": np.round(by_hour, 2).tolist(),
+            "total": round(float(matrix.sum()), 2),
+            "peak": peak,
+        }
+
+    def margin_by_category(self, organization_id: int, period: str = "month") -> Dict[str, Any]:
+        """
+        Ingresos, costo y margen por categoría de producto.
+        El margen solo se calcula sobre las líneas con costo conocido.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+
+        Returns:
+            Categorías ordenadas por margen con su participación en los ingresos
+        """
+        period, timezone_name, start, end = self._period(organization_id, period)
+
+        category = func.coalesce(PurchaseItem.category, UNCATEGORIZED)
+        has_cost = PurchaseItem.unit_cost.isnot(None)
+        rows = self.db.execute(
+            select(
+                category,
+                func.sum(PurchaseItem.quantity),
+                func.sum(PurchaseItem.line_total),
+                func.coalesce(func.sum(PurchaseItem.line_total).filter(has_cost), 0),
+                func.coalesce(func.sum(PurchaseItem.quantity * PurchaseItem.unit_cost).filter(has_cost), 0),
+            ).where(
+                PurchaseItem.organization_id == organization_id,
+                PurchaseItem.purchased_at >= start,
+                PurchaseItem.purchased_at < end
+            ).group_by(category)
+        ).all()
+
+        result = {
+            "period": period,
+            "timezone": timezone_name,
+            "categories": [],
+            "totals": {"revenue": 0.0, "cost": 0.0, "margin": 0.0, "margin_percentage": 0.0},
+        }
+        if not rows:
+            return result
+
+        names, quantity, revenue, costed_revenue, cost = zip(*rows)
+        quantity = np.asarray(quantity, dtype=np.float64)
+        revenue = np.asarray(revenue, dtype=np.float64)
+        costed_revenue = np.asarray(costed_revenue, dtype=np.float64)
+        cost = np.asarray(cost, dtype=np.float64)
+
+        margin = costed_revenue - cost
+        margin_pct = np.divide(margin, costed_revenue, out=np.zeros_like(margin), where=costed_revenue > 0)
+        cost_coverage = np.divide(costed_revenue, revenue, out=np.zeros_like(revenue), where=revenue > 0)
+        revenue_share = _shares(revenue)
+
+        for index in np.argsort(-margin, kind="stable"):
+            result["categories"].append({
+                "category": names[index],
+                "quantity": float(quantity[index]),
+                "revenue": round(float(revenue[index]), 2),
+                "cost": round(float(cost[index]), 2),
+                "margin": round(float(margin[index]), 2),
+                "margin_percentage": round(float(margin_pct[index]) * 100, 2),
+                "revenue_share": round(float(revenue_share[index]), 4),
+                # Parte de los ingresos con costo conocido
+                "cost_coverage": round(float(cost_coverage[index]), 4),
+            })
+
+        total_costed = costed_revenue.sum()
+        total_margin = margin.sum()
+        result["totals"] = {
+            "revenue": round(float(revenue.sum()), 2),
+            "cost": round(float(cost.sum()), 2),
+            "margin": round(float(total_margin), 2),
+            "margin_percentage": round(float(total_margin / total_costed) * 100, 2) if total_costed > 0 else 0.0,
+        }
+        return result
@@ -0,0 +1,259 @@
+"""
+Series temporales de ventas para las gráficas del dashboard.
+
+Todo se resuelve en una sola sentencia (PostgreSQL):
+- la zona horaria de la organización (organizations.settings["timezone"],
+  por defecto settings.DEFAULT_TIMEZONE) y los límites de los períodos actual
+  y anterior se calculan en SQL a partir de now();
+- generate_series produce todos los intervalos (día, semana o mes) de ambos
+  períodos, de modo que los intervalos sin datos aparecen con cero;
+- los totales del período actual y del anterior se obtienen con funciones de
+  ventana sobre los mismos intervalos, sin consultas adicionales.
+
+Las fechas se guardan en UTC sin zona horaria; los intervalos se forman con
+la hora local de la organización. Con ANALYTICS_ROLLUPS_ENABLED, los días
+anteriores a hoy se leen de los resúmenes diarios (app/services/analytics_rollups.py).
+"""
+import logging
+from datetime import timezone, tzinfo
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Boolean, Date, DateTime, cast, func, literal, literal_column, select, true, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.analytics_rollup import DailySalesRollup
+from app.models.opportunity import Opportunity
+from app.models.organization import Organization
+from app.services.kpi_service import PERIOD_DAYS
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+# Granularidades admitidas (unidades de date_trunc)
+BUCKETS = ("day", "week", "month")
+
+# Granularidad por defecto de cada período
+DEFAULT_BUCKETS = {
+    "week": "day",
+    "month": "day",
+    "quarter": "week",
+    "year": "month",
+}
+
+def organization_timezone(organization_id: Optional[int] = None):
+    """
+    Expresión SQL con la zona horaria de la organización.
+    Sin ID, se refiere a la fila de organizations presente en el FROM.
+    """
+    timezone_name = Organization.settings["timezone"].as_string()
+    if organization_id is not None:
+        timezone_name = select(timezone_name).where(Organization.id == organization_id).scalar_subquery()
+    return func.coalesce(timezone_name, settings.DEFAULT_TIMEZONE)
+
+def local_zone(timezone_name: Optional[str]) -> tzinfo:
+    """
+    Zona horaria de Python para los cálculos fuera de SQL; UTC si no se conoce.
+    """
+    timezone_name = timezone_name or settings.DEFAULT_TIMEZONE
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(timezone_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Zona horaria desconocida: {timezone_name}; se usa UTC")
+    return timezone.utc
+
+def to_local(utc_column, timezone_name):
+    """
+    Fecha UTC sin zona (como se guardan) -> hora local sin zona.
+    """
+    return func.timezone(timezone_name, func.timezone("UTC", utc_column))
+
+def to_utc(local_value, timezone_name):
+    """
+    Hora local sin zona -> fecha UTC sin zona, comparable con las columnas.
+    """
+    return func.timezone("UTC", func.timezone(timezone_name, local_value))
+
+def local_day(utc_column, timezone_name):
+    """
+    Día local de la organización de una fecha UTC.
+    """
+    return cast(to_local(utc_column, timezone_name), Date)
+
+class SalesTimeSeriesService:
+    """
+    Servicio para obtener series de ventas por intervalos de tiempo.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el servicio con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def sales_performance(
+        self,
+        organization_id: int,
+        period: str = "month",
+        bucket: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtiene la serie de oportunidades ganadas y nuevas del período y la
+        comparación del valor ganado con el período anterior.
+
+        Args:
+            organization_id: ID de la organización
+            period: Período de análisis (week, month, quarter, year)
+            bucket: Granularidad de la serie (day, week, month); por defecto según el período
+
+        Returns:
+            Diccionario con las series completas (sin huecos) y la comparación
+        """
+        if period not in PERIOD_DAYS:
+            period = "month"
+        if bucket not in BUCKETS:
+            bucket = DEFAULT_BUCKETS[period]
+
+        days = PERIOD_DAYS[period]
+        statement = self._build_statement(organization_id, days, bucket)
+        rows = self.db.execute(statement).all()
+
+        won_data = []
+        new_data = []
+        for row in rows:
+            # Los intervalos anteriores al período solo aportan al total de comparación
+            if not row.in_current_period:
+                continue
+            period_label = row.bucket_start.date().isoformat()
+            won_data.append({
+                "period": period_label,
+                "count": int(row.won_count),
+                "value": float(row.won_value)
+            })
+            new_data.append({
+                "period": period_label,
+                "count": int(row.new_count)
+            })
+
+        current_value = float(rows[0].current_total) if rows else 0.0
+        previous_value = float(rows[0].previous_total) if rows else 0.0
+
+        change_percentage = 0.0
+        if previous_value > 0:
+            change_percentage = (current_value - previous_value) / previous_value * 100
+
+        return {
+            "bucket": bucket,
+            "timezone": rows[0].timezone if rows else settings.DEFAULT_TIMEZONE,
+            "won_opportunities": won_data,
+            "new_opportunities": new_data,
+            "comparison": {
+                "previous_period_value": previous_value,
+                "current_period_value": current_value,
+                "change_percentage": round(change_percentage, 2)
+            }
+        }
+
+    def _build_statement(self, organization_id: int, days: int, bucket: str):
+        """
+        Construye la consulta de la serie; `bucket` debe estar en BUCKETS.
+        """
+        # 1) Zona horaria de la organización y días límite (hora local)
+        timezone_name = organization_timezone(organization_id)
+        local_today = cast(func.timezone(timezone_name, func.now()), Date)
+        bounds = select(
+            timezone_name.label("timezone"),
+            (local_today - (days - 1)).label("start_day"),
+            local_today.label("today"),
+        ).cte("bounds")
+
+        tz = bounds.c.timezone
+        start_local = cast(bounds.c.start_day, DateTime)
+        previous_start_local = cast(bounds.c.start_day - days, DateTime)
+        end_local = cast(bounds.c.today + 1, DateTime)
+
+        # 2) Eventos de ambos períodos: ganadas (por updated_at) y nuevas (por created_at).
+        # Con los resúmenes diarios activos, los días anteriores a hoy salen de
+        # daily_sales_rollups (un registro por día) y solo hoy se lee de opportunities.
+        use_rollups = settings.ANALYTICS_ROLLUPS_ENABLED
+        won_start_local = cast(bounds.c.today, DateTime) if use_rollups else previous_start_local
+        new_start_local = cast(bounds.c.today, DateTime) if use_rollups else start_local
+
+        won_events = select(
+            to_local(Opportunity.updated_at, tz).label("local_time"),
+            (Opportunity.updated_at >= to_utc(start_local, tz)).label("is_current"),
+            literal(1).label("won"),
+            func.coalesce(Opportunity.value, 0).label("value"),
+            literal(0).label("new"),
+        ).select_from(Opportunity).join(bounds, true()).where(
+            Opportunity.organization_id == organization_id,
+            Opportunity.status == "won",
+            Opportunity.updated_at >= to_utc(won_start_local, tz),
+            Opportunity.updated_at < to_utc(end_local, tz)
+        )
+
+        new_events = select(
+            to_local(Opportunity.created_at, tz).label("local_time"),
+            literal(True, Boolean).label("is_current"),
+            literal(0).label("won"),
+            literal(0).label("value"),
+            literal(1).label("new"),
+        ).select_from(Opportunity).join(bounds, true()).where(
+            Opportunity.organization_id == organization_id,
+            Opportunity.created_at >= to_utc(new_start_local, tz),
+            Opportunity.created_at < to_utc(end_local, tz)
+        )
+
+        sources = [won_events, new_events]
+        if use_rollups:
+            sources.append(
+                select(
+                    cast(DailySalesRollup.day, DateTime).label("local_time"),
+                    (DailySalesRollup.day >= bounds.c.start_day).label("is_current"),
+                    DailySalesRollup.won_count.label("won"),
+                    DailySalesRollup.won_value.label("value"),
+                    DailySalesRollup.new_opportunities.label("new"),
+                ).select_from(DailySalesRollup).join(bounds, true()).where(
+                    DailySalesRollup.organization_id == organization_id,
+                    DailySalesRollup.day >= bounds.c.start_day - days,
+                    DailySalesRollup.day < bounds.c.today
+                )
+            )
+
+        events = union_all(*sources).cte("events")
+
+        # 3) Todos los intervalos de ambos períodos, tengan datos o no
+        series = select(
+            func.generate_series(
+                func.date_trunc(bucket, previous_start_local),
+                func.date_trunc(bucket, cast(bounds.c.today, DateTime)),
+                literal_column(f"interval '1 {bucket}'")
+            ).label("bucket_start")
+        ).cte("series")
+
+        current = events.c.is_current
+        per_bucket = select(
+            series.c.bucket_start,
+            func.coalesce(func.sum(events.c.won).filter(current), 0).label("won_count"),
+            func.coalesce(func.sum(events.c.value).filter(current), 0).label("won_value"),
+            func.coalesce(func.sum(events.c.value).filter(~current), 0).label("previous_value"),
+            func.coalesce(func.sum(events.c.new).filter(current), 0).label("new_count"),
+        ).select_from(series).outerjoin(
+            events, func.date_trunc(bucket, events.c.local_time) == series.c.bucket_start
+        ).group_by(series.c.bucket_start).cte("per_bucket")
+
+        # 4) Totales de ambos períodos con funciones de ventana sobre los intervalos
+        return select(
+            per_bucket.c.bucket_start,
+            per_bucket.c.won_count,
+            per_bucket.c.won_value,
+            per_bucket.c.new_count,
+            (per_bucket.c.bucket_start >= func.date_trunc(bucket, start_local)).label("in_current_period"),
+            func.sum(per_bucket.c.won_value).over().label("current_total"),
+            func.sum(per_bucket.c.previous_value).over().label("previous_total"),
+            bounds.c.timezone,
+        ).select_from(per_bucket).join(bounds, true()).order_by(per_bucket.c.bucket_start)
@@ -0,0 +1,379 @@
+"""
+Motor de segmentación de clientes.
+
+Traduce las reglas JSON de segment_definitions a predicados SQL sobre las
+métricas de compra de los clientes y asigna el segmento de toda la
+organización con un único UPDATE ... SET segment = CASE ... END, evaluando
+los segmentos por prioridad. Solo se escriben las filas cuyo segmento cambia.
+
+Formato de las reglas:
+    {"all": [condición, ...]}   todas las condiciones
+    {"any": [condición, ...]}   al menos una condición
+    {"field": "purchase_count", "op": "gte", "value": 5}
+Una lista se interpreta como "all" y un objeto vacío coincide con todos.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import and_, case, func, null, or_, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.base import utcnow
+from app.models.customer import Customer
+from app.models.segment_definition import SegmentDefinition
+from app.services.kpi_service import KpiService
+
+logger = logging.getLogger(__name__)
+
+class SegmentRuleError(ValueError):
+    """
+    Regla de segmentación con un formato no válido.
+    """
+
+# Columnas del cliente que se pueden usar en las reglas
+RULE_FIELDS = {
+    "days_since_last_purchase": Customer.days_since_last_purchase,
+    "purchase_count": Customer.purchase_count,
+    "total_spent": Customer.total_spent,
+    "average_purchase_value": Customer.average_purchase_value,
+    "purchase_frequency_days": Customer.purchase_frequency_days,
+    "lifetime_value": Customer.lifetime_value,
+    "first_purchase_date": Customer.first_purchase_date,
+    "last_purchase_date": Customer.last_purchase_date,
+    "last_interaction": Customer.last_interaction,
+    "created_at": Customer.created_at,
+    "status": Customer.status,
+    "rfm_recency_score": Customer.rfm_recency_score,
+    "rfm_frequency_score": Customer.rfm_frequency_score,
+    "rfm_monetary_score": Customer.rfm_monetary_score,
+    "rfm_score": Customer.rfm_score,
+    "rfm_cluster": Customer.rfm_cluster,
+    "churn_risk_score": Customer.churn_risk_score,
+}
+
+# Operadores de comparación admitidos
+RULE_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "in": lambda column, value: column.in_(value),
+    "not_in": lambda column, value: column.notin_(value),
+    "between": lambda column, value: column.between(value[0], value[1]),
+    "is_null": lambda column, value: column.is_(None),
+    "not_null": lambda column, value: column.isnot(None),
+}
+
+# Segmentos predefinidos (user story #8: VIP, recurrentes, ocasionales, inactivos)
+DEFAULT_SEGMENTS = [
+    {
+        "name": "vip",
+        "display_name": "VIP",
+        "description": "Clientes con alto gasto y compras recientes",
+        "color": "#a855f7",
+        "icon": "crown",
+        "priority": 10,
+        "rules": {"all": [
+            {"field": "total_spent", "op": "gte", "value": 1000},
+            {"field": "days_since_last_purchase", "op": "lte", "value": 90},
+        ]},
+    },
+    {
+        "name": "frequent",
+        "display_name": "Recurrentes",
+        "description": "Clientes que compran con frecuencia",
+        "color": "#22c55e",
+        "icon": "repeat",
+        "priority": 20,
+        "rules": {"all": [
+            {"field": "purchase_count", "op": "gte", "value": 5},
+            {"field": "days_since_last_purchase", "op": "lte", "value": 60},
+        ]},
+    },
+    {
+        "name": "inactive",
+        "display_name": "Inactivos",
+        "description": "Clientes sin compras en los últimos 180 días",
+        "color": "#6b7280",
+        "icon": "moon",
+        "priority": 30,
+        "rules": {"field": "days_since_last_purchase", "op": "gt", "value": 180},
+    },
+    {
+        "name": "occasional",
+        "display_name": "Ocasionales",
+        "description": "Clientes con al menos una compra",
+        "color": "#3b82f6",
+        "icon": "shopping-bag",
+        "priority": 40,
+        "rules": {"field": "purchase_count", "op": "gte", "value": 1},
+    },
+]
+
+def compile_rules(rules: Any):
+    """
+    Convierte las reglas JSON de un segmento en una expresión SQL.
+
+    Raises:
+        SegmentRuleError: Si las reglas usan campos u operadores desconocidos
+    """
+    if isinstance(rules, list):
+        rules = {"all": rules}
+
+    if not isinstance(rules, dict):
+        raise SegmentRuleError("Las reglas deben ser un objeto o una lista")
+
+    if not rules:
+        return true()
+
+    if "all" in rules or "any" in rules:
+        combinator = and_ if "all" in rules else or_
+        conditions = rules.get("all", rules.get("any"))
+        if not isinstance(conditions, list) or not conditions:
+            raise SegmentRuleError("'all' y 'any' requieren una lista de condiciones")
+        return combinator(*[compile_rules(condition) for condition in conditions])
+
+    field = rules.get("field")
+    op = rules.get("op", "eq")
+    value = rules.get("value")
+
+    column = RULE_FIELDS.get(field)
+    if column is None:
+        raise SegmentRuleError(f"Campo de segmentación desconocido: {field}")
+
+    operator = RULE_OPERATORS.get(op)
+    if operator is None:
+        raise SegmentRuleError(f"Operador de segmentación desconocido: {op}")
+
+    if op in ("in", "not_in") and not isinstance(value, list):
+        raise SegmentRuleError(f"El operador '{op}' requiere una lista de valores")
+    if op == "between" and not (isinstance(value, list) and len(value) == 2):
+        raise SegmentRuleError("El operador 'between' requiere [mínimo, máximo]")
+
+    return operator(column, value)
+
+def rule_fields(rules: Any) -> Set[str]:
+    """
+    Devuelve los campos usados en unas reglas.
+    """
+    if isinstance(rules, list):
+        rules = {"all": rules}
+    if not isinstance(rules, dict):
+        return set()
+
+    conditions = rules.get("all", rules.get("any"))
+    if isinstance(conditions, list):
+        return {field for condition in conditions for field in rule_fields(condition)}
+
+    return {rules["field"]} if rules.get("field") else set()
+
+def time_thresholds(rules: Any) -> List[int]:
+    """
+    Devuelve los umbrales numéricos usados con days_since_last_purchase,
+    los únicos que cambian con el paso del tiempo sin actividad del cliente.
+    """
+    if isinstance(rules, list):
+        rules = {"all": rules}
+    if not isinstance(rules, dict):
+        return []
+
+    conditions = rules.get("all", rules.get("any"))
+    if isinstance(conditions, list):
+        return [threshold for condition in conditions for threshold in time_thresholds(condition)]
+
+    if rules.get("field") != "days_since_last_purchase":
+        return []
+
+    values = rules.get("value")
+    values = values if isinstance(values, list) else [values]
+    return [int(value) for value in values if isinstance(value, (int, float))]
+
+class SegmentationEngine:
+    """
+    Motor que asigna segmentos a los clientes de una organización.
+    """
+    def __init__(self, db: Session):
+        """
+        Inicializa el motor con una conexión a la base de datos.
+        """
+        self.db = db
+
+    def get_definitions(self, organization_id: int) -> List[SegmentDefinition]:
+        """
+        Devuelve los segmentos activos de la organización en orden de evaluación.
+        """
+        return self.db.query(SegmentDefinition).filter(
+            SegmentDefinition.organization_id == organization_id,
+            SegmentDefinition.is_active == True
+        ).order_by(
+            SegmentDefinition.priority.asc().nullslast(),
+            SegmentDefinition.id
+        ).all()
+
+    def definition_names(self, organization_id: int) -> List[str]:
+        """
+        Nombres de todos los segmentos de la organización, activos o no.
+        """
+        return [
+            name for (name,) in self.db.query(SegmentDefinition.name).filter(
+                SegmentDefinition.organization_id == organization_id
+            ).all()
+        ]
+
+    def release_segment(self, organization_id: int, name: str) -> int:
+        """
+        Deja sin segmento a los clientes con un nombre que se va a renombrar o
+        eliminar, para que la siguiente reclasificación los reasigne.
+        No confirma la transacción.
+
+        Returns:
+            Número de clientes liberados
+        """
+        result = self.db.execute(
+            update(Customer).where(
+                Customer.organization_id == organization_id,
+                Customer.segment == name
+            ).values(
+                segment=None,
+                segment_updated_at=utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def create_default_definitions(self, organization_id: int) -> None:
+        """
+        Crea los segmentos predefinidos de una organización nueva. Los nombres
+        que ya existen se omiten. No confirma la transacción.
+        """
+        statement = pg_insert(SegmentDefinition).values([
+            dict(organization_id=organization_id, is_active=True, is_system=True, **segment)
+            for segment in DEFAULT_SEGMENTS
+        ])
+        self.db.execute(statement.on_conflict_do_nothing(
+            index_elements=["organization_id", "name"]
+        ))
+
+    def assign_segments(
+        self,
+        organization_id: int,
+        customer_ids: Optional[Sequence[int]] = None,
+        customer_filter=None
+    ) -> int:
+        """
+        Recalcula el segmento de los clientes con un único UPDATE.
+
+        Los clientes que no cumplen ninguna regla y tenían un segmento gestionado
+        por el motor (el nombre de una definición, activa o no) quedan sin
+        segmento; los segmentos asignados a mano que no corresponden a ninguna
+        definición se conservan.
+
+        Args:
+            organization_id: ID de la organización
+            customer_ids: Restringir a estos clientes (por defecto, toda la organización)
+            customer_filter: Condición SQL adicional sobre los clientes (opcional)
+
+        Returns:
+            Número de clientes cuyo segmento cambió
+        """
+        # Todos los nombres de la organización, también los desactivados: sus
+        # clientes se reclasifican en lugar de conservar un segmento sin regla
+        managed_names = self.definition_names(organization_id)
+        if not managed_names:
+            return 0
+
+        whens = []
+        for definition in self.get_definitions(organization_id):
+            try:
+                whens.append((compile_rules(definition.rules), definition.name))
+            except SegmentRuleError as e:
+                logger.warning(f"Segmento '{definition.name}' (org {organization_id}) ignorado: {e}")
+
+        new_segment = case(
+            *whens,
+            (Customer.segment.in_(managed_names), null()),
+            else_=Customer.segment
+        )
+
+        statement = update(Customer).where(
+            Customer.organization_id == organization_id,
+            # Solo las filas cuyo segmento cambia (evita reescribir millones de filas iguales)
+            new_segment.is_distinct_from(Customer.segment)
+        )
+        if customer_ids is not None:
+            if not customer_ids:
+                return 0
+            statement = statement.where(Customer.id.in_(list(customer_ids)))
+        if customer_filter is not None:
+            statement = statement.where(customer_filter)
+
+        result = self.db.execute(
+            statement.values(
+                segment=new_segment,
+                segment_updated_at=utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount:
+            # La distribución por segmento del dashboard cambió
+            KpiService.mark_stale(self.db, organization_id)
+
+        self.db.commit()
+
+        logger.info(f"Segmentación (org {organization_id}): {result.rowcount} clientes reclasificados")
+
+        return result.rowcount
+
+    def sweep_time_thresholds(self, organization_id: int, days_elapsed: int = 1) -> int:
+        """
+        Reclasifica los clientes que cruzaron un umbral de días desde la última
+        compra sin haber tenido actividad (por ejemplo, pasar a inactivo a los
+        180 días). Solo se evalúan los clientes cuya antigüedad está en la ventana
+        [umbral, umbral + days_elapsed] de algún umbral de las reglas.
+
+        Args:
+            organization_id: ID de la organización
+            days_elapsed: Días transcurridos desde el último barrido
+
+        Returns:
+            Número de clientes cuyo segmento cambió
+        """
+        definitions = self.get_definitions(organization_id)
+
+        # El riesgo de abandono se recalcula a diario para todos los clientes:
+        # si alguna regla lo usa, se reevalúa la organización completa
+        if any("churn_risk_score" in rule_fields(definition.rules) for definition in definitions):
+            return self.assign_segments(organization_id)
+
+        thresholds = set()
+        for definition in definitions:
+            thresholds.update(time_thresholds(definition.rules))
+
+        if not thresholds:
+            return 0
+
+        # Rango de fechas en lugar de días transcurridos, para poder usar
+        # el índice (organization_id, last_purchase_date)
+        today = func.current_date()
+        window = max(days_elapsed, 1)
+        crossed = or_(*[
+            Customer.last_purchase_date.between(today - (threshold + window), today - threshold)
+            for threshold in sorted(thresholds)
+        ])
+
+        return self.assign_segments(organization_id, customer_filter=crossed)
+
+    @staticmethod
+    def organizations_with_definitions(db: Session) -> List[int]:
+        """
+        IDs de las organizaciones con al menos un segmento activo.
+        """
+        return [
+            organization_id for (organization_id,) in db.query(
+                SegmentDefinition.organization_id
+            ).filter(
+                SegmentDefinition.is_active == True
+            ).distinct().all()
+        ]
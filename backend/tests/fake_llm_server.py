@@ -0,0 +1,169 @@
+# backend/tests/fake_llm_server.py
+"""
+Servidor local que imita la API de chat compatible con OpenAI, para probar
+Kula sin llamar al proveedor real. Responde en streaming (SSE) o de una vez
+según el campo "stream" de la petición.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeLLMServer:
+    """
+    Servidor de pruebas en un hilo. Uso:
+
+        with FakeLLMServer(chunks=["Hola", " mundo"]) as server:
+            llm_client.configure(api_key="test-key", base_url=server.base_url)
+    """
+    def __init__(
+        self,
+        chunks=None,
+        chunk_delay=0.05,
+        include_usage=True,
+        status_code=200,
+        fail_first=0,
+        retry_after=None,
+        body_delay=0,
+        slow_first=0
+    ):
+        """
+        Args:
+            chunks: Fragmentos de la respuesta
+            chunk_delay: Segundos de espera antes de cada fragmento
+            include_usage: Enviar el consumo de tokens en el último evento
+            status_code: Código de respuesta (p. ej. 500 para simular errores)
+            fail_first: Número de peticiones iniciales que responden status_code;
+                con 0, todas lo hacen
+            retry_after: Valor de la cabecera Retry-After de las respuestas de error
+            body_delay: Segundos de espera entre las cabeceras y el cuerpo de las
+                respuestas completas (no en streaming)
+            slow_first: Número de peticiones iniciales afectadas por body_delay;
+                con 0, todas lo están
+        """
+        self.chunks = chunks or ["Hola", ", soy", " Kula", "."]
+        self.chunk_delay = chunk_delay
+        self.include_usage = include_usage
+        self.status_code = status_code
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.body_delay = body_delay
+        self.slow_first = slow_first
+
+        # Cuerpos JSON de las peticiones recibidas y puerto de origen de cada una
+        self.requests = []
+        self.client_ports = []
+
+        # Peticiones atendidas a la vez (para comprobar límites de concurrencia)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._counter_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with fake._counter_lock:
+                    fake.requests.append(body)
+                    fake.client_ports.append(self.client_address[1])
+                    number = len(fake.requests)
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    self._respond(body, number)
+                finally:
+                    with fake._counter_lock:
+                        fake.in_flight -= 1
+
+            def _respond(self, body, number):
+                if self.path != "/v1/chat/completions":
+                    return self._send_json(404, {"error": {"message": "Ruta desconocida"}})
+                if fake.status_code >= 400 and (not fake.fail_first or number <= fake.fail_first):
+                    return self._send_json(fake.status_code, {"error": {"message": "Error simulado"}})
+                if not body.get("stream"):
+                    time.sleep(fake.chunk_delay * len(fake.chunks))
+                    slow = fake.body_delay and (not fake.slow_first or number <= fake.slow_first)
+                    return self._send_json(200, {
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(fake.chunks)}}],
+                        "usage": fake._usage(body),
+                    }, body_delay=fake.body_delay if slow else 0)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                # Codificación por fragmentos: la conexión se puede reutilizar
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                for chunk in fake.chunks:
+                    time.sleep(fake.chunk_delay)
+                    self._send_event(f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': chunk}}]})}")
+                if fake.include_usage:
+                    self._send_event(f"data: {json.dumps({'choices': [], 'usage': fake._usage(body)})}")
+                self._send_event("data: [DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _send_event(self, line):
+                event = f"{line}\n\n".encode()
+                self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status_code, data, body_delay=0):
+                payload = json.dumps(data).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status_code >= 400 and fake.retry_after is not None:
+                    self.send_header("Retry-After", str(fake.retry_after))
+                self.end_headers()
+                if body_delay:
+                    # Cabeceras enviadas y cuerpo retrasado: el cliente agota la lectura
+                    self.wfile.flush()
+                    time.sleep(body_delay)
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente cerró la conexión tras agotar el tiempo de espera
+                    self.close_connection = True
+
+        return Handler
+
+    def _usage(self, body):
+        prompt_tokens = sum(len(message.get("content", "").split()) for message in body.get("messages", []))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(self.chunks),
+            "total_tokens": prompt_tokens + len(self.chunks),
+        }
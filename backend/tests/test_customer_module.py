@@ -105,6 +105,56 @@ def main():
     customers = list_response.json()
     print(f"Se encontraron {len(customers)} clientes.")
     
+    # Paso 3b: Buscar clientes por páginas
+    print("\n3b. Buscando clientes por páginas...")
+    search_term = f"Busqueda{timestamp}"
+    search_ids = []
+    for n in range(3):
+        search_response = requests.post(
+            f"{BASE_URL}/customers/",
+            headers=headers,
+            json={"first_name": f"Cliente {n}", "last_name": search_term}
+        )
+        if search_response.status_code != 200:
+            print(f"Error al crear cliente de búsqueda: {search_response.text}")
+            return
+        search_ids.append(search_response.json()["id"])
+    
+    first_page = requests.get(
+        f"{BASE_URL}/customers/",
+        headers=headers,
+        params={"search": search_term, "limit": 2}
+    )
+    next_cursor = first_page.headers.get("X-Next-Cursor")
+    if first_page.status_code != 200 or not next_cursor:
+        print(f"Error en la primera página de la búsqueda: {first_page.text}")
+        return
+    
+    second_page = requests.get(
+        f"{BASE_URL}/customers/",
+        headers=headers,
+        params={"search": search_term, "limit": 2, "cursor": next_cursor}
+    )
+    skip_page = requests.get(
+        f"{BASE_URL}/customers/",
+        headers=headers,
+        params={"search": search_term, "limit": 2, "skip": 2}
+    )
+    first_ids = [c["id"] for c in first_page.json()]
+    second_ids = [c["id"] for c in second_page.json()]
+    skip_ids = [c["id"] for c in skip_page.json()]
+    
+    if len(first_ids) != 2 or len(second_ids) != 1 or set(first_ids) & set(second_ids):
+        print(f"❌ Error: páginas de búsqueda {first_ids} y {second_ids}")
+        return
+    if skip_ids != second_ids or sorted(first_ids + second_ids) != sorted(search_ids):
+        print(f"❌ Error: la página con skip devolvió {skip_ids}, se esperaba {second_ids}")
+        return
+    print(f"✅ Página 1: {first_ids}, página 2: {second_ids}")
+    
+    for search_id in search_ids:
+        requests.delete(f"{BASE_URL}/customers/{search_id}", headers=headers)
+    
     # Paso 4: Obtener un cliente específico
     print(f"\n4. Obteniendo cliente con ID {customer_id}...")
     get_response = requests.get(
@@ -0,0 +1,139 @@
+# backend/tests/test_customer_search.py
+"""
+Prueba del índice de n-gramas en memoria de la búsqueda de clientes
+(app/services/customer_search.py): normalización del texto buscado,
+coincidencia sin acentos ni mayúsculas, orden de los resultados y
+continuación de la búsqueda desde la posición del último resultado.
+Ejecutar con: python -m tests.test_customer_search
+(No necesita base de datos)
+"""
+import sys
+
+from app.services.customer_search import NgramIndex, normalize, search_order, tokenize
+
+# Clientes de prueba: (id, nombre, apellido, email)
+ROWS = [
+    (1, "Ana", "Martínez", "ana@correo.com"),
+    (2, "Mariana", "López", "mari@correo.com"),
+    (3, "José", "Peña", "jose.pena@correo.com"),
+    (4, "Juan", "Anaya", None),
+]
+
+def check_tokenize():
+    print("\n1. Normalización del texto buscado...")
+    cases = [
+        ("  José  PEÑA ", ["jose", "pena"]),
+        ("Martínez", ["martinez"]),
+        ("", []),
+        (None, []),
+    ]
+
+    ok = True
+    for term, expected in cases:
+        tokens = tokenize(term)
+        if tokens != expected:
+            ok = False
+            print(f"❌ Error: tokenize({term!r}) devolvió {tokens}, se esperaba {expected}")
+    if normalize("Ñandú") != "nandu":
+        ok = False
+        print(f"❌ Error: normalize('Ñandú') devolvió {normalize('Ñandú')!r}")
+
+    if ok:
+        print("✅ Palabras en minúsculas y sin acentos")
+    return ok
+
+def check_accent_folding():
+    print("\n2. Coincidencia sin acentos ni mayúsculas...")
+    index = NgramIndex(ROWS)
+    cases = [
+        ("PEÑA", [3]),
+        ("jose pena", [3]),
+        ("Martinez", [1]),
+        ("lópez", [2]),
+    ]
+
+    ok = True
+    for term, expected in cases:
+        result = index.search(tokenize(term))
+        if result != expected:
+            ok = False
+            print(f"❌ Error: {term!r} devolvió {result}, se esperaba {expected}")
+
+    if ok:
+        print("✅ Los acentos y las mayúsculas no afectan a la búsqueda")
+    return ok
+
+def check_matching():
+    print("\n3. Todas las palabras, palabras cortas y sin resultados...")
+    index = NgramIndex(ROWS)
+    cases = [
+        # Todas las palabras deben aparecer, en cualquier campo
+        ("mari lopez", [2]),
+        ("ana lopez", [2]),
+        ("ana pena", []),
+        # Más corta que un n-grama: se recorren los documentos
+        ("jo", [3]),
+        ("zzz", []),
+    ]
+
+    ok = True
+    for term, expected in cases:
+        result = index.search(tokenize(term))
+        if result != expected:
+            ok = False
+            print(f"❌ Error: {term!r} devolvió {result}, se esperaba {expected}")
+
+    if ok:
+        print("✅ Solo los clientes con todas las palabras")
+    return ok
+
+def check_ranking():
+    print("\n4. Orden por prefijo y similitud...")
+    index = NgramIndex(ROWS)
+
+    # Primero el documento que empieza por el texto (Ana), luego el que tiene
+    # una palabra que empieza por él (Anaya) y por último el resto (Mariana)
+    result = index.search(tokenize("ana"))
+    if result != [1, 4, 2]:
+        print(f"❌ Error: 'ana' devolvió {result}, se esperaba [1, 4, 2]")
+        return False
+    print("✅ Prefijo del documento, prefijo de palabra y después el resto")
+    return True
+
+def check_keyset_pages():
+    print("\n5. Páginas de resultados a partir de la posición anterior...")
+    index = NgramIndex(ROWS)
+    ranked = index.rank(tokenize("ana"))
+
+    # Página de 2 resultados y continuación desde la posición del último
+    first_page = ranked[:2]
+    boundary = search_order(first_page[-1])
+    second_page = [key for key in ranked if search_order(key) > boundary][:2]
+
+    first_ids = [customer_id for _, _, customer_id in first_page]
+    second_ids = [customer_id for _, _, customer_id in second_page]
+    if first_ids != [1, 4] or second_ids != [2]:
+        print(f"❌ Error: páginas {first_ids} y {second_ids}, se esperaba [1, 4] y [2]")
+        return False
+    print(f"✅ Página 1: {first_ids}, página 2: {second_ids}")
+    return True
+
+def main():
+    print("=== Prueba de la Búsqueda de Clientes en Memoria ===")
+
+    results = [
+        check_tokenize(),
+        check_accent_folding(),
+        check_matching(),
+        check_ranking(),
+        check_keyset_pages(),
+    ]
+
+    if all(results):
+        print("\n✅ Todas las pruebas pasaron")
+    else:
+        print(f"\n❌ {results.count(False)} prueba(s) fallaron")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
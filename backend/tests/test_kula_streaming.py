@@ -0,0 +1,188 @@
+# backend/tests/test_kula_streaming.py
+"""
+Prueba de las respuestas de Kula en streaming contra un servidor local que
+imita la API de chat (tests/fake_llm_server.py).
+Comprueba que los fragmentos llegan a medida que se generan, que se registra
+el consumo de tokens y que la respuesta se guarda una sola vez al terminar.
+Ejecutar con: python -m tests.test_kula_streaming
+(La última prueba usa la base de datos configurada en DATABASE_URL)
+"""
+import asyncio
+import sys
+import time
+
+from app.core.ai.llm_client import OpenAIServiceError, llm_client
+from app.core.ai.openai_service import OpenAIService
+from tests.fake_llm_server import FakeLLMServer
+
+# Configuración
+CHUNKS = ["Hola", ", soy", " Kula", ", tu", " asistente", " de", " PymeAI", "."]
+CHUNK_DELAY = 0.1
+
+def use_server(server):
+    """
+    Apunta la configuración del modelo al servidor de pruebas.
+    """
+    llm_client.configure(api_key="test-key", base_url=server.base_url, max_retries=0)
+
+async def collect(service, usage):
+    """
+    Recorre la respuesta en streaming y anota cuándo llega cada fragmento.
+    """
+    start = time.perf_counter()
+    chunks, times = [], []
+    async for chunk in service.stream_response("Hola", system_message="Eres Kula", usage=usage):
+        chunks.append(chunk)
+        times.append(time.perf_counter() - start)
+    return chunks, times
+
+def check_streaming():
+    print("\n1. Fragmentos a medida que se generan...")
+    with FakeLLMServer(chunks=CHUNKS, chunk_delay=CHUNK_DELAY) as server:
+        use_server(server)
+        usage = {}
+        chunks, times = asyncio.run(collect(OpenAIService(), usage))
+
+        ok = True
+        if chunks != CHUNKS:
+            ok = False
+            print(f"❌ Error: fragmentos recibidos {chunks}")
+        # El primer fragmento debe llegar mucho antes que la respuesta completa
+        if not times or times[0] > CHUNK_DELAY * 3 or times[-1] < CHUNK_DELAY * (len(CHUNKS) - 1):
+            ok = False
+            print(f"❌ Error: tiempos de llegada inesperados {[round(t, 2) for t in times]}")
+        if usage.get("completion_tokens") != len(CHUNKS) or not usage.get("prompt_tokens"):
+            ok = False
+            print(f"❌ Error: consumo de tokens inesperado {usage}")
+
+        request = server.requests[-1]
+        if not request.get("stream") or request["messages"][0]["role"] != "system":
+            ok = False
+            print(f"❌ Error: petición inesperada {request}")
+
+        if ok:
+            print(f"✅ Primer fragmento a los {times[0] * 1000:.0f} ms, respuesta completa a los {times[-1] * 1000:.0f} ms")
+        return ok
+
+def check_usage_fallback():
+    print("\n2. Consumo de tokens sin informe del proveedor...")
+    with FakeLLMServer(chunks=CHUNKS, chunk_delay=0, include_usage=False) as server:
+        use_server(server)
+        usage = {}
+        asyncio.run(collect(OpenAIService(), usage))
+
+        if usage.get("completion_tokens") != len(CHUNKS) or usage.get("prompt_tokens") is not None:
+            print(f"❌ Error: consumo de tokens inesperado {usage}")
+            return False
+        print("✅ Se cuenta un token por fragmento")
+        return True
+
+def check_error():
+    print("\n3. Error de la API del modelo...")
+    with FakeLLMServer(status_code=500) as server:
+        use_server(server)
+        try:
+            asyncio.run(collect(OpenAIService(), {}))
+        except OpenAIServiceError as e:
+            print(f"✅ Error propagado: {e}")
+            return True
+        print("❌ Error: no se propagó el error del servidor")
+        return False
+
+def check_stream_query():
+    print("\n4. Respuesta guardada al terminar el streaming...")
+    from app.core.ai.kula_service import KulaService
+    from app.db.base import AsyncSessionLocal, SessionLocal
+    from app.models.conversation import Conversation
+    from app.models.message import Message
+    from app.models.organization import Organization
+    from app.models.user import User
+
+    db = SessionLocal()
+    organization = Organization(name="Prueba Kula Streaming")
+    db.add(organization)
+    db.flush()
+    user = User(
+        organization_id=organization.id,
+        email=f"kula_streaming_{int(time.time())}@pymeai.com",
+        password_hash="-",
+        first_name="Prueba",
+        last_name="Streaming"
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+
+    async def run():
+        events = []
+        async with AsyncSessionLocal() as session:
+            async for event, data in KulaService(session).stream_query(user, "Hola Kula"):
+                events.append((event, data))
+        return events
+
+    try:
+        with FakeLLMServer(chunks=CHUNKS, chunk_delay=0.01) as server:
+            use_server(server)
+            events = asyncio.run(run())
+
+        ok = True
+        kinds = [event for event, _ in events]
+        if kinds[0] != "start" or kinds[-1] != "done" or kinds.count("delta") != len(CHUNKS):
+            ok = False
+            print(f"❌ Error: secuencia de eventos inesperada {kinds}")
+
+        conversation_id = events[0][1]["conversation_id"]
+        messages = db.query(Message).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.id).all()
+        roles = [message.role for message in messages]
+        if roles != ["user", "assistant"]:
+            ok = False
+            print(f"❌ Error: mensajes guardados {roles}")
+        elif messages[1].content != "".join(CHUNKS) or messages[1].tokens != len(CHUNKS):
+            ok = False
+            print(f"❌ Error: respuesta guardada {messages[1].content!r} con {messages[1].tokens} tokens")
+        elif events[-1][1]["message_id"] != messages[1].id:
+            ok = False
+            print("❌ Error: el evento final no corresponde al mensaje guardado")
+
+        if ok:
+            print(f"✅ Respuesta guardada con {messages[1].tokens} tokens: {messages[1].meta_info}")
+        return ok
+    finally:
+        db.rollback()
+        conversation_ids = [
+            row.id for row in db.query(Conversation.id).filter(Conversation.user_id == user.id)
+        ]
+        db.query(Message).filter(
+            Message.conversation_id.in_(conversation_ids)
+        ).delete(synchronize_session=False)
+        db.query(Conversation).filter(
+            Conversation.user_id == user.id
+        ).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.query(Organization).filter(
+            Organization.id == organization.id
+        ).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def main():
+    print("=== Prueba de Kula en Streaming ===")
+
+    results = [
+        check_streaming(),
+        check_usage_fallback(),
+        check_error(),
+        check_stream_query(),
+    ]
+
+    if all(results):
+        print("\n✅ Todas las pruebas pasaron")
+    else:
+        print(f"\n❌ {results.count(False)} prueba(s) fallaron")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
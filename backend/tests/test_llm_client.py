@@ -0,0 +1,196 @@
+# backend/tests/test_llm_client.py
+"""
+Prueba del cliente compartido de la API del modelo contra un servidor local
+que la imita (tests/fake_llm_server.py): reutilización de conexiones,
+reintentos ante 429/5xx, errores no recuperables, cuerpos de respuesta
+lentos y límite de peticiones simultáneas por organización.
+Ejecutar con: python -m tests.test_llm_client
+"""
+import asyncio
+import sys
+import time
+
+from app.core.ai.llm_client import LLMClient, OpenAIServiceError
+from tests.fake_llm_server import FakeLLMServer
+
+# Configuración
+PAYLOAD = {"model": "fake", "messages": [{"role": "user", "content": "Hola Kula"}]}
+ORG_CONCURRENCY = 2
+PARALLEL_REQUESTS = 8
+
+def make_client(server, **options):
+    return LLMClient(api_key="test-key", base_url=server.base_url, **options)
+
+async def consume(client, organization_id=None):
+    """
+    Recorre una respuesta en streaming y devuelve el texto.
+    """
+    parts = []
+    async for event in client.stream_chat(PAYLOAD, organization_id):
+        for choice in event.get("choices") or []:
+            parts.append((choice.get("delta") or {}).get("content") or "")
+    return "".join(parts)
+
+def check_connection_reuse():
+    print("\n1. Reutilización de conexiones...")
+    with FakeLLMServer(chunk_delay=0) as server:
+        client = make_client(server)
+
+        async def run():
+            for _ in range(3):
+                await client.chat(PAYLOAD)
+                await consume(client)
+            await client.aclose()
+
+        asyncio.run(run())
+
+        connections = len(set(server.client_ports))
+        if connections != 1:
+            print(f"❌ Error: {len(server.requests)} peticiones usaron {connections} conexiones")
+            return False
+        print(f"✅ {len(server.requests)} peticiones sobre una sola conexión")
+        return True
+
+def check_retry_on_server_error():
+    print("\n2. Reintentos ante errores 503...")
+    with FakeLLMServer(chunk_delay=0, status_code=503, fail_first=2) as server:
+        client = make_client(server, max_retries=3, retry_max_delay=0.2)
+
+        text = asyncio.run(consume(client))
+        if text != "".join(server.chunks) or len(server.requests) != 3:
+            print(f"❌ Error: respuesta {text!r} tras {len(server.requests)} peticiones")
+            return False
+        print("✅ Respuesta completa tras 2 errores 503")
+        return True
+
+def check_retry_after():
+    print("\n3. Respeto de Retry-After ante 429...")
+    with FakeLLMServer(chunk_delay=0, status_code=429, fail_first=1, retry_after=1) as server:
+        client = make_client(server, max_retries=2, retry_max_delay=5)
+
+        start = time.perf_counter()
+        asyncio.run(client.chat(PAYLOAD))
+        elapsed = time.perf_counter() - start
+
+        if len(server.requests) != 2 or elapsed < 1:
+            print(f"❌ Error: {len(server.requests)} peticiones en {elapsed:.2f} s")
+            return False
+        print(f"✅ Reintento tras {elapsed:.2f} s")
+        return True
+
+def check_errors_not_retried():
+    print("\n4. Errores no recuperables y reintentos agotados...")
+    ok = True
+
+    with FakeLLMServer(chunk_delay=0, status_code=400) as server:
+        client = make_client(server, max_retries=3)
+        try:
+            asyncio.run(client.chat(PAYLOAD))
+            ok = False
+            print("❌ Error: no se propagó el error 400")
+        except OpenAIServiceError as e:
+            if e.status_code != 400 or len(server.requests) != 1:
+                ok = False
+                print(f"❌ Error: 400 con {len(server.requests)} peticiones ({e.status_code})")
+
+    with FakeLLMServer(chunk_delay=0, status_code=500) as server:
+        client = make_client(server, max_retries=2, retry_max_delay=0.1)
+        try:
+            asyncio.run(client.chat(PAYLOAD))
+            ok = False
+            print("❌ Error: no se propagó el error 500")
+        except OpenAIServiceError as e:
+            if e.status_code != 500 or len(server.requests) != 3:
+                ok = False
+                print(f"❌ Error: 500 con {len(server.requests)} peticiones ({e.status_code})")
+
+    if ok:
+        print("✅ El 400 no se reintenta y el 500 se reintenta hasta agotar los intentos")
+    return ok
+
+def check_slow_body():
+    print("\n5. Cuerpo de la respuesta más lento que el tiempo de espera...")
+    ok = True
+
+    # La primera respuesta se corta al leer el cuerpo y la segunda llega a tiempo
+    with FakeLLMServer(chunk_delay=0, body_delay=1, slow_first=1) as server:
+        client = make_client(server, timeout=0.3, max_retries=2, retry_max_delay=0.1)
+        try:
+            data = asyncio.run(client.chat(PAYLOAD))
+            content = data["choices"][0]["message"]["content"]
+            if content != "".join(server.chunks) or len(server.requests) != 2:
+                ok = False
+                print(f"❌ Error: respuesta {content!r} tras {len(server.requests)} peticiones")
+        except Exception as e:
+            ok = False
+            print(f"❌ Error: no se reintentó la lectura del cuerpo ({e!r})")
+
+    # Todas lentas: se agotan los intentos con OpenAIServiceError, no con un error de httpx
+    with FakeLLMServer(chunk_delay=0, body_delay=1) as server:
+        client = make_client(server, timeout=0.3, max_retries=1, retry_max_delay=0.1)
+        try:
+            asyncio.run(client.chat(PAYLOAD))
+            ok = False
+            print("❌ Error: no se propagó el tiempo de espera agotado")
+        except OpenAIServiceError:
+            if len(server.requests) != 2:
+                ok = False
+                print(f"❌ Error: {len(server.requests)} peticiones, se esperaban 2")
+        except Exception as e:
+            ok = False
+            print(f"❌ Error: se propagó {e!r} en lugar de OpenAIServiceError")
+
+    if ok:
+        print("✅ La lectura lenta se reintenta y, agotados los intentos, se lanza OpenAIServiceError")
+    return ok
+
+def check_org_concurrency():
+    print("\n6. Límite de peticiones simultáneas por organización...")
+    ok = True
+
+    with FakeLLMServer(chunk_delay=0.05) as server:
+        client = make_client(server, org_concurrency=ORG_CONCURRENCY)
+
+        async def run(organizations):
+            await asyncio.gather(*[
+                consume(client, organizations[n % len(organizations)])
+                for n in range(PARALLEL_REQUESTS)
+            ])
+            await client.aclose()
+
+        asyncio.run(run([1]))
+        if server.max_in_flight != ORG_CONCURRENCY:
+            ok = False
+            print(f"❌ Error: una organización llegó a {server.max_in_flight} peticiones simultáneas")
+
+        # Cada organización tiene su propio límite
+        server.max_in_flight = 0
+        asyncio.run(run([1, 2]))
+        if server.max_in_flight != ORG_CONCURRENCY * 2:
+            ok = False
+            print(f"❌ Error: dos organizaciones llegaron a {server.max_in_flight} peticiones simultáneas")
+
+    if ok:
+        print(f"✅ Máximo {ORG_CONCURRENCY} peticiones simultáneas por organización")
+    return ok
+
+def main():
+    print("=== Prueba del Cliente de la API del Modelo ===")
+
+    results = [
+        check_connection_reuse(),
+        check_retry_on_server_error(),
+        check_retry_after(),
+        check_errors_not_retried(),
+        check_slow_body(),
+        check_org_concurrency(),
+    ]
+
+    if all(results):
+        print("\n✅ Todas las pruebas pasaron")
+    else:
+        print(f"\n❌ {results.count(False)} prueba(s) fallaron")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
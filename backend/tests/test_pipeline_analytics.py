@@ -0,0 +1,195 @@
+# backend/tests/test_pipeline_analytics.py
+"""
+Benchmark del motor de analítica de pipelines.
+Verifica que el número de consultas es constante sin importar cuántas etapas tenga el pipeline.
+Ejecutar con: python -m tests.test_pipeline_analytics
+(Usa directamente la base de datos configurada en DATABASE_URL)
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.db.base import SessionLocal, engine
+from app.models.organization import Organization
+from app.models.pipeline import Pipeline
+from app.models.pipeline_stage import PipelineStage
+from app.models.opportunity import Opportunity
+from app.models.stage_history import StageHistory
+from app.services.pipeline_analytics import PipelineAnalyticsService
+
+# Configuración
+STAGE_COUNTS = [3, 10, 30]
+OPPORTUNITIES_PER_STAGE = 5
+
+class QueryCounter:
+    """
+    Cuenta las sentencias SQL ejecutadas por el motor mientras está activo.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+def main():
+    print("=== Benchmark de Analítica de Pipelines ===")
+
+    results = []
+
+    for stage_count in STAGE_COUNTS:
+        db = SessionLocal()
+        organization_id = None
+        try:
+            print(f"\nCreando pipeline de prueba con {stage_count} etapas...")
+            organization_id, pipeline_id = create_test_pipeline(db, stage_count)
+
+            service = PipelineAnalyticsService(db)
+
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                metrics = service.get_stage_metrics(
+                    organization_id=organization_id,
+                    pipeline_id=pipeline_id
+                )
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+            print(f"  Etapas analizadas: {len(metrics['stage_metrics'])}")
+            print(f"  Consultas ejecutadas: {counter.count}")
+            print(f"  Tiempo: {elapsed_ms:.1f} ms")
+            print(f"  Conversión general: {metrics['overall_conversion_rate']}%")
+
+            results.append((stage_count, counter.count, len(metrics["stage_metrics"])))
+        finally:
+            if organization_id is not None:
+                cleanup(db, organization_id)
+            db.close()
+
+    # Verificar que todas las ejecuciones usaron el mismo número de consultas
+    print("\nResultados:")
+    query_counts = set()
+    all_ok = True
+    for stage_count, query_count, analyzed in results:
+        print(f"  {stage_count} etapas -> {query_count} consultas")
+        query_counts.add(query_count)
+        if analyzed != stage_count:
+            all_ok = False
+            print(f"  ❌ Error: se esperaban {stage_count} etapas y se obtuvieron {analyzed}")
+
+    if len(query_counts) == 1 and all_ok:
+        print("✅ Correcto: el número de consultas es constante")
+    else:
+        print("❌ Error: el número de consultas depende del número de etapas")
+        sys.exit(1)
+
+    print("\n=== Prueba completa ===")
+
+def create_test_pipeline(db, stage_count):
+    """
+    Crea una organización con un pipeline de N etapas, oportunidades en cada
+    etapa y un historial de movimientos entre etapas consecutivas.
+    """
+    organization = Organization(name=f"Benchmark Pipeline Analytics {stage_count}")
+    db.add(organization)
+    db.flush()
+
+    pipeline = Pipeline(
+        organization_id=organization.id,
+        name=f"Pipeline de {stage_count} etapas"
+    )
+    db.add(pipeline)
+    db.flush()
+
+    stages = []
+    for order in range(stage_count):
+        stage = PipelineStage(
+            pipeline_id=pipeline.id,
+            name=f"Etapa {order}",
+            order=order,
+            probability=round(100 * order / max(stage_count - 1, 1), 1),
+            is_won=(order == stage_count - 1)
+        )
+        db.add(stage)
+        stages.append(stage)
+    db.flush()
+
+    now = datetime.now()
+    for index, stage in enumerate(stages):
+        for n in range(OPPORTUNITIES_PER_STAGE):
+            opportunity = Opportunity(
+                organization_id=organization.id,
+                pipeline_id=pipeline.id,
+                stage_id=stage.id,
+                title=f"Oportunidad {index}-{n}",
+                value=1000.0 * (n + 1),
+                status="won" if stage.is_won else "open"
+            )
+            db.add(opportunity)
+            db.flush()
+
+            # Historial: la oportunidad recorrió todas las etapas anteriores
+            db.add(StageHistory(
+                opportunity_id=opportunity.id,
+                to_stage_id=stages[0].id,
+                changed_at=now - timedelta(days=index + 1)
+            ))
+            for previous in range(index):
+                db.add(StageHistory(
+                    opportunity_id=opportunity.id,
+                    from_stage_id=stages[previous].id,
+                    to_stage_id=stages[previous + 1].id,
+                    changed_at=now - timedelta(days=index - previous),
+                    time_in_stage=86400
+                ))
+
+    db.commit()
+
+    return organization.id, pipeline.id
+
+def cleanup(db, organization_id):
+    """
+    Elimina los datos creados para el benchmark.
+    """
+    db.rollback()
+
+    opportunity_ids = [
+        id for (id,) in db.query(Opportunity.id).filter(
+            Opportunity.organization_id == organization_id
+        ).all()
+    ]
+    if opportunity_ids:
+        db.query(StageHistory).filter(
+            StageHistory.opportunity_id.in_(opportunity_ids)
+        ).delete(synchronize_session=False)
+    db.query(Opportunity).filter(
+        Opportunity.organization_id == organization_id
+    ).delete(synchronize_session=False)
+
+    pipeline_ids = [
+        id for (id,) in db.query(Pipeline.id).filter(
+            Pipeline.organization_id == organization_id
+        ).all()
+    ]
+    if pipeline_ids:
+        db.query(PipelineStage).filter(
+            PipelineStage.pipeline_id.in_(pipeline_ids)
+        ).delete(synchronize_session=False)
+    db.query(Pipeline).filter(
+        Pipeline.organization_id == organization_id
+    ).delete(synchronize_session=False)
+    db.query(Organization).filter(
+        Organization.id == organization_id
+    ).delete(synchronize_session=False)
+
+    db.commit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# backend/tests/test_purchase_concurrency.py
+"""
+Prueba de estrés del registro de compras.
+Varios hilos registran compras del mismo cliente a la vez (compras sueltas y
+lotes) y se comprueba que los totales son exactos, sin incrementos perdidos,
+y que reconstruirlos desde el registro de compras da el mismo resultado.
+Ejecutar con: python -m tests.test_purchase_concurrency
+(Usa directamente la base de datos configurada en DATABASE_URL)
+"""
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from app.db.base import SessionLocal
+from app.models.organization import Organization
+from app.models.customer import Customer
+from app.models.kpi_snapshot import KpiSnapshot
+from app.models.purchase import Purchase, PurchaseItem
+from app.services.purchase_service import PurchaseService
+
+# Configuración
+THREADS = 16
+PURCHASES_PER_THREAD = 25
+BATCH_THREADS = 4
+PURCHASES_PER_BATCH = 50
+# Importe representable exactamente en binario para poder comparar sumas
+AMOUNT = 1.25
+
+def main():
+    print("=== Prueba de Estrés de Compras Concurrentes ===")
+
+    db = SessionLocal()
+    organization_id = None
+    try:
+        organization_id, customer_id = create_test_customer(db)
+        print(f"Cliente de prueba creado: {customer_id}")
+
+        errors = []
+        start_barrier = threading.Barrier(THREADS + BATCH_THREADS)
+        base_date = date.today() - timedelta(days=365)
+
+        def single_purchases(worker):
+            session = SessionLocal()
+            try:
+                start_barrier.wait()
+                service = PurchaseService(session)
+                for n in range(PURCHASES_PER_THREAD):
+                    customer = service.record_purchase(
+                        organization_id,
+                        customer_id,
+                        base_date + timedelta(days=n),
+                        AMOUNT
+                    )
+                    if customer is None:
+                        errors.append(f"Hilo {worker}: cliente no encontrado")
+            except Exception as e:
+                errors.append(f"Hilo {worker}: {e}")
+            finally:
+                session.close()
+
+        def batch_purchases(worker):
+            session = SessionLocal()
+            try:
+                start_barrier.wait()
+                result = PurchaseService(session).record_purchases(organization_id, [
+                    {
+                        "customer_id": customer_id,
+                        "purchase_date": base_date + timedelta(days=n),
+                        "amount": AMOUNT
+                    }
+                    for n in range(PURCHASES_PER_BATCH)
+                ])
+                if result["updated_customers"] != 1:
+                    errors.append(f"Lote {worker}: se actualizaron {result['updated_customers']} clientes")
+            except Exception as e:
+                errors.append(f"Lote {worker}: {e}")
+            finally:
+                session.close()
+
+        threads = [
+            threading.Thread(target=single_purchases, args=(i,)) for i in range(THREADS)
+        ] + [
+            threading.Thread(target=batch_purchases, args=(i,)) for i in range(BATCH_THREADS)
+        ]
+
+        print(f"Lanzando {THREADS} hilos x {PURCHASES_PER_THREAD} compras y {BATCH_THREADS} lotes x {PURCHASES_PER_BATCH} compras...")
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        expected_count = THREADS * PURCHASES_PER_THREAD + BATCH_THREADS * PURCHASES_PER_BATCH
+        expected_total = expected_count * AMOUNT
+        print(f"Tiempo: {elapsed:.2f} s ({expected_count / elapsed:.0f} compras/s)")
+
+        db.expire_all()
+        customer = db.query(Customer).filter(Customer.id == customer_id).first()
+
+        all_ok = True
+        for error in errors:
+            all_ok = False
+            print(f"❌ Error: {error}")
+
+        print(f"\npurchase_count: {customer.purchase_count} (esperado {expected_count})")
+        print(f"total_spent: {customer.total_spent} (esperado {expected_total})")
+        print(f"average_purchase_value: {customer.average_purchase_value} (esperado {AMOUNT})")
+
+        if customer.purchase_count != expected_count:
+            all_ok = False
+            print("❌ Error: se perdieron compras")
+        if customer.total_spent != expected_total:
+            all_ok = False
+            print("❌ Error: el total gastado no coincide")
+        if abs(customer.average_purchase_value - AMOUNT) > 1e-9:
+            all_ok = False
+            print("❌ Error: el valor promedio no coincide")
+        if customer.first_purchase_date != base_date:
+            all_ok = False
+            print(f"❌ Error: primera compra {customer.first_purchase_date}, esperada {base_date}")
+
+        # Cada compra debe quedar en el registro
+        logged = db.query(Purchase).filter(Purchase.customer_id == customer_id).count()
+        print(f"compras en el registro: {logged} (esperado {expected_count})")
+        if logged != expected_count:
+            all_ok = False
+            print("❌ Error: el registro de compras no coincide")
+
+        # La reconstrucción desde el registro debe dar los mismos totales
+        summary = (customer.purchase_count, customer.total_spent, customer.first_purchase_date, customer.last_purchase_date)
+        PurchaseService(db).rebuild_customer_summaries(organization_id, [customer_id])
+        db.expire_all()
+        customer = db.query(Customer).filter(Customer.id == customer_id).first()
+        rebuilt = (customer.purchase_count, customer.total_spent, customer.first_purchase_date, customer.last_purchase_date)
+        if rebuilt != summary:
+            all_ok = False
+            print(f"❌ Error: la reconstrucción no coincide: {rebuilt} != {summary}")
+
+        # Un cliente con compras anteriores al registro no debe perder su historial
+        legacy = Customer(
+            organization_id=organization_id,
+            first_name="Cliente",
+            last_name="Histórico",
+            status="active",
+            purchase_count=5,
+            total_spent=100.0,
+            average_purchase_value=20.0,
+            first_purchase_date=base_date - timedelta(days=400),
+            last_purchase_date=base_date - timedelta(days=30)
+        )
+        db.add(legacy)
+        db.commit()
+        PurchaseService(db).record_purchase(organization_id, legacy.id, base_date, AMOUNT)
+        PurchaseService(db).rebuild_customer_summaries(organization_id, [legacy.id])
+        db.expire_all()
+        legacy = db.query(Customer).filter(Customer.id == legacy.id).first()
+        if legacy.purchase_count != 6 or legacy.first_purchase_date != base_date - timedelta(days=400):
+            all_ok = False
+            print(f"❌ Error: la reconstrucción borró el historial previo ({legacy.purchase_count} compras)")
+
+        if all_ok:
+            print("✅ Correcto: los totales son exactos")
+        else:
+            sys.exit(1)
+    finally:
+        if organization_id is not None:
+            cleanup(db, organization_id)
+        db.close()
+
+    print("\n=== Prueba completa ===")
+
+def create_test_customer(db):
+    """
+    Crea una organización con un cliente sin compras.
+    """
+    organization = Organization(name="Prueba Compras Concurrentes")
+    db.add(organization)
+    db.flush()
+
+    customer = Customer(
+        organization_id=organization.id,
+        first_name="Cliente",
+        last_name="Concurrente",
+        status="active"
+    )
+    db.add(customer)
+    db.commit()
+
+    return organization.id, customer.id
+
+def cleanup(db, organization_id):
+    """
+    Elimina los datos creados para la prueba.
+    """
+    db.rollback()
+
+    db.query(PurchaseItem).filter(
+        PurchaseItem.organization_id == organization_id
+    ).delete(synchronize_session=False)
+    db.query(Purchase).filter(
+        Purchase.organization_id == organization_id
+    ).delete(synchronize_session=False)
+    db.query(KpiSnapshot).filter(
+        KpiSnapshot.organization_id == organization_id
+    ).delete(synchronize_session=False)
+    db.query(Customer).filter(
+        Customer.organization_id == organization_id
+    ).delete(synchronize_session=False)
+    db.query(Organization).filter(
+        Organization.id == organization_id
+    ).delete(synchronize_session=False)
+
+    db.commit()
+
+if __name__ == "__main__":
+    main()